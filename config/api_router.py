@@ -1,8 +1,13 @@
 from django.conf import settings
+from django.db import transaction
+from django.urls import path
+from django.urls import re_path
 from rest_framework.routers import DefaultRouter
 from rest_framework.routers import SimpleRouter
 
-from strata_blog.users.api.views import UserViewSet, PostViewSet
+from strata_blog.users.api.views import PostImportView
+from strata_blog.users.api.views import PostViewSet
+from strata_blog.users.api.views import UserViewSet
 
 router = DefaultRouter() if settings.DEBUG else SimpleRouter()
 
@@ -11,4 +16,17 @@ router.register('posts', PostViewSet, basename='posts')
 
 
 app_name = 'api'
-urlpatterns = router.urls
+urlpatterns = [
+    # Before the router, whose posts/<pk>/ would match it
+    path('posts/import/', transaction.non_atomic_requests(PostImportView.as_view()), name='posts-import'),
+]
+if settings.POSTS_ASYNC_VIEWS:
+    from strata_blog.users.api import async_views
+
+    # The router's own patterns and names, served by async views under ASGI
+    urlpatterns += [
+        re_path(r'^posts/$', async_views.post_list, name='posts-list'),
+        re_path(r'^posts/(?P<pk>[^/.]+)/$', async_views.post_detail, name='posts-detail'),
+        re_path(r'^posts/(?P<pk>[^/.]+)/add_comment/$', async_views.post_add_comment, name='posts-add-comment'),
+    ]
+urlpatterns += router.urls
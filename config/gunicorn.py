@@ -0,0 +1,15 @@
+"""
+Gunicorn settings for production (``gunicorn -c config/gunicorn.py``).
+
+Prometheus multiprocess mode keeps one sample file per worker in
+``PROMETHEUS_MULTIPROC_DIR``; a dead worker's live gauges are dropped here.
+"""
+
+import os
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -47,6 +47,26 @@ LOCALE_PATHS = [str(BASE_DIR / "locale")]
 # https://docs.djangoproject.com/en/dev/ref/settings/#databases
 DATABASES = {"default": env.db("DATABASE_URL")}
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# Read replicas for safe requests, weighted by DATABASE_REPLICA_WEIGHTS (default 1 each).
+# See strata_blog.users.replicas
+DATABASE_REPLICA_URLS = env.list("DATABASE_REPLICA_URLS", default=[])
+DATABASE_REPLICA_WEIGHTS = env.list("DATABASE_REPLICA_WEIGHTS", cast=int, default=[])
+DATABASE_REPLICAS = {}
+for index, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    # Тесты не создают отдельную базу для реплики
+    DATABASES[f"replica{index}"] = {**env.db_url_config(url), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS[f"replica{index}"] = (
+        DATABASE_REPLICA_WEIGHTS[index - 1] if index <= len(DATABASE_REPLICA_WEIGHTS) else 1
+    )
+DATABASE_ROUTERS = ["strata_blog.users.replicas.ReplicaRouter"]
+# Replicas further behind than this (seconds) are skipped; checked every CHECK_INTERVAL
+# on a connection of their own that gives up after CHECK_TIMEOUT, a failed one is retried
+# after RETRY. A client's reads stay on the primary for STICKY_SECONDS after it writes
+DATABASE_REPLICA_MAX_LAG = env.float("DATABASE_REPLICA_MAX_LAG", default=2)
+DATABASE_REPLICA_CHECK_INTERVAL = env.float("DATABASE_REPLICA_CHECK_INTERVAL", default=5)
+DATABASE_REPLICA_RETRY = env.float("DATABASE_REPLICA_RETRY", default=30)
+DATABASE_REPLICA_CHECK_TIMEOUT = env.int("DATABASE_REPLICA_CHECK_TIMEOUT", default=2)
+DATABASE_REPLICA_STICKY_SECONDS = env.int("DATABASE_REPLICA_STICKY_SECONDS", default=10)
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -68,6 +88,7 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
     # "django.contrib.humanize", # Handy template tags
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -135,6 +156,9 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "strata_blog.users.metrics.MetricsMiddleware",
+    "strata_blog.users.server_timing.ServerTimingMiddleware",
+    "strata_blog.users.replicas.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -252,6 +276,8 @@ LOGGING = {
         "verbose": {
             "format": "%(levelname)s %(asctime)s %(module)s %(process)d %(thread)d %(message)s",
         },
+        # Access log lines are JSON already
+        "message": {"format": "%(message)s"},
     },
     "handlers": {
         "console": {
@@ -259,8 +285,16 @@ LOGGING = {
             "class": "logging.StreamHandler",
             "formatter": "verbose",
         },
+        "access": {
+            "level": "INFO",
+            "class": "logging.StreamHandler",
+            "formatter": "message",
+        },
     },
     "root": {"level": "INFO", "handlers": ["console"]},
+    "loggers": {
+        "strata_blog.access": {"level": "INFO", "handlers": ["access"], "propagate": False},
+    },
 }
 
 # Celery
@@ -329,6 +363,10 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.AllowAny",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "strata_blog.users.api.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
@@ -357,3 +395,82 @@ WEBPACK_LOADER = {
 }
 # Your stuff...
 # ------------------------------------------------------------------------------
+# How PostViewSet.list fills total_count: "exact" (cache counters),
+# "estimated" (planner statistics) or "none". See strata_blog.users.counting
+POSTS_COUNT_MODE = env("DJANGO_POSTS_COUNT_MODE", default="exact")
+POSTS_AUTHOR_COUNT_MODE = env("DJANGO_POSTS_AUTHOR_COUNT_MODE", default="exact")
+# Exact counters expire and are recounted after this many seconds (tasks.reset_post_counts also
+# recomputes them every 15 minutes), so a missed update cannot skew them for long
+POSTS_COUNT_TIMEOUT = env.int("DJANGO_POSTS_COUNT_TIMEOUT", default=60 * 60)
+# Tag-invalidated cache for the posts API. See strata_blog.users.response_cache
+POSTS_RESPONSE_CACHE = "default"
+POSTS_RESPONSE_CACHE_ENABLED = env.bool("DJANGO_POSTS_RESPONSE_CACHE_ENABLED", default=True)
+# Entries are invalidated explicitly; the timeout only bounds memory use
+POSTS_RESPONSE_CACHE_TIMEOUT = env.int("DJANGO_POSTS_RESPONSE_CACHE_TIMEOUT", default=24 * 60 * 60)
+# Autocomplete: prefixes up to AUTOCOMPLETE_PREFIX_MAX_LENGTH characters are served
+# from an in-process index of the newest titles/authors. See strata_blog.users.autocomplete
+AUTOCOMPLETE_PREFIX_INDEX = env.bool("DJANGO_AUTOCOMPLETE_PREFIX_INDEX", default=True)
+AUTOCOMPLETE_PREFIX_INDEX_SIZE = env.int("DJANGO_AUTOCOMPLETE_PREFIX_INDEX_SIZE", default=5000)
+AUTOCOMPLETE_PREFIX_INDEX_TTL = env.int("DJANGO_AUTOCOMPLETE_PREFIX_INDEX_TTL", default=300)
+AUTOCOMPLETE_PREFIX_MAX_LENGTH = 2
+# Prometheus metrics at /metrics. If set, scrapers must send "Authorization: Bearer <token>".
+# Multi-process workers also need PROMETHEUS_MULTIPROC_DIR. See strata_blog.users.metrics
+METRICS_TOKEN = env("DJANGO_METRICS_TOKEN", default="")
+# Server-Timing header and JSON access log lines with the db/cache/render/serialize
+# breakdown of every request. See strata_blog.users.server_timing
+SERVER_TIMING = env.bool("DJANGO_SERVER_TIMING", default=False)
+# Statements slower than this are logged and kept (at most SLOW_QUERY_STORE_SIZE of them)
+# with a sampled EXPLAIN; 0 turns the recorder off. See strata_blog.users.slow_queries
+SLOW_QUERY_THRESHOLD_MS = env.float("DJANGO_SLOW_QUERY_THRESHOLD_MS", default=500)
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = env.float("DJANGO_SLOW_QUERY_EXPLAIN_SAMPLE_RATE", default=0.05)
+SLOW_QUERY_STORE_SIZE = 1000
+# Resized copies of post images written by a Celery task after upload; originals larger
+# than IMAGE_MAX_PIXELS are not decoded. See strata_blog.users.images
+IMAGE_VARIANT_WIDTHS = [320, 640, 1280]
+IMAGE_VARIANT_FORMATS = ["webp", "jpeg"]
+IMAGE_MAX_DIMENSION = 2560
+IMAGE_MAX_PIXELS = 40_000_000
+# Media named by content hash: duplicate uploads are stored once and served with
+# MEDIA_CACHE_CONTROL. Wraps STORAGES["default"]. See strata_blog.users.storage
+MEDIA_CONTENT_ADDRESSED = env.bool("DJANGO_MEDIA_CONTENT_ADDRESSED", default=False)
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Async list/retrieve/add_comment views on native async database connections, for ASGI
+# only; up to ASYNC_DB_POOL_MAX_SIZE connections per worker and database. See strata_blog.users.api.async_views
+POSTS_ASYNC_VIEWS = env.bool("DJANGO_POSTS_ASYNC_VIEWS", default=False)
+ASYNC_DB_POOL_MIN_SIZE = env.int("DJANGO_ASYNC_DB_POOL_MIN_SIZE", default=1)
+ASYNC_DB_POOL_MAX_SIZE = env.int("DJANGO_ASYNC_DB_POOL_MAX_SIZE", default=10)
+# New comments pushed over the websocket to clients following the post, through Redis
+# pub/sub; an empty URL turns it off. See strata_blog.users.live_comments
+LIVE_COMMENTS_REDIS_URL = env("REDIS_URL", default="")
+LIVE_COMMENTS_MAX_SUBSCRIPTIONS = 20
+LIVE_COMMENTS_MAX_PENDING = 100
+# Transaction of GET/HEAD/OPTIONS requests to the post views instead of ATOMIC_REQUESTS:
+# "atomic", "read_only" or "autocommit". See strata_blog.users.transactions
+SAFE_REQUESTS_TRANSACTION = env("DJANGO_SAFE_REQUESTS_TRANSACTION", default="atomic")
+# OPTIONS["pool"] of the databases when production turns DATABASE_POOL on: at most max_size
+# connections per process and alias, timeout seconds to wait for one. See strata_blog.users.postgresql_pool
+DATABASE_POOL_OPTIONS = {
+    "min_size": env.int("DATABASE_POOL_MIN_SIZE", default=2),
+    "max_size": env.int("DATABASE_POOL_MAX_SIZE", default=10),
+    "timeout": env.float("DATABASE_POOL_TIMEOUT", default=10),
+    "max_idle": env.float("DATABASE_POOL_MAX_IDLE", default=600),
+}
+# Write-behind comments: add_comment appends to a Redis stream and answers 202, a Celery task
+# inserts them in batches at most COMMENT_BUFFER_MAX_LAG seconds later; past
+# COMMENT_BUFFER_MAX_LENGTH pending ones new comments get 503. See strata_blog.users.comment_buffer
+COMMENTS_BUFFERED = env.bool("DJANGO_COMMENTS_BUFFERED", default=False)
+COMMENT_BUFFER_REDIS_URL = env("COMMENT_BUFFER_REDIS_URL", default=env("REDIS_URL", default=""))
+COMMENT_BUFFER_MAX_LAG = env.int("DJANGO_COMMENT_BUFFER_MAX_LAG", default=2)
+COMMENT_BUFFER_MAX_LENGTH = env.int("DJANGO_COMMENT_BUFFER_MAX_LENGTH", default=50_000)
+COMMENT_BUFFER_BATCH_SIZE = 500
+COMMENT_BUFFER_FLUSH_BATCHES = 20
+if MEDIA_CONTENT_ADDRESSED:
+    STORAGES = {
+        "default": {
+            "BACKEND": "strata_blog.users.storage.ContentAddressedStorage",
+            "OPTIONS": {"storage": {"BACKEND": "django.core.files.storage.FileSystemStorage"}},
+        },
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        },
+    }
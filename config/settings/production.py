@@ -8,8 +8,12 @@ from sentry_sdk.integrations.logging import LoggingIntegration
 from sentry_sdk.integrations.redis import RedisIntegration
 
 from .base import *  # noqa: F403
+from .base import DATABASE_POOL_OPTIONS
+from .base import DATABASE_REPLICAS
 from .base import DATABASES
 from .base import INSTALLED_APPS
+from .base import MEDIA_CACHE_CONTROL
+from .base import MEDIA_CONTENT_ADDRESSED
 from .base import SPECTACULAR_SETTINGS
 from .base import env
 
@@ -22,7 +26,19 @@ ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["example.com"])
 
 # DATABASES
 # ------------------------------------------------------------------------------
-DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
+# Connections from a psycopg pool per worker instead of one per request thread
+DATABASE_POOL = env.bool("DATABASE_POOL", default=True)
+for alias in ["default", *DATABASE_REPLICAS]:
+    if DATABASE_POOL:
+        DATABASES[alias]["ENGINE"] = "strata_blog.users.postgresql_pool"
+        DATABASES[alias]["CONN_MAX_AGE"] = 0
+        DATABASES[alias]["OPTIONS"] = {**DATABASES[alias].get("OPTIONS", {}), "pool": DATABASE_POOL_OPTIONS}
+    else:
+        DATABASES[alias]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
+# Served over ASGI (compose/production/django/start)
+POSTS_ASYNC_VIEWS = env.bool("DJANGO_POSTS_ASYNC_VIEWS", default=True)
+# Reads of the post views hold no transaction open
+SAFE_REQUESTS_TRANSACTION = env("DJANGO_SAFE_REQUESTS_TRANSACTION", default="autocommit")
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -91,6 +107,21 @@ STORAGES = {
     },
 }
 MEDIA_URL = f"https://storage.googleapis.com/{GS_BUCKET_NAME}/media/"
+if MEDIA_CONTENT_ADDRESSED:
+    STORAGES["default"] = {
+        "BACKEND": "strata_blog.users.storage.ContentAddressedStorage",
+        "OPTIONS": {
+            "storage": {
+                "BACKEND": "storages.backends.gcloud.GoogleCloudStorage",
+                "OPTIONS": {
+                    "location": "media",
+                    # Одинаковое имя - одинаковое содержимое
+                    "file_overwrite": True,
+                    "object_parameters": {"cache_control": MEDIA_CACHE_CONTROL},
+                },
+            },
+        },
+    }
 
 # EMAIL
 # ------------------------------------------------------------------------------
@@ -136,6 +167,7 @@ LOGGING = {
         "verbose": {
             "format": "%(levelname)s %(asctime)s %(module)s %(process)d %(thread)d %(message)s",
         },
+        "message": {"format": "%(message)s"},
     },
     "handlers": {
         "console": {
@@ -143,6 +175,11 @@ LOGGING = {
             "class": "logging.StreamHandler",
             "formatter": "verbose",
         },
+        "access": {
+            "level": "INFO",
+            "class": "logging.StreamHandler",
+            "formatter": "message",
+        },
     },
     "root": {"level": "INFO", "handlers": ["console"]},
     "loggers": {
@@ -158,6 +195,7 @@ LOGGING = {
             "handlers": ["console"],
             "propagate": False,
         },
+        "strata_blog.access": {"level": "INFO", "handlers": ["access"], "propagate": False},
     },
 }
 
@@ -39,3 +39,5 @@ MEDIA_URL = "http://media.testserver"
 WEBPACK_LOADER["DEFAULT"]["LOADER_CLASS"] = "webpack_loader.loaders.FakeWebpackLoader"  # noqa: F405
 # Your stuff...
 # ------------------------------------------------------------------------------
+# No Redis in tests: live comments are off unless a test turns them on
+LIVE_COMMENTS_REDIS_URL = ""
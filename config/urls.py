@@ -9,21 +9,26 @@ from django.views import defaults as default_views
 from drf_spectacular.views import SpectacularAPIView
 from drf_spectacular.views import SpectacularSwaggerView
 from rest_framework.authtoken.views import obtain_auth_token
-from strata_blog.users.views import HomePageView, BlogDetailView, CreatePostView
+from strata_blog.users.metrics import metrics_view
+from strata_blog.users.storage import serve as serve_media
+from strata_blog.users.transactions import safe_requests
+from strata_blog.users.views import HomePageView, BlogDetailView, CreatePostView, SearchView
 
 urlpatterns = [
-    path("", HomePageView.as_view(), name="home"),
+    path("", safe_requests(HomePageView.as_view()), name="home"),
     path('create/', CreatePostView.as_view(), name='create_post'),
+    path('search/', safe_requests(SearchView.as_view()), name='search'),
     # Django Admin, use {% url 'admin:index' %}
     path(settings.ADMIN_URL, admin.site.urls),
     # User management
     path("users/", include("strata_blog.users.urls", namespace="users")),
     path("accounts/", include("allauth.urls")),
-    path('posts/<int:pk>/', BlogDetailView.as_view(), name='blog_detail'),
+    path('posts/<int:pk>/', safe_requests(BlogDetailView.as_view()), name='blog_detail'),
     # Your stuff: custom urls includes go here
+    path('metrics', metrics_view, name='metrics'),
     # ...
     # Media files
-    *static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
+    *static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT),
 ]
 if settings.DEBUG:
     # Static file serving when using Gunicorn + Uvicorn for local web socket development
@@ -1,13 +1,31 @@
+import asyncio
+
+from strata_blog.users.live_comments import Subscriber
+
+
 async def websocket_application(scope, receive, send):
-    while True:
-        event = await receive()
+    # Все исходящие сообщения идут через очередь подписчика (см. live_comments)
+    subscriber = Subscriber()
+    writer = None
+    try:
+        while True:
+            event = await receive()
 
-        if event["type"] == "websocket.connect":
-            await send({"type": "websocket.accept"})
+            if event["type"] == "websocket.connect":
+                await send({"type": "websocket.accept"})
+                writer = asyncio.create_task(subscriber.write(send))
 
-        if event["type"] == "websocket.disconnect":
-            break
+            if event["type"] == "websocket.disconnect":
+                break
 
-        if event["type"] == "websocket.receive":
-            if event["text"] == "ping":
-                await send({"type": "websocket.send", "text": "pong!"})
+            if event["type"] == "websocket.receive":
+                text = event.get("text")
+                if text == "ping":
+                    subscriber.reply("pong!")
+                elif text:
+                    await subscriber.handle(text)
+    finally:
+        if writer is not None:
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+        await subscriber.close()
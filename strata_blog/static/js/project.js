@@ -1,3 +1,75 @@
 import '../sass/project.scss';
 
 /* Project specific Javascript goes here. */
+
+/* Blurred previews of post images (data-blurhash, see strata_blog/users/placeholders.py) */
+const BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~';
+const PREVIEW_SIZE = 32;
+
+const decode83 = (str) => [...str].reduce((value, char) => value * 83 + BASE83.indexOf(char), 0);
+
+const srgbToLinear = (value) => {
+  const v = value / 255;
+  return v <= 0.04045 ? v / 12.92 : ((v + 0.055) / 1.055) ** 2.4;
+};
+
+const linearToSrgb = (value) => {
+  const v = Math.max(0, Math.min(1, value));
+  return Math.round((v <= 0.0031308 ? v * 12.92 : 1.055 * v ** (1 / 2.4) - 0.055) * 255);
+};
+
+const signPow = (value, exponent) => Math.sign(value) * Math.abs(value) ** exponent;
+
+function decodeBlurhash(hash, width, height) {
+  const sizeFlag = decode83(hash[0]);
+  const xComponents = (sizeFlag % 9) + 1;
+  const yComponents = Math.floor(sizeFlag / 9) + 1;
+  const maxValue = (decode83(hash[1]) + 1) / 166;
+
+  const dc = decode83(hash.slice(2, 6));
+  const colors = [[dc >> 16, (dc >> 8) & 255, dc & 255].map(srgbToLinear)];
+  for (let i = 1; i < xComponents * yComponents; i++) {
+    const value = decode83(hash.slice(4 + i * 2, 6 + i * 2));
+    colors.push(
+      [Math.floor(value / 361), Math.floor(value / 19) % 19, value % 19].map(
+        (q) => signPow((q - 9) / 9, 2) * maxValue,
+      ),
+    );
+  }
+
+  const pixels = new Uint8ClampedArray(width * height * 4);
+  for (let y = 0; y < height; y++) {
+    for (let x = 0; x < width; x++) {
+      const rgb = [0, 0, 0];
+      for (let j = 0; j < yComponents; j++) {
+        for (let i = 0; i < xComponents; i++) {
+          const basis = Math.cos((Math.PI * x * i) / width) * Math.cos((Math.PI * y * j) / height);
+          const color = colors[j * xComponents + i];
+          rgb[0] += color[0] * basis;
+          rgb[1] += color[1] * basis;
+          rgb[2] += color[2] * basis;
+        }
+      }
+      const offset = 4 * (y * width + x);
+      pixels.set([...rgb.map(linearToSrgb), 255], offset);
+    }
+  }
+  return pixels;
+}
+
+window.addEventListener('DOMContentLoaded', () => {
+  document.querySelectorAll('img[data-blurhash]').forEach((img) => {
+    if (img.complete && img.naturalWidth) {
+      return;
+    }
+    const canvas = document.createElement('canvas');
+    canvas.width = canvas.height = PREVIEW_SIZE;
+    const pixels = decodeBlurhash(img.dataset.blurhash, PREVIEW_SIZE, PREVIEW_SIZE);
+    canvas.getContext('2d').putImageData(new ImageData(pixels, PREVIEW_SIZE, PREVIEW_SIZE), 0, 0);
+    img.style.backgroundImage = `url(${canvas.toDataURL()})`;
+    img.style.backgroundSize = '100% 100%';
+    img.addEventListener('load', () => {
+      img.style.backgroundImage = '';
+    }, { once: true });
+  });
+});
@@ -1,12 +1,21 @@
+import json
+
 from allauth.account.decorators import secure_admin_login
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import admin as auth_admin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
 from django.utils.translation import gettext_lazy as _
 
+from . import counting
+from . import response_cache
 from .forms import UserAdminChangeForm
 from .forms import UserAdminCreationForm
-from .models import User, Post, Comment
+from .models import Comment
+from .models import Post
+from .models import SlowQuery
+from .models import User
 
 if settings.DJANGO_ADMIN_FORCE_ALLAUTH:
     # Force the `admin` sign in process to go through the `django-allauth` workflow:
@@ -49,5 +58,68 @@ class UserAdmin(auth_admin.UserAdmin):
         ),
     )
 
-admin.site.register(Post)
-admin.site.register(Comment)
+@admin.register(Post)
+class PostAdmin(admin.ModelAdmin):
+    # icontains searches hit the UPPER(...) gin_trgm_ops indexes
+    search_fields = ["title"]
+    autocomplete_fields = ["author"]
+
+    def delete_queryset(self, request, queryset):
+        posts = list(queryset.values_list("id", "author_id"))
+        super().delete_queryset(request, queryset)
+        for post_id, author_id in posts:
+            counting.post_deleted(author_id)
+            response_cache.post_deleted(post_id, author_id)
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    search_fields = ["author_name"]
+    autocomplete_fields = ["post"]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Moving a comment to another post leaves the old post's summary stale
+        if change and "post" in form.changed_data and form.initial.get("post"):
+            Post.refresh_comment_summary([form.initial["post"]])
+            response_cache.comments_changed(form.initial["post"])
+
+    def delete_queryset(self, request, queryset):
+        post_ids = list(queryset.values_list("post_id", flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        Post.refresh_comment_summary(post_ids)
+        for post_id in post_ids:
+            response_cache.comments_changed(post_id)
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "calls", "mean_ms", "max_ms", "plan_analyzed", "last_seen"]
+    list_filter = ["plan_analyzed"]
+    search_fields = ["sql"]
+    ordering = ["-max_ms"]
+    actions = ["export_ndjson"]
+    export_fields = [
+        "fingerprint", "sql", "params_shape", "calls", "total_ms", "max_ms", "last_ms",
+        "first_seen", "last_seen", "plan", "plan_analyzed", "plan_captured_at",
+    ]
+
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description=_("Mean ms"))
+    def mean_ms(self, obj):
+        return round(obj.mean_ms, 1)
+
+    @admin.action(description=_("Export selected as NDJSON"))
+    def export_ndjson(self, request, queryset):
+        lines = (
+            json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+            for row in queryset.values(*self.export_fields)
+        )
+        response = HttpResponse("".join(lines), content_type="application/x-ndjson")
+        response["Content-Disposition"] = 'attachment; filename="slow_queries.ndjson"'
+        return response
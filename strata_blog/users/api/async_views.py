@@ -0,0 +1,183 @@
+"""
+Async versions of the hot ``PostViewSet`` actions (list, retrieve and
+add_comment) for the ASGI deployment, mounted in front of the router by
+``config/api_router.py`` when ``POSTS_ASYNC_VIEWS`` is on.
+
+They answer like the viewset (same JSON, validators, permissions and error
+bodies) but await ``async_services`` instead of running in a thread, so a
+worker keeps serving other requests while these wait on Postgres. Requests
+they do not handle (other methods on the same URLs, the browsable API,
+``?format=``) go to the viewset. Under WSGI leave them off: every async view
+would then run in its own event loop.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authentication import CSRFCheck
+
+from strata_blog.users import async_db
+from strata_blog.users import async_services
+from strata_blog.users import comment_buffer
+from strata_blog.users import conditional
+from strata_blog.users import services
+
+from .renderers import JSONRenderer
+from .views import PostViewSet
+
+# Как TokenAuthentication: неактивный пользователь не проходит
+TOKEN_USER_QUERY = """
+SELECT u.id
+FROM authtoken_token t
+JOIN users_user u ON u.id = t.user_id
+WHERE t.key = %s AND u.is_active
+"""  # noqa: S105
+
+
+def _sync(actions, detail):
+    # PostViewSet.as_view applies ATOMIC_REQUESTS itself (see transactions.safe_requests)
+    return sync_to_async(PostViewSet.as_view(actions, basename='posts', detail=detail))
+
+
+_sync_list = _sync({'get': 'list', 'post': 'create'}, detail=False)
+_sync_detail = _sync({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}, detail=True)
+_sync_add_comment = _sync({'post': 'add_comment'}, detail=True)
+
+
+def _json(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _wants_viewset(request):
+    # Browsable API and ?format= are the viewset's content negotiation
+    return conditional.renderer_format(request) != 'json'
+
+
+def _conditional(request, validators):
+    """
+    What ``django.views.decorators.http.condition`` does around a view: return
+    ``(304/412 response or None, function adding ETag/Last-Modified)``.
+    """
+    etag, last_modified = validators
+    etag = quote_etag(etag) if etag is not None else None
+    if last_modified is not None:
+        last_modified = int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    def finish(response):
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        # Как у PostViewSet: JSON и browsable API по одному URL
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    return response, finish
+
+
+@csrf_exempt
+@transaction.non_atomic_requests
+async def post_list(request):
+    if request.method not in ('GET', 'HEAD') or _wants_viewset(request):
+        return await _sync_list(request)
+
+    try:
+        query = services.list_params(request.GET)
+    except services.InvalidQueryError as e:
+        return _json({'detail': str(e)}, status=400)
+    response, finish = _conditional(request, await async_services.post_list_validators(query))
+    if response is not None:
+        return finish(response)
+
+    try:
+        data = await async_services.list_posts(request.GET)
+    except services.InvalidQueryError as e:
+        return _json({'detail': str(e)}, status=400)
+    return finish(_json(data))
+
+
+@csrf_exempt
+@transaction.non_atomic_requests
+async def post_detail(request, pk):
+    if request.method not in ('GET', 'HEAD') or _wants_viewset(request):
+        return await _sync_detail(request, pk=pk)
+
+    try:
+        pk = int(pk)
+    except ValueError:
+        return _json({'detail': 'Not found.'}, status=404)
+    validators = await async_services.post_validators(pk)
+    response, finish = _conditional(request, validators)
+    if response is not None:
+        return finish(response)
+
+    post_data = await async_services.get_post(pk)
+    if post_data is None:
+        return _json({'detail': 'Not found.'}, status=404)
+    return finish(_json(post_data))
+
+
+@csrf_exempt
+@transaction.non_atomic_requests
+async def post_add_comment(request, pk):
+    # Буфер комментариев (comment_buffer) пишет в Redis синхронно
+    if request.method != 'POST' or _wants_viewset(request) or comment_buffer.enabled():
+        return await _sync_add_comment(request, pk=pk)
+
+    error = await _authentication_error(request)
+    if error is not None:
+        return _json({'detail': error}, status=403)
+    try:
+        pk = int(pk)
+    except ValueError:
+        return _json({'detail': 'Not found.'}, status=404)
+
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError as e:
+            return _json({'detail': f'JSON parse error - {e}'}, status=400)
+        if not isinstance(data, dict):
+            data = {}
+    else:
+        data = request.POST
+    author_name = data.get('author_name')
+    content = data.get('content')
+    # Как PostViewSet.add_comment
+    error = comment_buffer.validate(author_name, content)
+    if error is not None:
+        return _json({'detail': error}, status=400)
+    if not await async_services.post_exists(pk):
+        return _json({'detail': 'Not found.'}, status=404)
+
+    await async_services.add_comment(pk, author_name, content)
+    return HttpResponse(status=201)
+
+
+async def _authentication_error(request):
+    """
+    ``REST_FRAMEWORK`` authentication for ``IsAuthenticated``: a token, else the
+    session, which must pass the CSRF check. Return the error or ``None``.
+    """
+    header = request.headers.get('Authorization', '').split()
+    if header and header[0].lower() == 'token':
+        if len(header) != 2:  # noqa: PLR2004
+            return 'Invalid token header.'
+        row = await async_db.fetchone(TOKEN_USER_QUERY, [header[1]])
+        return None if row is not None else 'Invalid token.'
+
+    user = await request.auser()
+    if not user.is_authenticated or not user.is_active:
+        return 'Authentication credentials were not provided.'
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)
+    reason = check.process_view(request, None, (), {})
+    return f'CSRF Failed: {reason}' if reason else None
@@ -0,0 +1,78 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from rest_framework.pagination import PageNumberPagination
+
+
+class PostPagination(PageNumberPagination):
+    page_size = 10  # Количество постов на странице
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CommentPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class PostCursor:
+    """
+    Opaque keyset cursor over ``(<sort column>, id)``.
+
+    The cursor remembers the sort key and id of the last row of a page, so the
+    next page is fetched with ``WHERE (p.<sort>, p.id) < (%s, %s)`` from the
+    matching composite index instead of skipping ``OFFSET`` rows.
+    """
+
+    # sort_by value -> (encode, decode) for the column value stored in the cursor
+    sort_fields = {
+        'created_at': (lambda value: value.isoformat(), datetime.fromisoformat),
+        'title': (str, str),
+        'author_id': (int, int),
+    }
+
+    def __init__(self, sort_by, value, pk):
+        self.sort_by = sort_by
+        self.value = value
+        self.pk = pk
+
+    def encode(self):
+        encode_value, _ = self.sort_fields[self.sort_by]
+        payload = json.dumps(
+            {'s': self.sort_by, 'v': encode_value(self.value), 'id': self.pk},
+            separators=(',', ':'),
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    @classmethod
+    def decode(cls, cursor, sort_by):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if payload['s'] != sort_by:
+                raise InvalidCursorError('Cursor does not match sort_by.')
+            _, decode_value = cls.sort_fields[sort_by]
+            return cls(sort_by, decode_value(payload['v']), int(payload['id']))
+        except InvalidCursorError:
+            raise
+        except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+            raise InvalidCursorError('Invalid cursor.') from e
+
+
+class CommentCursor(PostCursor):
+    """Keyset cursor over ``(created_at, id)`` of a post's comments, newest first."""
+
+    sort_fields = {'created_at': PostCursor.sort_fields['created_at']}
+
+
+class SearchCursor(PostCursor):
+    """Keyset cursor over ``(rank, id)`` of full-text search results."""
+
+    sort_fields = {'rank': (float, float)}
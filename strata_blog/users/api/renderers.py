@@ -0,0 +1,11 @@
+from rest_framework import renderers
+
+from strata_blog.users import metrics
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """``JSONRenderer`` that reports its time as ``serialize`` in Server-Timing."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.measure("serialize"):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 
-from strata_blog.users.models import Post, User, Comment
+from strata_blog.users.models import Comment
+from strata_blog.users.models import Post
+from strata_blog.users.models import User
 
 
 class UserSerializer(serializers.ModelSerializer[User]):
@@ -28,20 +30,11 @@ class CommentSerializer(serializers.ModelSerializer):
 class PostSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
-    last_comment_date = serializers.SerializerMethodField()
-    last_comment_author = serializers.SerializerMethodField()
+    last_comment_date = serializers.DateTimeField(source='last_comment_at', read_only=True)
 
     class Meta:
         model = Post
-        fields = ['id', 'title', 'author', 'created_at','image_path', 'last_comment_date', 'last_comment_author', 'comments']
-
-    def get_last_comment_date(self, obj):
-        last_comment = obj.comments.order_by('-created_at').first()
-        return last_comment.created_at if last_comment else None
-
-    def get_last_comment_author(self, obj):
-        last_comment = obj.comments.order_by('-created_at').first()
-        return last_comment.author_name if last_comment else None
+        fields = ['id', 'title', 'author', 'created_at','image_path', 'image_variants', 'image_blurhash', 'image_color', 'last_comment_date', 'last_comment_author', 'comment_count', 'comments']
 
 class PostDetailSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
@@ -49,4 +42,4 @@ class PostDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = ['id', 'title', 'content', 'author', 'image_path', 'comments']
+        fields = ['id', 'title', 'content', 'author', 'image_path', 'image_variants', 'image_blurhash', 'image_color', 'comments']
@@ -1,14 +1,36 @@
+from django.conf import settings
+from django.db import ProgrammingError
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.mixins import ListModelMixin, RetrieveModelMixin, UpdateModelMixin
+from rest_framework.mixins import ListModelMixin
+from rest_framework.mixins import RetrieveModelMixin
+from rest_framework.mixins import UpdateModelMixin
+from rest_framework.permissions import AllowAny
+from rest_framework.permissions import IsAdminUser
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.viewsets import GenericViewSet, ModelViewSet
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.views import APIView
+from rest_framework.viewsets import GenericViewSet
+from rest_framework.viewsets import ModelViewSet
+
+from strata_blog.users import autocomplete
+from strata_blog.users import bulk_import
+from strata_blog.users import comment_buffer
+from strata_blog.users import conditional
+from strata_blog.users import export
+from strata_blog.users import replicas
+from strata_blog.users import services
+from strata_blog.users import transactions
+from strata_blog.users.models import User
+
+from .pagination import PostPagination
+from .serializers import PostSerializer
+from .serializers import UserSerializer
 
-from strata_blog.users.models import Post, User
-from .serializers import UserSerializer, PostSerializer
-from django.db import connection, ProgrammingError
 
 class UserViewSet(RetrieveModelMixin, ListModelMixin, UpdateModelMixin, GenericViewSet):
     serializer_class = UserSerializer
@@ -24,22 +46,31 @@ class UserViewSet(RetrieveModelMixin, ListModelMixin, UpdateModelMixin, GenericV
         serializer = UserSerializer(request.user, context={"request": request})
         return Response(status=status.HTTP_200_OK, data=serializer.data)
 
-class PostPagination(PageNumberPagination):
-    page_size = 10  # Количество постов на странице
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class PostViewSet(ModelViewSet):
     serializer_class = PostSerializer
     pagination_class = PostPagination
+    # Способ подсчёта total_count (None - из настроек); клиент может выбрать другой через ?count=
+    count_mode = None
+    author_count_mode = None
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        return transactions.safe_requests(super().as_view(actions, **initkwargs))
 
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy', 'add_comment']:
             return [IsAuthenticated()]
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'comments', 'search', 'autocomplete']:
             return [AllowAny()]
+        if self.action == 'export':
+            return [IsAdminUser()]
         return []
 
+    def get_count_mode(self, author_id=None):
+        if author_id:
+            return self.author_count_mode or services.default_count_mode(author_id)
+        return self.count_mode or services.default_count_mode()
+
     def get_queryset(self):
         sort_by = self.request.query_params.get('sort_by', 'created_at')
         author_id = self.request.query_params.get('author_id')
@@ -48,251 +79,166 @@ class PostViewSet(ModelViewSet):
         if sort_by not in allowed_sort_fields:
             sort_by = 'created_at'
 
-        query = """
-        SELECT
-            p.id,
-            p.title,
-            p.short_description,
-            p.created_at,
-            u.id as author_id,
-            u.name, u.email,
-            p.image_path,
-            COALESCE(MAX(c.created_at), NULL) as last_comment_date,
-            COALESCE(
-                (SELECT c2.author_name
-                FROM users_comment c2
-                WHERE c2.post_id = p.id
-                ORDER BY c2.created_at DESC
-                LIMIT 1), '') as last_comment_author
-        FROM users_post p
-        JOIN users_user u ON p.author_id = u.id
-        LEFT JOIN users_comment c ON c.post_id = p.id
-        """
+        query = services.POST_LIST_QUERY
 
         # Параметризованный SQL-запрос
         params = []
         if author_id:
-            query += " WHERE u.id = %s"
+            query += " WHERE p.author_id = %s"
             params.append(author_id)
 
-        query += f" GROUP BY p.id, p.title, p.short_description, u.id, u.name, u.email, p.image_path ORDER BY p.{sort_by} DESC;"
+        query += f" ORDER BY p.{sort_by} DESC;"
 
-        with connection.cursor() as cursor:
+        with replicas.read_connection().cursor() as cursor:
             cursor.execute(query, params)
             results = cursor.fetchall()
 
-        return [
-            {
-                'id': row[0],
-                'title': row[1],
-                'short_description': row[2],
-                'created_at': row[3],
-                'author': {
-                    'id': row[4],
-                    'name': row[5],
-                    'email': row[6],
-                },
-                'image_path': row[7],
-                'last_comment_date': row[8],
-                'last_comment_author': row[9]
-            } for row in results
-        ]
-
+        return [services.post_list_item(row) for row in results]
 
+    @method_decorator(vary_on_headers('Accept'))
+    @method_decorator(condition(
+        etag_func=conditional.negotiated(conditional.post_list_etag),
+        last_modified_func=conditional.post_list_last_modified,
+    ))
     def list(self, request, *args, **kwargs):
-        page_number = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', self.pagination_class.page_size))
-        sort_by = request.GET.get('sort_by', 'created_at')  # Получаем параметр сортировки
-        author_id = request.GET.get('author_id', None)
-
-        # Определите смещение для SQL-запроса
-        offset = (page_number - 1) * page_size
-
-        # Получите общее количество постов для пагинации
-        count_query = "SELECT COUNT(*) FROM users_post"
-
-        if author_id:
-            count_query += f" WHERE author_id = {author_id}"
-
-        with connection.cursor() as cursor:
-            cursor.execute(count_query)
-            total_count = cursor.fetchone()[0]
-
-        # Проверка допустимости поля сортировки
-        allowed_sort_fields = ['created_at', 'title', 'author_id']
-        if sort_by not in allowed_sort_fields:
-            sort_by = 'created_at'
-
-        # Основной SQL-запрос с пагинацией
-        query = f"""
-        SELECT
-            p.id,
-            p.title,
-            p.short_description,
-            p.created_at,
-            u.id as author_id,
-            u.name, u.email,
-            p.image_path,
-            COALESCE(MAX(c.created_at), NULL) as last_comment_date,
-            COALESCE(
-                (SELECT c2.author_name
-                FROM users_comment c2
-                WHERE c2.post_id = p.id
-                ORDER BY c2.created_at DESC
-                LIMIT 1), '') as last_comment_author
-        FROM users_post p
-        JOIN users_user u ON p.author_id = u.id
-        LEFT JOIN users_comment c ON c.post_id = p.id
-        """
-        if author_id:
-            query += f" WHERE p.author_id = {author_id}"
-        query += f" GROUP BY p.id, p.title, p.short_description, u.id, u.name, u.email, p.image_path"
-        query += f" ORDER BY p.{sort_by} DESC"
-        query += f" LIMIT %s OFFSET %s;"
-
-        with connection.cursor() as cursor:
-            cursor.execute(query, [page_size, offset])
-            results = cursor.fetchall()
-
-        # Формирование ответа
-        posts = [
-            {
-                'id': row[0],
-                'title': row[1],
-                'short_description': row[2],
-                'created_at': row[3],
-                'author': {
-                    'id': row[4],
-                    'name': row[5],
-                    'email': row[6],
-                },
-                'image_path': row[7],
-                'last_comment_date': row[8],
-                'last_comment_author': row[9]
-            } for row in results
-        ]
-
-        # Формирование ответа с пагинацией
-        response_data = {
-            'total_count': total_count,
-            'page_size': page_size,
-            'current_page': page_number,
-            'total_pages': (total_count // page_size) + (1 if total_count % page_size > 0 else 0),
-            'posts': posts
-        }
-
-        return Response(response_data)
-
-
+        count_mode = self.get_count_mode(request.GET.get('author_id'))
+        try:
+            data = services.list_posts(request.GET, count_mode=count_mode)
+        except services.InvalidQueryError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+    @method_decorator(vary_on_headers('Accept'))
+    @method_decorator(condition(
+        etag_func=conditional.negotiated(conditional.post_etag),
+        last_modified_func=conditional.post_last_modified,
+    ))
     def retrieve(self, request, pk):
-        query = """
-        SELECT
-            p.id,
-            p.title,
-            p.content,
-            u.id as author_id,
-            u.name, u.email,
-            p.image_path,
-            c.id as comment_id,
-            c.author_name,
-            c.content as comment_content,
-            c.created_at as comment_created_at
-        FROM users_post p
-        JOIN users_user u ON p.author_id = u.id
-        LEFT JOIN users_comment c ON c.post_id = p.id
-        WHERE p.id = %s
-        ORDER BY c.created_at DESC;
-        """
-
-        with connection.cursor() as cursor:
-            cursor.execute(query, [pk])
-            results = cursor.fetchall()
-
-        if not results:
+        post_data = services.get_post(pk)
+        if post_data is None:
             return Response({"detail": "Not found."}, status=404)
-
-        post_data = {
-            'id': results[0][0],
-            'title': results[0][1],
-            'content': results[0][2],
-            'author': {
-                'id': results[0][3],
-                'name': results[0][4],
-                'email': results[0][5],
-            },
-            'image_path': results[0][6],
-            'comments': []
-        }
-
-        for row in results:
-            if row[7] is not None:
-                post_data['comments'].append({
-                    'id': row[7],
-                    'author_name': row[8],
-                    'content': row[9],
-                    'created_at': row[10],
-                })
-
         return Response(post_data)
 
     def update(self, request, pk=None, partial=False):
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT author_id FROM users_post WHERE id = %s", [pk])
-            author_id = cursor.fetchone()
-            if author_id is None or author_id[0] != request.user.id:
-                return Response({"detail": "Not permission to update this post."}, status=status.HTTP_403_FORBIDDEN)
-
-            fields_to_update = []
-            values = []
-
-            if 'title' in request.data:
-                fields_to_update.append("title = %s")
-                values.append(request.data['title'])
-            if 'short_description' in request.data:
-                fields_to_update.append("short_description = %s")
-                values.append(request.data['short_description'])
-            if 'content' in request.data:
-                fields_to_update.append("content = %s")
-                values.append(request.data['content'])
-            if 'image_path' in request.data:
-                fields_to_update.append("image_path = %s")
-                values.append(request.data['image_path'])
-
-            if not fields_to_update:
-                return Response({"detail": "No fields to update."}, status=status.HTTP_400_BAD_REQUEST)
-
-            query = f"UPDATE users_post SET {', '.join(fields_to_update)} WHERE id = %s"
-            values.append(pk)
-            cursor.execute(query, values)
+        author_id = services.get_post_author_id(pk)
+        if author_id is None or author_id != request.user.id:
+            return Response({"detail": "Not permission to update this post."}, status=status.HTTP_403_FORBIDDEN)
 
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        if not services.update_post(pk, author_id, request.data):
+            return Response({"detail": "No fields to update."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     def destroy(self, request, pk=None):
         try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT author_id FROM users_post WHERE id = %s", [pk])
-                author_id = cursor.fetchone()
-                if author_id is None or author_id[0] != request.user.id:
-                    return Response({"detail": "Not permission to delete this post."}, status=status.HTTP_403_FORBIDDEN)
-
-                cursor.execute("DELETE FROM users_post WHERE id = %s", [pk])
-                return Response(status=status.HTTP_204_NO_CONTENT)
+            author_id = services.get_post_author_id(pk)
+            if author_id is None or author_id != request.user.id:
+                return Response({"detail": "Not permission to delete this post."}, status=status.HTTP_403_FORBIDDEN)
+
+            services.delete_post(pk, author_id)
+            return Response(status=status.HTTP_204_NO_CONTENT)
         except ProgrammingError as e:
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        try:
+            data = services.search_posts(request.GET)
+        except services.InvalidQueryError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """``?q=<prefix>&kind=title|author`` (both kinds when ``kind`` is omitted)."""
+        text = request.GET.get('q', '')
+        kinds = [request.GET['kind']] if request.GET.get('kind') else autocomplete.KINDS
+        if any(kind not in autocomplete.KINDS for kind in kinds):
+            return Response({"detail": "Invalid kind."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 10)), 50))
+        except ValueError:
+            return Response({"detail": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({kind: autocomplete.complete(kind, text, limit) for kind in kinds})
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<kind>posts|comments)')
+    def export(self, request, kind):
+        """Stream every post or comment as ``?fmt=ndjson`` (default) or ``?fmt=csv``."""
+        # ?format= занят DRF под выбор рендерера
+        fmt = request.GET.get('fmt', 'ndjson')
+        if fmt not in export.FORMATS:
+            return Response({"detail": "Invalid fmt."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            export.streaming_content(request._request, export.iter_export(kind, fmt)),  # noqa: SLF001
+            content_type=export.FORMATS[fmt],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        try:
+            data = services.list_comments(pk, request.GET)
+        except services.InvalidQueryError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if data is None:
+            return Response({"detail": "Not found."}, status=404)
+        return Response(data)
+
     @action(detail=True, methods=['post'])
     def add_comment(self, request, pk=None):
-        post_id = pk
         author_name = request.data.get('author_name')
         content = request.data.get('content')
 
-        if not author_name or not content:
-            return Response({"detail": "Author name and content are required."}, status=status.HTTP_400_BAD_REQUEST)
+        # Одинаковые 400/404 с буфером и без: иначе БД отвечала бы 500
+        error = comment_buffer.validate(author_name, content)
+        if error is not None:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            post_id = int(pk)
+        except ValueError:
+            post_id = None
+        if post_id is None or not services.post_exists(post_id):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if comment_buffer.enabled():
+            return self.buffer_comment(post_id, author_name, content)
 
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO users_comment (post_id, author_name, content)
-                VALUES (%s, %s, %s)
-            """, [post_id, author_name, content])
+        services.add_comment(post_id, author_name, content)
 
         return Response(status=status.HTTP_201_CREATED)
+
+    def buffer_comment(self, post_id, author_name, content):
+        try:
+            buffer_id = comment_buffer.buffer_comment(post_id, author_name, content)
+        except comment_buffer.BufferFullError:
+            return Response(
+                {"detail": "Too many comments are waiting to be saved, try again later."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(settings.COMMENT_BUFFER_MAX_LAG)},
+            )
+        # Комментарий появится после выгрузки буфера, не позже COMMENT_BUFFER_MAX_LAG
+        return Response({"buffer_id": buffer_id}, status=status.HTTP_202_ACCEPTED)
+
+
+class PostImportView(APIView):
+    """
+    Bulk import: ``POST`` an NDJSON body (see ``strata_blog.users.bulk_import``).
+    Mounted with ``non_atomic_requests`` so every chunk commits on its own.
+    """
+    permission_classes = [IsAdminUser]
+    # Сколько отклонённых строк вернуть в ответе; счётчик rejected - полный
+    max_reported_errors = 1000
+
+    def post(self, request):
+        errors = []
+
+        def on_error(line_no, line_errors):
+            if len(errors) < self.max_reported_errors:
+                errors.append({"line": line_no, "errors": line_errors})
+
+        # Тело читается построчно, не целиком: парсеры DRF не используются
+        totals = bulk_import.import_ndjson(request._request, on_error)  # noqa: SLF001
+        return Response({**totals, "errors": errors}, status=status.HTTP_200_OK)
@@ -0,0 +1,114 @@
+"""
+Native async access to the databases for the ASGI views.
+
+Django's connections are synchronous: under ASGI every query of a sync view
+runs in a thread via ``sync_to_async``. ``async_services`` instead runs its
+SQL here, on ``psycopg`` async connections from ``psycopg_pool`` pools (one
+per alias, ``ASYNC_DB_POOL_MIN_SIZE``..``ASYNC_DB_POOL_MAX_SIZE`` per worker),
+so one event loop serves many requests waiting on Postgres at once. Reads
+pass ``using=await replicas.aread_alias()`` and so follow the replica choice
+of the request like Django's connections do.
+
+Connections are in autocommit mode: every statement commits on its own, so
+multi-statement work that must be atomic belongs in one SQL statement (or in
+the sync code). Statements are counted in the request's ``metrics`` and slow
+ones go to ``slow_queries`` the same way as Django's, but they bypass
+``transaction.on_commit``.
+"""
+
+import asyncio
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from psycopg import AsyncClientCursor
+from psycopg_pool import AsyncConnectionPool
+
+from . import metrics
+from . import slow_queries
+
+# One set of pools (alias -> pool) per event loop: connections cannot be shared across loops
+_pools = weakref.WeakKeyDictionary()
+
+
+async def get_pool(alias=DEFAULT_DB_ALIAS):
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(alias)
+    if pool is None:
+        pool = pools[alias] = AsyncConnectionPool(
+            kwargs=_connect_kwargs(alias),
+            min_size=settings.ASYNC_DB_POOL_MIN_SIZE,
+            max_size=settings.ASYNC_DB_POOL_MAX_SIZE,
+            open=False,
+        )
+        await pool.open()
+    return pool
+
+
+async def close_pool():
+    pools = _pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
+
+
+def _connect_kwargs(alias):
+    # settings_dict, not settings.DATABASES: under tests it names the test database
+    db = connections[alias].settings_dict
+    kwargs = {
+        "dbname": db["NAME"],
+        "user": db["USER"],
+        "password": db["PASSWORD"],
+        "host": db["HOST"],
+        "port": db["PORT"],
+        "autocommit": True,
+        # Client-side binding, like Django's psycopg backend by default
+        "cursor_factory": AsyncClientCursor,
+        # Как у соединений Django (USE_TZ): даты приходят в UTC
+        "options": "-c TimeZone=UTC",
+    }
+    return {key: value for key, value in kwargs.items() if value not in (None, "")}
+
+
+async def fetchone(sql, params=None, using=DEFAULT_DB_ALIAS):
+    return await _run(sql, params, "one", using)
+
+
+async def fetchall(sql, params=None, using=DEFAULT_DB_ALIAS):
+    return await _run(sql, params, "all", using)
+
+
+async def execute(sql, params=None, using=DEFAULT_DB_ALIAS):
+    """Run a statement; return the number of affected rows."""
+    return await _run(sql, params, None, using)
+
+
+async def _run(sql, params, fetch, alias):
+    pool = await get_pool(alias)
+    started = time.perf_counter()
+    try:
+        async with pool.connection() as conn, conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            if fetch == "one":
+                return await cursor.fetchone()
+            if fetch == "all":
+                return await cursor.fetchall()
+            return cursor.rowcount
+    except Exception:
+        metrics.DB_ERRORS.labels(alias).inc()
+        raise
+    finally:
+        metrics.query_finished(alias, started)
+        metrics.record_pool(f"{alias}:async", pool)
+        duration_ms = (time.perf_counter() - started) * 1000
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold and duration_ms >= threshold:
+            # Редко: EXPLAIN и запись идут через синхронное соединение Django, в потоке
+            await sync_to_async(_record_slow)(alias, sql, params, duration_ms)
+
+
+def _record_slow(alias, sql, params, duration_ms):
+    # Соединение Django - того потока, в котором выполняется
+    slow_queries.record_slow(connections[alias], sql, params, False, duration_ms)  # noqa: FBT003
@@ -0,0 +1,124 @@
+"""
+Async counterparts of the hot ``services`` functions, for the ASGI views in
+``api/async_views.py``.
+
+The SQL, cache keys, cache tags and response shapes are the ones of
+``services``, ``counting`` and ``conditional``; only the statements run on
+``async_db`` instead of Django's connection (reads on the request's replica,
+see ``replicas.aread_alias``), and independent ones (a page and its total
+count, a post and its first comments) run concurrently. The cache calls are
+the same synchronous functions run in a thread (``_cache``), so a slow Redis
+stalls one request instead of the event loop.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+
+from . import async_db
+from . import conditional
+from . import counting
+from . import live_comments
+from . import replicas
+from . import response_cache
+from . import services
+from .api.pagination import CommentPagination
+
+
+def _cache(func):
+    # Не thread_sensitive: вызовы кэша не трогают соединения Django
+    return sync_to_async(func, thread_sensitive=False)
+
+
+async def list_posts(params, count_mode=None):
+    """``services.list_posts``."""
+    query = services.list_params(params, count_mode)
+    cache_key = response_cache.make_key('list', query)
+    data = await _cache(response_cache.get)(cache_key)
+    if data is not None:
+        return data
+
+    using = await replicas.aread_alias()
+    started = response_cache.begin()
+    if 'cursor' in query:
+        sql, sql_params = services.cursor_sql(query)
+        data = services.cursor_data(query, await async_db.fetchall(sql, sql_params, using))
+    else:
+        sql, sql_params = services.page_sql(query)
+        (total_count, count_type), results = await asyncio.gather(
+            post_count(query['count'], query['author_id']),
+            async_db.fetchall(sql, sql_params, using),
+        )
+        data = services.page_data(query, results, total_count, count_type)
+
+    await _cache(response_cache.set)(cache_key, data, services.list_tags(query, data), started)
+    return data
+
+
+async def get_post(pk):
+    """``services.get_post``; ``pk`` is an ``int``."""
+    cache_key = services.post_cache_key(pk)
+    data = await _cache(response_cache.get)(cache_key)
+    if data is not None:
+        return data
+    using = await replicas.aread_alias()
+    started = response_cache.begin()
+
+    page_size = CommentPagination.page_size
+    comments_sql, comments_params = services.comment_page_sql(pk, None, page_size)
+    row, comment_rows = await asyncio.gather(
+        async_db.fetchone(services.POST_DETAIL_QUERY, [pk], using),
+        async_db.fetchall(comments_sql, comments_params, using),
+    )
+    if row is None:
+        return None
+
+    post_data = services.post_detail(row, *services.comment_page(comment_rows, page_size))
+    await _cache(response_cache.set)(cache_key, post_data, services.post_tags(post_data), started)
+    return post_data
+
+
+async def post_exists(post_id):
+    """``services.post_exists``."""
+    row = await async_db.fetchone(services.POST_EXISTS_QUERY, [post_id], await replicas.aread_alias())
+    return row is not None
+
+
+async def add_comment(post_id, author_name, content):
+    """``services.add_comment``."""
+    row = await async_db.fetchone(services.ADD_COMMENT_QUERY, [post_id, author_name, content])
+    # Уже закоммичено (autocommit), откладывать сброс до on_commit не нужно
+    await _cache(response_cache.invalidate_committed)(response_cache.post_tag(post_id))
+    if row is not None:
+        await live_comments.apublish(post_id, row)
+
+
+async def post_count(mode, author_id=None):
+    """``counting.post_count``."""
+    if mode == counting.COUNT_EXACT:
+        count = await _cache(counting.cached_count)(author_id)
+        if count is None:
+            sql, params = counting.count_sql(author_id)
+            # Как counting._count_rows: точное количество - с primary
+            count = (await async_db.fetchone(sql, params))[0]
+            await _cache(counting.seed_count)(author_id, count)
+        return count, mode
+    if mode == counting.COUNT_ESTIMATED:
+        sql, params = counting.estimate_sql(author_id)
+        row = await async_db.fetchone(sql, params, await replicas.aread_alias())
+        return counting.estimate(row[0]), mode
+    return None, counting.COUNT_NONE
+
+
+async def post_validators(pk):
+    """``(etag, last_modified)`` of ``get_post``, see ``conditional``."""
+    row = await async_db.fetchone(conditional.POST_VALIDATORS_QUERY, [pk], await replicas.aread_alias())
+    # Версии тегов - из Redis
+    return await _cache(conditional.post_validators)(pk, row)
+
+
+async def post_list_validators(query):
+    """``(etag, last_modified)`` of ``list_posts`` for the normalized ``query``."""
+    sql, params = conditional.list_validators_sql(query)
+    row = await async_db.fetchone(sql, params, await replicas.aread_alias())
+    return await _cache(conditional.post_list_validators)(query, row[0])
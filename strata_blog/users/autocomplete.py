@@ -0,0 +1,133 @@
+"""
+Autocomplete for post titles and author names.
+
+Queries go through ``pg_trgm`` GIN indexes on ``UPPER(title)`` and
+``UPPER(name)`` (the same expression Django's ``icontains`` uses, so the admin
+search boxes hit them too). Short prefixes, the hottest and least selective
+ones, are optionally answered from an in-process ``PrefixIndex`` of the most
+recent titles and active authors, refreshed from the database every few minutes.
+"""
+
+import bisect
+import itertools
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+from . import replicas
+
+KINDS = ("title", "author")
+
+
+def complete(kind, text, limit=10):
+    text = text.strip()
+    if not text:
+        return []
+    if settings.AUTOCOMPLETE_PREFIX_INDEX and len(text) <= settings.AUTOCOMPLETE_PREFIX_MAX_LENGTH:
+        results = prefix_index.lookup(kind, text, limit)
+        metrics.cache_lookup("autocomplete_prefix", hit=bool(results))
+        if results:
+            return results
+    if kind == "title":
+        return complete_titles(text, limit)
+    return complete_authors(text, limit)
+
+
+def complete_titles(text, limit=10):
+    return _complete(
+        "SELECT id, title FROM users_post",
+        "title",
+        text,
+        limit,
+    )
+
+
+def complete_authors(text, limit=10):
+    return _complete(
+        "SELECT id, name FROM users_user",
+        "name",
+        text,
+        limit,
+    )
+
+
+def _complete(select, column, text, limit):
+    # Prefix matches first, then the closest trigram matches
+    query = f"""
+    {select}
+    WHERE UPPER({column}) LIKE UPPER(%s)
+    ORDER BY UPPER({column}) LIKE UPPER(%s) DESC, similarity({column}, %s) DESC, id DESC
+    LIMIT %s;
+    """
+    pattern = _escape_like(text)
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(query, [f"%{pattern}%", f"{pattern}%", text, limit])
+        return [{"id": row[0], "value": row[1]} for row in cursor.fetchall()]
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class PrefixIndex:
+    """
+    Sorted, case-folded snapshot of recent post titles and author names,
+    searched with ``bisect``. Each worker process keeps its own copy and
+    reloads it lazily once it is older than ``AUTOCOMPLETE_PREFIX_INDEX_TTL``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loaded_at = None
+
+    def lookup(self, kind, text, limit):
+        entries = self._get_entries()[kind]
+        key = text.casefold()
+        start = bisect.bisect_left(entries, (key,))
+        results = []
+        for folded, pk, value in itertools.islice(entries, start, None):
+            if not folded.startswith(key) or len(results) >= limit:
+                break
+            results.append({"id": pk, "value": value})
+        return results
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _get_entries(self):
+        ttl = settings.AUTOCOMPLETE_PREFIX_INDEX_TTL
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > ttl:
+            with self._lock:
+                if self._loaded_at is None or time.monotonic() - self._loaded_at > ttl:
+                    self._entries = self._load()
+                    self._loaded_at = time.monotonic()
+        return self._entries
+
+    def _load(self):
+        size = settings.AUTOCOMPLETE_PREFIX_INDEX_SIZE
+        with replicas.read_connection().cursor() as cursor:
+            # Both queries walk an index instead of scanning the tables
+            cursor.execute(
+                "SELECT id, title FROM users_post ORDER BY created_at DESC, id DESC LIMIT %s",
+                [size],
+            )
+            titles = cursor.fetchall()
+            cursor.execute("""
+                SELECT u.id, u.name
+                FROM users_user u
+                WHERE u.name <> ''
+                    AND EXISTS (SELECT 1 FROM users_post p WHERE p.author_id = u.id)
+                ORDER BY u.id DESC
+                LIMIT %s
+            """, [size])
+            authors = cursor.fetchall()
+        return {
+            "title": sorted((title.casefold(), pk, title) for pk, title in titles),
+            "author": sorted((name.casefold(), pk, name) for pk, name in authors),
+        }
+
+
+prefix_index = PrefixIndex()
@@ -0,0 +1,159 @@
+"""
+Latency and query-count benchmarks for the post API and HTML views.
+
+Used by the ``benchmark`` management command, which seeds a throwaway
+database at each size in ``SIZES`` and runs every scenario of
+``build_scenarios`` through the full middleware stack with the test client.
+Results are plain JSON so that a run can be stored as a baseline and later runs
+compared against it with ``compare``.
+"""
+
+import math
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import response_cache
+from .api.pagination import PostCursor
+from .api.pagination import PostPagination
+
+# (users, posts, comments) passed to the seed command
+SIZES = {
+    "small": (100, 1_000, 10_000),
+    "medium": (1_000, 100_000, 1_000_000),
+    "large": (10_000, 1_000_000, 10_000_000),
+}
+
+# Comment counts of the posts the retrieve scenarios read
+RETRIEVE_COMMENT_COUNTS = (0, 100, 10_000)
+
+# Most SQL queries one request of each scenario group may run, even with a cold cache
+QUERY_BUDGETS = {
+    "list": 4,
+    "retrieve": 4,
+    "add_comment": 5,
+    "home": 5,
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Scenario:
+    def __init__(self, name, method, url, data=None, *, authenticated=False):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.data = data or {}
+        self.authenticated = authenticated
+
+    @property
+    def group(self):
+        return self.name.split("/", 1)[0]
+
+
+def build_scenarios(post_count, author_id, author_post_count, retrieve_post_ids, comment_post_id):
+    """
+    ``retrieve_post_ids`` maps each of ``RETRIEVE_COMMENT_COUNTS`` to a post
+    with that many comments; ``comment_post_id`` receives the new comments.
+    """
+    scenarios = []
+    list_url = reverse("api:posts-list")
+    for sort_by in PostCursor.sort_fields:
+        for scope, author, total in (("all", None, post_count), ("author", author_id, author_post_count)):
+            deep_page = max(1, math.ceil(total / PostPagination.page_size) // 2)
+            for depth, page in (("first", 1), ("deep", deep_page)):
+                data = {"sort_by": sort_by, "page": page}
+                if author:
+                    data["author_id"] = author
+                scenarios.append(Scenario(f"list/{sort_by}/{scope}/{depth}", "get", list_url, data))
+
+    for comments, post_id in retrieve_post_ids.items():
+        url = reverse("api:posts-detail", kwargs={"pk": post_id})
+        scenarios.append(Scenario(f"retrieve/{comments}-comments", "get", url))
+
+    scenarios.append(Scenario(
+        "add_comment",
+        "post",
+        reverse("api:posts-add-comment", kwargs={"pk": comment_post_id}),
+        {"author_name": "Benchmark", "content": "Benchmark comment"},
+        authenticated=True,
+    ))
+    scenarios.append(Scenario("home", "get", reverse("home")))
+    return scenarios
+
+
+def measure(client, scenario, iterations, warmup=3, *, cold=False):
+    """
+    Run ``scenario`` ``warmup + iterations`` times and summarize the measured
+    ones. ``cold`` clears the caches before every request, so each one also
+    pays for the post counters (the command runs without the response cache
+    unless ``--response-cache`` is given).
+    """
+    timings = []
+    queries = []
+    request = getattr(client, scenario.method)
+    for i in range(warmup + iterations):
+        if cold:
+            cache.clear()
+            response_cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = request(scenario.url, scenario.data)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:  # noqa: PLR2004
+            msg = f"{scenario.name}: HTTP {response.status_code}"
+            raise RuntimeError(msg)
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured.captured_queries))
+    return summarize(timings, queries)
+
+
+def summarize(timings, queries):
+    ordered = sorted(timings)
+    summary = {
+        "iterations": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "max_ms": round(ordered[-1], 3),
+        "queries": max(queries),
+    }
+    for p in PERCENTILES:
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        summary[f"p{p}_ms"] = round(ordered[rank - 1], 3)
+    return summary
+
+
+def over_budget(results):
+    """Return a message for every result that runs more queries than its group allows."""
+    problems = []
+    for key, result in results["results"].items():
+        group = key.split("/")[1]
+        budget = QUERY_BUDGETS.get(group)
+        if budget is not None and result["queries"] > budget:
+            problems.append(f"{key}: {result['queries']} queries, budget {budget}")
+    return problems
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Compare two result sets and return a message for every regression: p95
+    latency more than ``threshold`` above the baseline, or more queries.
+    """
+    regressions = []
+    for key, current in sorted(results["results"].items()):
+        previous = baseline["results"].get(key)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{key}: p95 {previous['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms "
+                f"(+{(current['p95_ms'] / max(previous['p95_ms'], 1e-6) - 1) * 100:.0f}%)",
+            )
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{key}: queries {previous['queries']} -> {current['queries']}")
+    return regressions
@@ -0,0 +1,249 @@
+"""
+Bulk import of posts and comments from NDJSON, loaded with ``COPY FROM STDIN``.
+
+Every line is one JSON object:
+
+* ``{"type": "post", "ref": ..., "author_email": ..., "title": ...,
+  "short_description": ..., "content": ..., "image_path": ..., "created_at": ...}``
+* ``{"type": "comment", "post_id": ... | "post_ref": ..., "author_name": ...,
+  "content": ..., "created_at": ...}``
+
+``ref`` is an optional client-side key that later comments of the same stream
+can point to with ``post_ref``; ``image_path`` and ``created_at`` are optional.
+Lines are processed in chunks: each chunk is validated at once (one query
+resolves all author emails, one all ``post_id`` values), copied in its own
+transaction and followed by a single comment summary refresh and cache
+invalidation. Rejected lines are passed to ``on_error`` and skipped.
+"""
+
+import itertools
+import json
+from collections import Counter
+
+from django.db import DatabaseError
+from django.db import connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counting
+from . import response_cache
+from .models import Post
+
+CHUNK_SIZE = 5000
+
+POST_COLUMNS = [
+    "id", "title", "short_description", "content", "image_path", "created_at", "updated_at",
+    "author_id", "comment_count", "last_comment_at", "last_comment_author", "version",
+]
+COMMENT_COLUMNS = ["post_id", "author_name", "content", "created_at"]
+
+TITLE_MIN_LENGTH = 10
+TITLE_MAX_LENGTH = 200
+IMAGE_PATH_MAX_LENGTH = 100
+AUTHOR_NAME_MAX_LENGTH = 100
+
+
+def import_ndjson(lines, on_error, chunk_size=CHUNK_SIZE):
+    """
+    Import ``lines`` (``str`` or ``bytes``) and return the number of imported
+    posts and comments and of rejected lines. ``on_error(line_no, errors)`` is
+    called for every rejected line.
+    """
+    totals = {"posts": 0, "comments": 0, "rejected": 0}
+    refs = {}
+
+    def reject(line_no, errors):
+        totals["rejected"] += 1
+        on_error(line_no, errors)
+
+    numbered = enumerate(lines, start=1)
+    while chunk := list(itertools.islice(numbered, chunk_size)):
+        posts, comments = _parse_chunk(chunk, reject)
+        posts = _resolve_authors(posts, reject)
+        try:
+            with transaction.atomic():
+                chunk_refs = _copy_posts(posts)
+                comments = _resolve_posts(comments, refs | chunk_refs, reject)
+                _copy_comments(comments)
+        except DatabaseError as e:
+            # Вся пачка откатилась: сообщаем о каждой её строке
+            for line_no, _ in posts + comments:
+                reject(line_no, {"database": str(e)})
+            continue
+        refs |= chunk_refs
+        totals["posts"] += len(posts)
+        totals["comments"] += len(comments)
+    return totals
+
+
+def _parse_chunk(chunk, reject):
+    posts, comments = [], []
+    for line_no, raw in chunk:
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8", errors="replace")
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            reject(line_no, {"json": str(e)})
+            continue
+        if not isinstance(record, dict):
+            reject(line_no, {"json": "Expected an object."})
+            continue
+
+        kind = record.get("type")
+        if kind == "post":
+            clean, errors = _clean_post(record)
+            target = posts
+        elif kind == "comment":
+            clean, errors = _clean_comment(record)
+            target = comments
+        else:
+            reject(line_no, {"type": "Must be 'post' or 'comment'."})
+            continue
+        if errors:
+            reject(line_no, errors)
+        else:
+            target.append((line_no, clean))
+    return posts, comments
+
+
+def _clean_post(record):
+    errors = {}
+    clean = {"ref": record.get("ref")}
+    if not isinstance(clean["ref"], str | int | None):
+        errors["ref"] = "Must be a string or an integer."
+    for field in ("author_email", "title", "short_description", "content"):
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors[field] = "This field is required."
+        clean[field] = value
+    title = clean["title"]
+    if "title" not in errors and not TITLE_MIN_LENGTH <= len(title) <= TITLE_MAX_LENGTH:
+        errors["title"] = f"Must be {TITLE_MIN_LENGTH} to {TITLE_MAX_LENGTH} characters."
+    if isinstance(clean["author_email"], str):
+        clean["author_email"] = clean["author_email"].strip()
+
+    image_path = record.get("image_path") or None
+    if image_path is not None and (not isinstance(image_path, str) or len(image_path) > IMAGE_PATH_MAX_LENGTH):
+        errors["image_path"] = f"Must be a string of at most {IMAGE_PATH_MAX_LENGTH} characters."
+    clean["image_path"] = image_path
+    clean["created_at"] = _clean_datetime(record.get("created_at"), errors)
+    return clean, errors
+
+
+def _clean_comment(record):
+    errors = {}
+    clean = {"post_id": record.get("post_id"), "post_ref": record.get("post_ref")}
+    if not isinstance(clean["post_ref"], str | int | None):
+        errors["post_ref"] = "Must be a string or an integer."
+    elif clean["post_id"] is None and clean["post_ref"] is None:
+        errors["post_id"] = "Either post_id or post_ref is required."
+    elif clean["post_id"] is not None and (not isinstance(clean["post_id"], int) or isinstance(clean["post_id"], bool)):
+        errors["post_id"] = "Must be an integer."
+    for field in ("author_name", "content"):
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors[field] = "This field is required."
+        clean[field] = value
+    if "author_name" not in errors and len(clean["author_name"]) > AUTHOR_NAME_MAX_LENGTH:
+        errors["author_name"] = f"Must be at most {AUTHOR_NAME_MAX_LENGTH} characters."
+    clean["created_at"] = _clean_datetime(record.get("created_at"), errors)
+    return clean, errors
+
+
+def _clean_datetime(value, errors):
+    if value is None:
+        return timezone.now()
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        errors["created_at"] = "Must be an ISO 8601 datetime."
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _resolve_authors(posts, reject):
+    emails = list({post["author_email"] for _, post in posts})
+    if not emails:
+        return posts
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT email, id FROM users_user WHERE email = ANY(%s)", [emails])
+        authors = dict(cursor.fetchall())
+
+    resolved = []
+    for line_no, post in posts:
+        author_id = authors.get(post["author_email"])
+        if author_id is None:
+            reject(line_no, {"author_email": "No user with this email."})
+            continue
+        post["author_id"] = author_id
+        resolved.append((line_no, post))
+    return resolved
+
+
+def _resolve_posts(comments, refs, reject):
+    post_ids = list({comment["post_id"] for _, comment in comments if comment["post_id"] is not None})
+    existing = set()
+    if post_ids:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM users_post WHERE id = ANY(%s)", [post_ids])
+            existing = {row[0] for row in cursor.fetchall()}
+
+    resolved = []
+    for line_no, comment in comments:
+        if comment["post_id"] is None:
+            comment["post_id"] = refs.get(comment["post_ref"])
+            if comment["post_id"] is None:
+                reject(line_no, {"post_ref": "No post with this ref earlier in the import."})
+                continue
+        elif comment["post_id"] not in existing:
+            reject(line_no, {"post_id": "No post with this id."})
+            continue
+        resolved.append((line_no, comment))
+    return resolved
+
+
+def _copy_posts(posts):
+    """COPY ``posts`` and return ``{ref: id}`` for the chunk."""
+    if not posts:
+        return {}
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        # Ids are taken from the sequence up front so comments can point at them
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence('users_post', 'id')) FROM generate_series(1, %s)",
+            [len(posts)],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        with cursor.copy(f"COPY users_post ({', '.join(POST_COLUMNS)}) FROM STDIN") as copy:
+            for pk, (_, post) in zip(ids, posts, strict=True):
+                copy.write_row([
+                    pk, post["title"], post["short_description"], post["content"], post["image_path"],
+                    post["created_at"], now, post["author_id"], 0, None, "", 0,
+                ])
+
+    for author_id, count in Counter(post["author_id"] for _, post in posts).items():
+        counting.post_created(author_id, count)
+    response_cache.invalidate(
+        response_cache.LIST_TAG,
+        *{response_cache.author_tag(post["author_id"]) for _, post in posts},
+    )
+    return {post["ref"]: pk for pk, (_, post) in zip(ids, posts, strict=True) if post["ref"] is not None}
+
+
+def _copy_comments(comments):
+    if not comments:
+        return
+    with connection.cursor() as cursor, cursor.copy(
+        f"COPY users_comment ({', '.join(COMMENT_COLUMNS)}) FROM STDIN",
+    ) as copy:
+        for _, comment in comments:
+            copy.write_row([comment["post_id"], comment["author_name"], comment["content"], comment["created_at"]])
+
+    post_ids = list({comment["post_id"] for _, comment in comments})
+    Post.refresh_comment_summary(post_ids)
+    response_cache.invalidate(*(response_cache.post_tag(post_id) for post_id in post_ids))
@@ -0,0 +1,222 @@
+"""
+Write-behind comments for traffic spikes (``COMMENTS_BUFFERED``).
+
+Instead of one ``INSERT`` per comment inside the request, ``add_comment``
+validates the comment, appends it to a Redis stream and answers ``202``.
+``tasks.flush_comment_buffer`` then inserts the stream in batches of
+``COMMENT_BUFFER_BATCH_SIZE`` with one multi-row statement each, updates the
+posts' comment summaries in the same statement and deletes the entries.
+
+* Lag: the first comment after a flush schedules the next one
+  ``COMMENT_BUFFER_MAX_LAG`` seconds later (a full batch, right away). A
+  flush inserts at most ``COMMENT_BUFFER_FLUSH_BATCHES`` batches and leaves
+  the rest to the next one, queued right away.
+* Order: one flush runs at a time (a Redis lock) and inserts the entries in
+  stream order, so a post's comments get increasing ids; ``created_at`` is
+  the time of the stream entry, not of the flush.
+* Back-pressure: with ``COMMENT_BUFFER_MAX_LENGTH`` entries pending new
+  comments are refused (``BufferFullError``, ``503``) until the flush catches up.
+* At least once: an entry is deleted only after its batch committed, and
+  ``Comment.buffer_id`` makes a replayed entry a no-op.
+"""
+
+import functools
+import logging
+
+import redis
+from django.conf import settings
+from django.db import DataError
+from django.db import connection
+from django.db import transaction
+
+from . import live_comments
+from . import response_cache
+from .models import Comment
+
+logger = logging.getLogger("strata_blog.comment_buffer")
+
+STREAM = "comments:buffer"
+LOCK_KEY = "comments:buffer:flush"
+SCHEDULED_KEY = "comments:buffer:scheduled"
+
+AUTHOR_NAME_MAX_LENGTH = Comment._meta.get_field("author_name").max_length  # noqa: SLF001
+
+# Проверка длины и XADD одним скриптом: параллельные запросы не превысят COMMENT_BUFFER_MAX_LENGTH
+APPEND_SCRIPT = """
+local pending = redis.call("XLEN", KEYS[1])
+if pending >= tonumber(ARGV[1]) then
+    return nil
+end
+local entry_id = redis.call("XADD", KEYS[1], "*", "post_id", ARGV[2], "author_name", ARGV[3], "content", ARGV[4])
+return {entry_id, pending}
+"""
+
+# Каждое поле приведено явно: в VALUES тип берётся из литерала
+FLUSH_ROW = "(%s::int, %s, %s::bigint, %s, %s, to_timestamp(%s::float8 / 1000))"
+
+# Комментарии удалённых постов отбрасываются, FOR KEY SHARE не даёт удалить пост до коммита
+FLUSH_QUERY = """
+WITH incoming (ordinal, buffer_id, post_id, author_name, content, created_at) AS (
+    VALUES {values}
+),
+new_comment AS (
+    INSERT INTO users_comment (post_id, author_name, content, created_at, buffer_id)
+    SELECT i.post_id, i.author_name, i.content, i.created_at, i.buffer_id
+    FROM incoming i
+    JOIN users_post p ON p.id = i.post_id
+    ORDER BY i.ordinal
+    FOR KEY SHARE OF p
+    ON CONFLICT (buffer_id) DO NOTHING
+    RETURNING id, post_id, author_name, content, created_at
+),
+summary AS (
+    SELECT
+        post_id,
+        COUNT(*) AS added,
+        MAX(created_at) AS last_at,
+        (ARRAY_AGG(author_name ORDER BY created_at DESC, id DESC))[1] AS last_author
+    FROM new_comment
+    GROUP BY post_id
+),
+updated AS (
+    UPDATE users_post p SET
+        comment_count = p.comment_count + s.added,
+        last_comment_at = GREATEST(p.last_comment_at, s.last_at),
+        last_comment_author = CASE
+            WHEN p.last_comment_at IS NULL OR p.last_comment_at <= s.last_at
+            THEN s.last_author
+            ELSE p.last_comment_author
+        END,
+        updated_at = NOW()
+    FROM summary s
+    WHERE p.id = s.post_id
+    RETURNING p.id, p.comment_count
+)
+SELECT nc.post_id, nc.id, nc.author_name, nc.content, nc.created_at, u.comment_count
+FROM new_comment nc
+JOIN updated u ON u.id = nc.post_id
+ORDER BY nc.id
+"""
+
+
+class BufferFullError(Exception):
+    pass
+
+
+def enabled():
+    return settings.COMMENTS_BUFFERED
+
+
+@functools.cache
+def _redis():
+    return redis.Redis.from_url(settings.COMMENT_BUFFER_REDIS_URL, decode_responses=True)
+
+
+def validate(author_name, content):
+    """Return why the flush could not insert this comment, or ``None``."""
+    if not author_name or not content:
+        return "Author name and content are required."
+    if not isinstance(author_name, str) or not isinstance(content, str):
+        return "Author name and content must be strings."
+    if len(author_name) > AUTHOR_NAME_MAX_LENGTH:
+        return f"Author name must be at most {AUTHOR_NAME_MAX_LENGTH} characters."
+    if "\x00" in author_name or "\x00" in content:
+        return "Null characters are not allowed."
+    return None
+
+
+@functools.cache
+def _append_script():
+    return _redis().register_script(APPEND_SCRIPT)
+
+
+def buffer_comment(post_id, author_name, content):
+    """Append a validated comment of an existing post; return its stream id."""
+    client = _redis()
+    appended = _append_script()(
+        keys=[STREAM],
+        args=[settings.COMMENT_BUFFER_MAX_LENGTH, post_id, author_name, content],
+    )
+    if appended is None:
+        raise BufferFullError
+    entry_id, pending = appended
+
+    from .tasks import flush_comment_buffer
+
+    if (pending + 1) % settings.COMMENT_BUFFER_BATCH_SIZE == 0:
+        flush_comment_buffer.delay()
+    else:
+        _schedule(client)
+    return entry_id
+
+
+def _schedule(client):
+    from .tasks import flush_comment_buffer
+
+    # Ключ живёт дольше отложенной задачи: потерянная задача не блокирует выгрузку навсегда
+    if client.set(SCHEDULED_KEY, 1, nx=True, ex=settings.COMMENT_BUFFER_MAX_LAG + 60):
+        flush_comment_buffer.apply_async(countdown=settings.COMMENT_BUFFER_MAX_LAG)
+
+
+def flush():
+    """
+    Insert the oldest ``COMMENT_BUFFER_FLUSH_BATCHES`` batches, in stream
+    order; return the number of entries flushed.
+    """
+    client = _redis()
+    lock = client.lock(LOCK_KEY, timeout=settings.CELERY_TASK_TIME_LIMIT)
+    if not lock.acquire(blocking=False):
+        # Идущая выгрузка заберёт и эти записи
+        return 0
+    flushed = 0
+    try:
+        # Ограничено, чтобы выгрузка большого буфера укладывалась в CELERY_TASK_SOFT_TIME_LIMIT
+        for _batch in range(settings.COMMENT_BUFFER_FLUSH_BATCHES):
+            entries = client.xrange(STREAM, count=settings.COMMENT_BUFFER_BATCH_SIZE)
+            if not entries:
+                break
+            _insert_batch(entries)
+            client.xdel(STREAM, *(entry_id for entry_id, _fields in entries))
+            flushed += len(entries)
+        client.delete(SCHEDULED_KEY)
+    finally:
+        lock.release()
+
+    from .tasks import flush_comment_buffer
+
+    pending = client.xlen(STREAM)
+    if pending >= settings.COMMENT_BUFFER_BATCH_SIZE:
+        # Остаток - следующей задачей, сразу
+        flush_comment_buffer.delay()
+    elif pending:
+        # Записи, добавленные, пока ключ ещё стоял, сами выгрузку не запланировали
+        _schedule(client)
+    return flushed
+
+
+def _insert_batch(entries):
+    try:
+        with transaction.atomic():
+            _insert(entries)
+    except DataError:
+        if len(entries) == 1:
+            logger.exception("Dropping buffered comment %s", entries[0][0])
+            return
+        # Одна испорченная запись не должна держать весь буфер
+        for entry in entries:
+            _insert_batch([entry])
+
+
+def _insert(entries):
+    params = []
+    for ordinal, (entry_id, fields) in enumerate(entries):
+        created_ms = int(entry_id.split("-")[0])
+        params += [ordinal, entry_id, fields["post_id"], fields["author_name"], fields["content"], created_ms]
+    with connection.cursor() as cursor:
+        cursor.execute(FLUSH_QUERY.format(values=", ".join([FLUSH_ROW] * len(entries))), params)
+        rows = cursor.fetchall()
+
+    for post_id in {row[0] for row in rows}:
+        response_cache.comments_changed(post_id)
+    for row in rows:
+        live_comments.publish(row[0], row[1:])
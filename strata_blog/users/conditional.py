@@ -0,0 +1,180 @@
+"""
+Validators for conditional GETs (``ETag`` / ``Last-Modified``) of posts.
+
+They are computed from indexed columns only (``created_at``, ``updated_at``,
+the edit ``version`` and the comment summary on ``users_post``) and from the
+response cache tag versions (which also change with the author's profile), so a request carrying ``If-None-Match`` or
+``If-Modified-Since`` for unchanged data gets a 304 before anything is
+serialized or rendered. Use them with ``django.views.decorators.http.condition``.
+"""
+
+import hashlib
+import json
+import time
+from datetime import UTC
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib import messages
+
+from . import replicas
+from . import response_cache
+from . import services
+
+
+def post_etag(request, pk=None, **kwargs):
+    return _post_validators(request, pk)[0]
+
+
+def post_last_modified(request, pk=None, **kwargs):
+    return _post_validators(request, pk)[1]
+
+
+def post_list_etag(request, *args, **kwargs):
+    return _post_list_validators(request)[0]
+
+
+def post_list_last_modified(request, *args, **kwargs):
+    return _post_list_validators(request)[1]
+
+
+def negotiated(etag_func):
+    """
+    Wrap API validators so that the browsable API and other ``?format=``
+    renderings of the same data get ETags of their own; JSON keeps the plain one.
+    """
+
+    def etag(request, *args, **kwargs):
+        value = etag_func(request, *args, **kwargs)
+        renderer = renderer_format(request)
+        if value is None or renderer == "json":
+            return value
+        return _digest(value, renderer)
+
+    return etag
+
+
+def renderer_format(request):
+    """What the API will render: ``?format=``, the browsable API for browsers, or JSON."""
+    if "format" in request.GET:
+        return request.GET["format"]
+    return "api" if "text/html" in request.headers.get("Accept", "") else "json"
+
+
+def personalized(etag_func, last_modified_func):
+    """
+    Wrap validators for HTML pages, whose markup also depends on the visitor
+    (navigation bar, CSRF token), so that a login or logout changes them.
+    A page with flash messages waiting to be shown gets no validators at all.
+    """
+
+    def etag(request, *args, **kwargs):
+        if _pending_messages(request):
+            return None
+        value = etag_func(request, *args, **kwargs)
+        if value is None:
+            return None
+        user_id = request.user.pk if request.user.is_authenticated else None
+        csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        return _digest(value, user_id, csrf_cookie)
+
+    def last_modified(request, *args, **kwargs):
+        if _pending_messages(request):
+            return None
+        value = last_modified_func(request, *args, **kwargs)
+        if value is None or not request.user.is_authenticated:
+            return value
+        return max(value, request.user.last_login or value)
+
+    return etag, last_modified
+
+
+POST_VALIDATORS_QUERY = """
+SELECT author_id, created_at, updated_at, version, comment_count, last_comment_at
+FROM users_post
+WHERE id = %s
+"""
+
+
+def _pending_messages(request):
+    # len() не помечает сообщения показанными, в отличие от перебора
+    return bool(len(messages.get_messages(request)))
+
+
+def _post_validators(request, pk):
+    # condition() asks for the ETag and Last-Modified separately: query once
+    cached = getattr(request, '_post_validators', None)
+    if cached is not None:
+        return cached
+
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(POST_VALIDATORS_QUERY, [pk])
+        row = cursor.fetchone()
+
+    validators = post_validators(pk, row)
+    request._post_validators = validators  # noqa: SLF001
+    return validators
+
+
+def post_validators(pk, row):
+    """``(etag, last_modified)`` from the ``POST_VALIDATORS_QUERY`` row."""
+    if row is None:
+        return None, None
+    author_id, created_at, updated_at, version, comment_count, last_comment_at = row
+    # Имя и email автора в ответе меняются без изменения поста
+    tag = response_cache.profile_tag(author_id)
+    profile_version = response_cache.tag_versions([tag], time.time_ns())[tag]
+    profile_changed_at = datetime.fromtimestamp(profile_version / 1e9, tz=UTC)
+    return (
+        _digest(pk, version, comment_count, last_comment_at, updated_at, profile_version),
+        max(created_at, updated_at, last_comment_at or created_at, profile_changed_at),
+    )
+
+
+def _post_list_validators(request):
+    cached = getattr(request, '_post_list_validators', None)
+    if cached is not None:
+        return cached
+
+    try:
+        params = services.list_params(request.GET)
+    except services.InvalidQueryError:
+        # Let the view answer with its 400
+        validators = (None, None)
+    else:
+        sql, query_params = list_validators_sql(params)
+        with replicas.read_connection().cursor() as cursor:
+            cursor.execute(sql, query_params)
+            max_updated_at = cursor.fetchone()[0]
+        validators = post_list_validators(params, max_updated_at)
+    request._post_list_validators = validators  # noqa: SLF001
+    return validators
+
+
+def list_validators_sql(params):
+    query = "SELECT MAX(updated_at) FROM users_post"
+    query_params = []
+    if params['author_id']:
+        query += " WHERE author_id = %s"
+        query_params.append(params['author_id'])
+    return query, query_params
+
+
+def post_list_validators(params, max_updated_at):
+    """``(etag, last_modified)`` of a list from the result of ``list_validators_sql``."""
+    author_id = params['author_id']
+    # Создание и удаление постов меняют версию тега, правки и комментарии - updated_at
+    tag = response_cache.author_tag(author_id) if author_id else response_cache.LIST_TAG
+    tag_version = response_cache.tag_versions([tag], time.time_ns())[tag]
+
+    changed_at = datetime.fromtimestamp(tag_version / 1e9, tz=UTC)
+    if max_updated_at is not None:
+        changed_at = max(changed_at, max_updated_at)
+    return (
+        _digest(json.dumps(params, sort_keys=True), tag_version, max_updated_at),
+        changed_at,
+    )
+
+
+def _digest(*parts):
+    return hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()  # noqa: S324
@@ -0,0 +1,153 @@
+"""
+Post counts for paginated listings.
+
+``COUNT(*)`` over ``users_post`` costs more than the page itself on a large
+table, so listings pick one of three modes:
+
+* ``exact`` - counters kept in the cache (Redis in production), globally and
+  per author, incremented and decremented as posts are created and deleted;
+* ``estimated`` - the planner's row estimate, free but approximate;
+* ``none`` - no count at all.
+
+Exact counters can drift: a post created between a reader's ``COUNT(*)`` and
+its seeding of the counter is missed, and deletes that bypass ``Post.delete``
+are not seen. Counters therefore expire after ``POSTS_COUNT_TIMEOUT`` and
+``tasks.reset_post_counts`` recomputes them all periodically.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db import transaction
+
+from . import metrics
+from . import replicas
+
+COUNT_EXACT = "exact"
+COUNT_ESTIMATED = "estimated"
+COUNT_NONE = "none"
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATED, COUNT_NONE)
+
+CACHE_KEY_PREFIX = "posts:count"
+
+
+def cache_key(author_id=None):
+    if author_id is None:
+        return f"{CACHE_KEY_PREFIX}:all"
+    return f"{CACHE_KEY_PREFIX}:author:{author_id}"
+
+
+def exact_count(author_id=None):
+    count = cached_count(author_id)
+    if count is None:
+        count = _count_rows(author_id)
+        seed_count(author_id, count)
+    return count
+
+
+def cached_count(author_id=None):
+    with metrics.measure("cache"):
+        count = cache.get(cache_key(author_id))
+    metrics.cache_lookup("post_count", hit=count is not None)
+    return count
+
+
+def seed_count(author_id, count):
+    # add() leaves a counter another worker has seeded in the meantime alone
+    cache.add(cache_key(author_id), count, timeout=settings.POSTS_COUNT_TIMEOUT)
+
+
+def estimated_count(author_id=None):
+    sql, params = estimate_sql(author_id)
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        return estimate(cursor.fetchone()[0])
+
+
+def estimate_sql(author_id=None):
+    if author_id is None:
+        return "SELECT reltuples::bigint FROM pg_class WHERE oid = 'users_post'::regclass", []
+    return "EXPLAIN (FORMAT JSON) SELECT 1 FROM users_post WHERE author_id = %s", [author_id]
+
+
+def estimate(value):
+    """The row estimate out of the result of ``estimate_sql``."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    if isinstance(value, list):
+        value = value[0]["Plan"]["Plan Rows"]
+    # reltuples is -1 until the table has been vacuumed or analyzed
+    return max(int(value), 0)
+
+
+def post_count(mode, author_id=None):
+    """Return ``(count, mode)``; ``count`` is ``None`` for ``COUNT_NONE``."""
+    if mode == COUNT_EXACT:
+        return exact_count(author_id), mode
+    if mode == COUNT_ESTIMATED:
+        return estimated_count(author_id), mode
+    return None, COUNT_NONE
+
+
+def post_created(author_id, count=1):
+    transaction.on_commit(lambda: _adjust(author_id, count))
+
+
+def post_deleted(author_id):
+    transaction.on_commit(lambda: _adjust(author_id, -1))
+
+
+def author_deleted(author_id):
+    """Call before deleting a user: their posts go with them, past ``Post.delete``."""
+    count = _count_rows(author_id)
+    transaction.on_commit(lambda: _author_deleted(author_id, count))
+
+
+def reset_counts():
+    """Recompute every counter from the database."""
+    with connection.cursor() as cursor:
+        # Авторы без постов тоже: их счётчики могли остаться от удалённых постов
+        cursor.execute(
+            "SELECT u.id, COUNT(p.id) FROM users_user u "
+            "LEFT JOIN users_post p ON p.author_id = u.id GROUP BY u.id",
+        )
+        per_author = dict(cursor.fetchall())
+    counts = {cache_key(author_id): n for author_id, n in per_author.items()}
+    counts[cache_key()] = sum(per_author.values())
+    cache.set_many(counts, timeout=settings.POSTS_COUNT_TIMEOUT)
+    return counts[cache_key()]
+
+
+def _count_rows(author_id=None):
+    sql, params = count_sql(author_id)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
+
+
+def count_sql(author_id=None):
+    query = "SELECT COUNT(*) FROM users_post"
+    params = []
+    if author_id is not None:
+        query += " WHERE author_id = %s"
+        params.append(author_id)
+    return query, params
+
+
+def _adjust(author_id, delta):
+    for key in (cache_key(), cache_key(author_id)):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Not seeded yet: the next read counts the table, this row included
+            pass
+
+
+def _author_deleted(author_id, count):
+    try:
+        cache.incr(cache_key(), -count)
+    except ValueError:
+        pass
+    cache.delete(cache_key(author_id))
@@ -0,0 +1,126 @@
+"""
+Resized variants and placeholders of post images.
+
+Uploading an image (``Post.save``, ``services.update_post``) resets
+``Post.image_variants``, ``image_blurhash`` and ``image_color`` and queues
+``tasks.generate_image_variants``, which decodes the original with Pillow
+once. From that decode it computes the placeholders (see ``placeholders.py``)
+and writes WebP and JPEG variants at ``IMAGE_VARIANT_WIDTHS`` (never
+upscaled, at most ``IMAGE_MAX_DIMENSION`` on either side, without EXIF or
+other metadata; an image narrower than every width gets one variant at its
+own size) through the default storage. Their storage names end up in
+``image_variants`` as ``{format: {width: name}}``; until then templates fall
+back to the original (see ``media_srcset``).
+"""
+
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db import transaction
+from PIL import Image
+from PIL import ImageOps
+
+from . import placeholders
+from . import response_cache
+
+FORMATS = {
+    # format: (Pillow format, extension, save options)
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+def is_stored(name):
+    """Seeded and legacy posts may hold an external URL instead of a storage name."""
+    return bool(name) and not name.startswith(("http://", "https://"))
+
+
+def schedule_variants(post_id):
+    """Queue variant generation once the current transaction commits."""
+    from .tasks import generate_image_variants
+
+    transaction.on_commit(lambda: generate_image_variants.delay(post_id))
+
+
+def generate_variants(post_id):
+    """Write the variants and placeholders of the post's current image and record them on the post."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT image_path, author_id FROM users_post WHERE id = %s", [post_id])
+        row = cursor.fetchone()
+    if row is None or not is_stored(row[0]):
+        return None
+    name, author_id = row
+
+    with default_storage.open(name, "rb") as f:
+        image = load(name, f)
+        blurhash, color = placeholders.compute(image)
+        variants = write_variants(name, image)
+
+    with connection.cursor() as cursor:
+        # Only if the image was not replaced in the meantime
+        cursor.execute(
+            """
+            UPDATE users_post
+            SET image_variants = %s::jsonb, image_blurhash = %s, image_color = %s, updated_at = NOW()
+            WHERE id = %s AND image_path = %s
+            """,
+            [json.dumps(variants), blurhash, color, post_id, name],
+        )
+        updated = cursor.rowcount
+    if not updated:
+        return None
+    response_cache.post_updated(post_id, author_id)
+    return variants
+
+
+def load(name, file):
+    """Decode an upload, upright and in RGB(A), refusing oversized ones."""
+    image = Image.open(file)
+    if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+        msg = f"{name}: {image.width}x{image.height} is over IMAGE_MAX_PIXELS"
+        raise ImageTooLargeError(msg)
+    # Decoded once; EXIF orientation applied, the metadata itself is not copied
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def write_variants(name, image):
+    image = image.copy()
+    base, _ = os.path.splitext(name)
+    variants = {fmt: {} for fmt in settings.IMAGE_VARIANT_FORMATS}
+    limit = settings.IMAGE_MAX_DIMENSION
+    # Обе стороны не больше IMAGE_MAX_DIMENSION, какими бы ни были пропорции
+    image.thumbnail((limit, limit), Image.Resampling.LANCZOS)
+    # Изображение уже самой узкой копии всё равно перекодируется без метаданных
+    targets = [width for width in settings.IMAGE_VARIANT_WIDTHS if width <= image.width] or [image.width]
+    # От большего к меньшему: каждая копия уменьшается из предыдущей
+    for target in sorted(targets, reverse=True):
+        image.thumbnail((target, limit), Image.Resampling.LANCZOS)
+        # Под ограничением высоты копия уже заявленной: в srcset - настоящая ширина
+        width = image.width
+        if any(str(width) in widths for widths in variants.values()):
+            continue
+        for fmt in variants:
+            pillow_format, extension, options = FORMATS[fmt]
+            rendition = image if pillow_format != "JPEG" or image.mode == "RGB" else _flatten(image)
+            buffer = io.BytesIO()
+            rendition.save(buffer, pillow_format, **options)
+            variant_name = f"variants/{base}-{width}w.{extension}"
+            variants[fmt][str(width)] = default_storage.save(variant_name, ContentFile(buffer.getvalue()))
+    return {fmt: widths for fmt, widths in variants.items() if widths}
+
+
+def _flatten(image):
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
@@ -0,0 +1,248 @@
+"""
+Live comment feed: new comments are pushed to the websocket clients reading
+the post (``config/websocket.py``) instead of them reloading the page.
+
+``add_comment`` (sync after commit, async right away) publishes the new comment
+to the post's Redis pub/sub channel. Every worker keeps one ``Hub``: a single
+pub/sub connection subscribed to the channels its clients follow, which hands
+each message to those clients' ``Subscriber``. A message is the delta only::
+
+    {"type": "comment", "post_id": 1, "comment_count": 5,
+     "comment": {"id": 9, "author_name": "...", "content": "...", "created_at": "..."}}
+
+Clients send ``{"action": "subscribe", "post_id": 1}`` (or ``"unsubscribe"``)
+and get ``{"type": "subscribed", "post_id": 1}`` or ``{"type": "error", ...}``.
+Pub/sub does not store messages: comments posted while a client reconnects
+are only seen after a reload.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import weakref
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import transaction
+
+from .api.renderers import JSONRenderer
+
+logger = logging.getLogger("strata_blog.live_comments")
+
+CHANNEL_PREFIX = "comments:post:"
+
+
+def enabled():
+    return bool(settings.LIVE_COMMENTS_REDIS_URL)
+
+
+def channel(post_id):
+    return f"{CHANNEL_PREFIX}{post_id}"
+
+
+def comment_message(post_id, row):
+    """Message for a row of ``services.ADD_COMMENT_QUERY``."""
+    comment_id, author_name, content, created_at, comment_count = row
+    return JSONRenderer().render({
+        "type": "comment",
+        "post_id": post_id,
+        "comment_count": comment_count,
+        "comment": {
+            "id": comment_id,
+            "author_name": author_name,
+            "content": content,
+            "created_at": created_at,
+        },
+    })
+
+
+def publish(post_id, row):
+    """Publish a comment added on Django's connection once it is committed."""
+    if not enabled():
+        return
+    message = comment_message(post_id, row)
+    transaction.on_commit(lambda: _publish(post_id, message))
+
+
+def _publish(post_id, message):
+    try:
+        _redis().publish(channel(post_id), message)
+    except redis.RedisError:
+        # Комментарий уже сохранён, теряется только живое обновление
+        logger.warning("Could not publish a comment of post %s", post_id, exc_info=True)
+
+
+@functools.cache
+def _redis():
+    return redis.Redis.from_url(settings.LIVE_COMMENTS_REDIS_URL)
+
+
+async def apublish(post_id, row):
+    """``publish`` for a comment already committed by ``async_db``."""
+    hub = get_hub()
+    if hub is None:
+        return
+    try:
+        await hub.client.publish(channel(post_id), comment_message(post_id, row))
+    except redis.RedisError:
+        logger.warning("Could not publish a comment of post %s", post_id, exc_info=True)
+
+
+# One hub per event loop: redis.asyncio connections cannot be shared across loops
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    if not enabled():
+        return None
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = Hub(redis.asyncio.Redis.from_url(settings.LIVE_COMMENTS_REDIS_URL))
+    return hub
+
+
+async def close_hub():
+    hub = _hubs.pop(asyncio.get_running_loop(), None)
+    if hub is not None:
+        await hub.close()
+
+
+class Hub:
+    """
+    The worker's pub/sub connection. A post's channel is subscribed while at
+    least one local client follows it; a reader task runs while there is any.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self.subscribers = {}
+        self.reader = None
+
+    async def subscribe(self, post_id, subscriber):
+        subscribers = self.subscribers.setdefault(post_id, set())
+        subscribers.add(subscriber)
+        if len(subscribers) == 1:
+            try:
+                await self.pubsub.subscribe(channel(post_id))
+            except redis.RedisError:
+                del self.subscribers[post_id]
+                raise
+        if self.reader is None:
+            self.reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, post_id, subscriber):
+        subscribers = self.subscribers.get(post_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.remove(subscriber)
+        if not subscribers:
+            del self.subscribers[post_id]
+            try:
+                await self.pubsub.unsubscribe(channel(post_id))
+            except redis.RedisError:
+                # Лишняя подписка безвредна: сообщения некому отдавать
+                logger.warning("Could not unsubscribe from post %s", post_id, exc_info=True)
+
+    def dispatch(self, message):
+        post_id = int(message["channel"].rsplit(b":", 1)[1])
+        text = message["data"].decode()
+        for subscriber in list(self.subscribers.get(post_id, ())):
+            subscriber.deliver(text)
+
+    async def _read(self):
+        try:
+            while self.subscribers:
+                try:
+                    message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                except redis.RedisError:
+                    # PubSub переподключается и переподписывается при следующем вызове
+                    logger.warning("Live comments pub/sub connection failed", exc_info=True)
+                    await asyncio.sleep(1)
+                    continue
+                if message is not None and message["type"] == "message":
+                    self.dispatch(message)
+        finally:
+            self.reader = None
+
+    async def close(self):
+        self.subscribers.clear()
+        if self.reader is not None:
+            self.reader.cancel()
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class Subscriber:
+    """
+    One websocket connection: its subscriptions and outgoing messages. A client
+    more than ``LIVE_COMMENTS_MAX_PENDING`` messages behind is disconnected
+    (close code 1013) rather than buffered without bound.
+    """
+
+    def __init__(self):
+        self.post_ids = set()
+        self.queue = asyncio.Queue()
+        self.lagging = False
+
+    def deliver(self, text):
+        if self.queue.qsize() >= settings.LIVE_COMMENTS_MAX_PENDING:
+            self.lagging = True
+        self.queue.put_nowait(text)
+
+    def reply(self, data):
+        self.queue.put_nowait(data if isinstance(data, str) else json.dumps(data))
+
+    async def write(self, send):
+        """Send queued messages until cancelled; run as a task next to ``receive``."""
+        while True:
+            text = await self.queue.get()
+            if self.lagging:
+                await send({"type": "websocket.close", "code": 1013})
+                return
+            await send({"type": "websocket.send", "text": text})
+
+    async def handle(self, text):
+        """Handle a client's subscribe/unsubscribe message."""
+        try:
+            request = json.loads(text)
+            action = request["action"]
+            post_id = request["post_id"]
+        except (ValueError, TypeError, KeyError):
+            self.reply({"type": "error", "detail": "Expected {\"action\": ..., \"post_id\": ...}."})
+            return
+        if action not in ("subscribe", "unsubscribe") or type(post_id) is not int:
+            self.reply({"type": "error", "detail": "Unknown action or invalid post_id."})
+            return
+
+        hub = get_hub()
+        if hub is None:
+            self.reply({"type": "error", "detail": "Live comments are disabled."})
+            return
+        if action == "subscribe":
+            if post_id not in self.post_ids:
+                if len(self.post_ids) >= settings.LIVE_COMMENTS_MAX_SUBSCRIPTIONS:
+                    self.reply({"type": "error", "detail": "Too many subscriptions."})
+                    return
+                try:
+                    await hub.subscribe(post_id, self)
+                except redis.RedisError:
+                    logger.warning("Could not subscribe to post %s", post_id, exc_info=True)
+                    self.reply({"type": "error", "detail": "Live comments are unavailable."})
+                    return
+                self.post_ids.add(post_id)
+            self.reply({"type": "subscribed", "post_id": post_id})
+        else:
+            if post_id in self.post_ids:
+                self.post_ids.remove(post_id)
+                await hub.unsubscribe(post_id, self)
+            self.reply({"type": "unsubscribed", "post_id": post_id})
+
+    async def close(self):
+        hub = get_hub() if self.post_ids else None
+        for post_id in self.post_ids:
+            await hub.unsubscribe(post_id, self)
+        self.post_ids.clear()
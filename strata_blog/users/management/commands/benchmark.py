@@ -0,0 +1,183 @@
+import importlib
+import io
+import json
+import subprocess
+import sys
+from contextlib import contextmanager
+from datetime import UTC
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+
+from strata_blog.users import benchmark
+from strata_blog.users.models import Post
+from strata_blog.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the post API and HTML views on seeded databases of several sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='small', help=f"Comma-separated, from {', '.join(benchmark.SIZES)}")
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--cold', action='store_true', help='Clear the caches before every request')
+        parser.add_argument(
+            '--response-cache', action='store_true',
+            help='Serve repeated requests from the response cache (default: every request runs its SQL)',
+        )
+        parser.add_argument('--output', '-o', help='Write the results as JSON to this file')
+        parser.add_argument('--input', help='Skip the run and use results stored in this file')
+        parser.add_argument('--compare', help='Baseline results to check for regressions')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p95 slowdown (0.2 = 20%%)')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database afterwards')
+
+    def handle(self, *args, **options):
+        if options['input']:
+            with open(options['input'], encoding='utf-8') as f:
+                results = json.load(f)
+        else:
+            sizes = options['sizes'].split(',')
+            unknown = set(sizes) - set(benchmark.SIZES)
+            if unknown:
+                msg = f"Unknown sizes: {', '.join(sorted(unknown))}"
+                raise CommandError(msg)
+            results = self._run(sizes, options)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+        problems = benchmark.over_budget(results)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                problems += benchmark.compare(results, json.load(f), options['threshold'])
+        for problem in problems:
+            self.stderr.write(self.style.ERROR(problem))
+        if problems:
+            msg = f'{len(problems)} regression(s)'
+            raise CommandError(msg)
+
+    def _run(self, sizes, options):
+        # Отдельная одноразовая база, как у тестов: рабочие данные не трогаются
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        test_settings['NAME'] = f"{connection.settings_dict['NAME']}_benchmark"
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'],
+        )
+        results = {
+            'meta': {
+                'date': datetime.now(UTC).isoformat(),
+                'revision': _git_revision(),
+                'iterations': options['iterations'],
+                'cold': options['cold'],
+                'response_cache': options['response_cache'],
+                'sizes': {size: benchmark.SIZES[size] for size in sizes},
+            },
+            'results': {},
+        }
+        # Всё через default, то есть через базу бенчмарка, и через синхронные представления
+        # (Client - WSGI); иначе чтения уходят на настоящие реплики мимо CaptureQueriesContext.
+        # Без кэша ответов сценарии после разогрева измеряют свой SQL, а не попадания в Redis
+        measured_settings = _override_views(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            DATABASE_REPLICAS={},
+            POSTS_ASYNC_VIEWS=False,
+            POSTS_RESPONSE_CACHE_ENABLED=options['response_cache'],
+        )
+        try:
+            with measured_settings:
+                for size in sizes:
+                    self.stdout.write(f'Seeding {size} dataset...')
+                    scenarios, user = self._prepare(size)
+                    anonymous = Client()
+                    authenticated = Client()
+                    authenticated.force_login(user)
+                    for scenario in scenarios:
+                        client = authenticated if scenario.authenticated else anonymous
+                        result = benchmark.measure(
+                            client, scenario, options['iterations'], options['warmup'], cold=options['cold'],
+                        )
+                        results['results'][f'{size}/{scenario.name}'] = result
+                        self.stdout.write(
+                            f"{size}/{scenario.name}: p50 {result['p50_ms']:.1f}ms "
+                            f"p95 {result['p95_ms']:.1f}ms, {result['queries']} queries",
+                        )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+        return results
+
+    def _prepare(self, size):
+        users, posts, comments = benchmark.SIZES[size]
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE users_comment, users_post, users_user RESTART IDENTITY CASCADE')
+        call_command('seed', users=users, posts=posts, comments=comments, seed=0, stdout=io.StringIO())
+
+        user = User.objects.order_by('id').first()
+        retrieve_post_ids = {
+            count: _post_with_comments(user, count) for count in benchmark.RETRIEVE_COMMENT_COUNTS
+        }
+        comment_post_id = _post_with_comments(user, 0)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute("""
+                SELECT author_id, COUNT(*) FROM users_post
+                GROUP BY author_id ORDER BY COUNT(*) DESC LIMIT 1
+            """)
+            author_id, author_post_count = cursor.fetchone()
+
+        scenarios = benchmark.build_scenarios(
+            Post.objects.count(), author_id, author_post_count, retrieve_post_ids, comment_post_id,
+        )
+        return scenarios, user
+
+
+def _post_with_comments(author, count):
+    post = Post.objects.create(
+        author=author, title=f'Benchmark post with {count} comments', short_description='', content='',
+    )
+    if count:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO users_comment (post_id, author_name, content, created_at)
+                SELECT %s, 'Benchmark', 'Benchmark comment', NOW() - make_interval(secs => g)
+                FROM generate_series(1, %s) g
+            """, [post.pk, count])
+        Post.refresh_comment_summary([post.pk])
+    return post.pk
+
+
+@contextmanager
+def _override_views(**overrides):
+    """
+    ``override_settings`` that also rebuilds the URLconf on the way in and out:
+    ``config.api_router`` picks its views by ``POSTS_ASYNC_VIEWS`` at import.
+    """
+    try:
+        with override_settings(**overrides):
+            _reload_urlconf()
+            yield
+    finally:
+        _reload_urlconf()
+
+
+def _reload_urlconf():
+    for name in ('config.api_router', settings.ROOT_URLCONF):
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+    clear_url_caches()
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()  # noqa: S603, S607
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from strata_blog.users import export
+
+
+class Command(BaseCommand):
+    help = 'Export all posts or comments as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(export.FORMATS), default='ndjson')
+        parser.add_argument('--output', '-o', help='File to write to (stdout by default)')
+        parser.add_argument('--batch-size', type=int, default=export.BATCH_SIZE)
+
+    def handle(self, *args, kind, fmt, output, batch_size, **kwargs):
+        chunks = export.iter_export(kind, fmt, batch_size)
+        if not output:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        # newline='' - csv.writer сам ставит окончания строк
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Exported {kind} to {output}'))
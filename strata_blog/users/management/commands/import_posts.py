@@ -0,0 +1,41 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from strata_blog.users import bulk_import
+
+
+class Command(BaseCommand):
+    help = 'Bulk import posts and comments from an NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file, or - for stdin")
+        parser.add_argument('--errors', help='Write rejected lines as NDJSON to this file')
+        parser.add_argument('--chunk-size', type=int, default=bulk_import.CHUNK_SIZE)
+
+    def handle(self, *args, path, errors, chunk_size, **kwargs):
+        report = open(errors, 'w', encoding='utf-8') if errors else None  # noqa: SIM115
+
+        def on_error(line_no, line_errors):
+            if report:
+                report.write(json.dumps({"line": line_no, "errors": line_errors}) + "\n")
+
+        started = time.monotonic()
+        try:
+            if path == '-':
+                totals = bulk_import.import_ndjson(sys.stdin, on_error, chunk_size)
+            else:
+                with open(path, encoding='utf-8') as f:
+                    totals = bulk_import.import_ndjson(f, on_error, chunk_size)
+        finally:
+            if report:
+                report.close()
+
+        elapsed = time.monotonic() - started
+        rows = totals['posts'] + totals['comments']
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['posts']} posts and {totals['comments']} comments "
+            f"in {elapsed:.1f}s ({rows / max(elapsed, 1e-6):.0f} rows/s), rejected {totals['rejected']}",
+        ))
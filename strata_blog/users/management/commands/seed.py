@@ -1,47 +1,239 @@
-import os
-import django
-from faker import Faker
+import collections
+import functools
+import itertools
+import multiprocessing
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
-from strata_blog.users.models import User, Post, Comment
+from django.db import connection
+from django.utils import timezone
+from faker import Faker
+
+from strata_blog.users import bulk_import
+from strata_blog.users import counting
+from strata_blog.users import response_cache
+
+USER_COLUMNS = ["id", "password", "is_superuser", "is_staff", "is_active", "date_joined", "name", "email"]
+
+SUMMARY_SQL = """
+UPDATE users_post p SET
+    comment_count = s.comment_count,
+    last_comment_at = s.created_at,
+    last_comment_author = s.author_name,
+    updated_at = s.created_at
+FROM (
+    SELECT DISTINCT ON (post_id)
+        post_id,
+        COUNT(*) OVER (PARTITION BY post_id) AS comment_count,
+        created_at,
+        author_name
+    FROM users_comment
+    WHERE post_id BETWEEN %s AND %s
+    ORDER BY post_id, created_at DESC, id DESC
+) s
+WHERE s.post_id = p.id;
+"""
+
+# Заполняется в каждом процессе-генераторе через initializer пула
+_options = {}
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
-django.setup()
 
 class Command(BaseCommand):
     help = 'Seed the database with fake data'
 
-    def handle(self, *args, **kwargs):
-        fake = Faker()
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=42)
+        parser.add_argument('--posts', type=int, default=210)
+        parser.add_argument('--comments', type=int, default=840)
+        parser.add_argument('--seed', type=int, default=0, help='Same seed, same dataset')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Power-law exponent for posts per user and comments per post (0 is uniform)')
+        parser.add_argument('--days', type=int, default=365, help='Spread post dates over this many days')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        n_users, n_posts, n_comments = options['users'], options['posts'], options['comments']
+        if n_posts and not n_users:
+            self.stderr.write(self.style.ERROR('Posts need at least one user'))
+            return
+        if n_comments and not n_posts:
+            self.stderr.write(self.style.ERROR('Comments need at least one post'))
+            return
+
+        first_user = _reserve_ids('users_user', n_users)
+        first_post = _reserve_ids('users_post', n_posts)
+        worker_options = {
+            'seed': options['seed'],
+            # Один хеш на всех: Argon2 на каждого пользователя занял бы часы
+            'password': make_password('password'),
+            'first_user': first_user,
+            'first_post': first_post,
+            'n_posts': n_posts,
+            'start': now - timedelta(days=options['days']),
+            'now': now,
+        }
 
-        # Создание пользователей
-        users = []
-        for _ in range(42):  # Создаем пользователей
-            user = User.objects.create(
-                email=fake.email(),
-                name=fake.name(),
+        # Skewed distributions: a few prolific authors and a few hot posts
+        posts_per_user = _power_law_split(n_posts, n_users, options['skew'], rng)
+        authors = list(itertools.chain.from_iterable(
+            itertools.repeat(first_user + i, count) for i, count in enumerate(posts_per_user)
+        ))
+        rng.shuffle(authors)
+        comments_per_post = _power_law_split(n_comments, n_posts, options['skew'], rng)
+        commented = itertools.chain.from_iterable(
+            itertools.repeat(i, count) for i, count in enumerate(comments_per_post)
+        )
+
+        batch_size = options['batch_size']
+        workers = max(options['workers'], 1)
+        # Дочерние процессы не должны унаследовать открытое соединение
+        if not connection.in_atomic_block:
+            connection.close()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers, initializer=_init_worker, initargs=(worker_options,)) as pool:
+            load = functools.partial(self._load, pool, window=workers * 2)
+            load('users_user', USER_COLUMNS, _user_batches(n_users, batch_size))
+            load('users_post', bulk_import.POST_COLUMNS, _post_batches(authors, batch_size))
+            load('users_comment', bulk_import.COMMENT_COLUMNS, _comment_batches(commented, batch_size))
+
+        if n_comments:
+            started = time.monotonic()
+            with connection.cursor() as cursor:
+                cursor.execute(SUMMARY_SQL, [first_post, first_post + n_posts - 1])
+            self.stdout.write(f'Comment summaries updated in {time.monotonic() - started:.1f}s')
+
+        counting.reset_counts()
+        response_cache.invalidate(response_cache.LIST_TAG)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {n_users} users, {n_posts} posts and {n_comments} comments',
+        ))
+
+    def _load(self, pool, table, columns, tasks, window):
+        started = time.monotonic()
+        rows_written = 0
+        copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+        def write(result):
+            nonlocal rows_written
+            rows = result.get()
+            with connection.cursor() as cursor, cursor.copy(copy_sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            rows_written += len(rows)
+
+        # Процессы генерируют следующие пачки, пока текущая уходит в COPY;
+        # окно ограничивает число пачек в памяти
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_generate, (task,)))
+            if len(pending) >= window:
+                write(pending.popleft())
+        while pending:
+            write(pending.popleft())
+        if rows_written:
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{table}: {rows_written} rows in {elapsed:.1f}s ({rows_written / max(elapsed, 1e-6):.0f} rows/s)',
             )
-            user.set_password('password')  # Устанавливаем пароль
-            user.save()
-            users.append(user)
-            self.stdout.write(self.style.SUCCESS(f'Created user {user.email}'))
-
-        # Создание постов
-        for user in users:
-            for _ in range(5):  # Каждый пользователь создает 3 поста
-                post = Post.objects.create(
-                    title=fake.sentence(),
-                    short_description=fake.text(max_nb_chars=100),
-                    content=fake.text(),
-                    image_path=fake.image_url(),
-                    author=user
-                )
-                self.stdout.write(self.style.SUCCESS(f'Created post {post.title} by {user.email}'))
-
-                # Создание комментариев к посту
-                for _ in range(4):  # Каждый пост получает 2 комментария
-                    comment = Comment.objects.create(
-                        author_name=fake.name(),
-                        content=fake.text(max_nb_chars=200),
-                        post=post
-                    )
-                    self.stdout.write(self.style.SUCCESS(f'Created comment by {comment.author_name} on post {post.title}'))
+
+
+def _reserve_ids(table, count):
+    """Take ``count`` consecutive ids from the table's sequence; return the first."""
+    if not count:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT setval(seq::regclass, nextval(seq::regclass) + %s - 1) - %s + 1
+            FROM pg_get_serial_sequence(%s, 'id') AS seq
+            """,
+            [count, count, table],
+        )
+        return cursor.fetchone()[0]
+
+
+def _power_law_split(total, buckets, exponent, rng):
+    """Split ``total`` over ``buckets`` with weights ``1 / rank ** exponent`` in random order."""
+    if not buckets:
+        return []
+    weights = [1 / rank**exponent for rank in range(1, buckets + 1)]
+    rng.shuffle(weights)
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for i in rng.sample(range(buckets), total - sum(counts)):
+        counts[i] += 1
+    return counts
+
+
+def _user_batches(count, batch_size):
+    for start in range(0, count, batch_size):
+        yield ('users', start, min(batch_size, count - start))
+
+
+def _post_batches(authors, batch_size):
+    for start in range(0, len(authors), batch_size):
+        yield ('posts', start, authors[start:start + batch_size])
+
+
+def _comment_batches(post_indexes, batch_size):
+    for number in itertools.count():
+        batch = list(itertools.islice(post_indexes, batch_size))
+        if not batch:
+            return
+        yield ('comments', number, batch)
+
+
+def _init_worker(options):
+    _options.update(options)
+
+
+def _generate(task):
+    kind, start, payload = task
+    seed = _options['seed']
+    # Каждая пачка сидирована отдельно, поэтому результат не зависит от числа процессов
+    batch_seed = f'{seed}:{kind}:{start}'
+    fake = Faker()
+    fake.seed_instance(batch_seed)
+    rng = random.Random(batch_seed)
+
+    if kind == 'users':
+        date_joined = _options['start']
+        return [
+            [
+                _options['first_user'] + i, _options['password'], False, False, True, date_joined,
+                fake.name(), f"{fake.user_name()}.{i}@{fake.free_email_domain()}",
+            ]
+            for i in range(start, start + payload)
+        ]
+
+    if kind == 'posts':
+        rows = []
+        for i, author_id in enumerate(payload, start=start):
+            created_at = _post_created_at(i)
+            rows.append([
+                _options['first_post'] + i, fake.sentence(nb_words=6)[:200], fake.text(max_nb_chars=100),
+                fake.text(max_nb_chars=1000), None, created_at, created_at, author_id, 0, None, '', 0,
+            ])
+        return rows
+
+    rows = []
+    for post_index in payload:
+        post_created_at = _post_created_at(post_index)
+        age = (_options['now'] - post_created_at).total_seconds()
+        rows.append([
+            _options['first_post'] + post_index, fake.name(), fake.text(max_nb_chars=200),
+            post_created_at + timedelta(seconds=rng.random() * age),
+        ])
+    return rows
+
+
+def _post_created_at(index):
+    # Даты растут вместе с id, как у настоящих постов
+    span = _options['now'] - _options['start']
+    return _options['start'] + span * (index / max(_options['n_posts'], 1))
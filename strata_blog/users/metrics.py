@@ -0,0 +1,214 @@
+"""
+Prometheus metrics: request rate and latency per route, SQL queries and time
+per request, cache hit ratios and worker gauges, served at ``/metrics``.
+
+``MetricsMiddleware`` opens a ``RequestStats`` for every request in a context
+variable; ``record_query``, installed on each new database connection (see
+``signals.py``), adds every SQL statement to it. Context variables follow the
+request into ``sync_to_async`` threads, so this works under WSGI and ASGI.
+
+With several gunicorn/uvicorn workers set ``PROMETHEUS_MULTIPROC_DIR`` (see
+``config/gunicorn.py``): every worker then writes its samples to files there
+and ``/metrics`` aggregates them, whichever worker answers the scrape.
+"""
+
+import collections
+import contextlib
+import contextvars
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.http import HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client import REGISTRY
+from prometheus_client import CollectorRegistry
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+from prometheus_client import generate_latest
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ["route", "method", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to produce a response.", ["route", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements run per request.", ["route", "method"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per request.", ["route", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements run.", ["alias"])
+DB_ERRORS = Counter("db_query_errors_total", "SQL statements that raised.", ["alias"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Application cache lookups.", ["cache", "result"])
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being handled.", multiprocess_mode="livesum",
+)
+WORKER_STARTED = Gauge(
+    "worker_start_time_seconds", "Start time of each live worker process.", multiprocess_mode="liveall",
+)
+WORKER_REQUESTS = Gauge(
+    "worker_requests_handled", "Requests handled by each live worker process.", multiprocess_mode="liveall",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Connections held by the pool, idle or checked out.", ["alias"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_IDLE = Gauge(
+    "db_pool_idle_connections", "Pooled connections ready to be checked out.", ["alias"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_waiting_requests", "Checkouts waiting for a free connection.", ["alias"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Counter("db_pool_wait_seconds_total", "Time spent waiting for a pooled connection.", ["alias"])
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that failed or timed out.", ["alias"])
+DB_POOL_CONNECTS = Counter("db_pool_connects_total", "Connections opened by the pool.", ["alias"])
+WORKER_STARTED.set_to_current_time()
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        # Seconds per category of ``measure`` blocks (cache, render, serialize)
+        self.durations = collections.defaultdict(float)
+        self.measuring = set()
+
+
+def current_stats():
+    """The ``RequestStats`` of the request being handled, or ``None``."""
+    return _request_stats.get()
+
+
+@contextlib.contextmanager
+def measure(category):
+    """
+    Add the time spent in the block to the current request's ``category``.
+    Nested blocks of the same category are counted once.
+    """
+    stats = _request_stats.get()
+    if stats is None or category in stats.measuring:
+        yield
+        return
+    stats.measuring.add(category)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.durations[category] += time.perf_counter() - started
+        stats.measuring.discard(category)
+
+
+def record_query(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` callback: time every SQL statement."""
+    alias = context["connection"].alias
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    except Exception:
+        DB_ERRORS.labels(alias).inc()
+        raise
+    finally:
+        query_finished(alias, started)
+
+
+def query_finished(alias, started):
+    """Count a statement that started at ``perf_counter()`` ``started``."""
+    DB_QUERIES.labels(alias).inc()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def record_pool(alias, pool):
+    """Export the stats of a ``psycopg_pool`` pool; counters since the last call."""
+    stats = pool.pop_stats()
+    DB_POOL_CONNECTIONS.labels(alias).set(stats.get("pool_size", 0))
+    DB_POOL_IDLE.labels(alias).set(stats.get("pool_available", 0))
+    DB_POOL_WAITING.labels(alias).set(stats.get("requests_waiting", 0))
+    DB_POOL_WAIT.labels(alias).inc(stats.get("requests_wait_ms", 0) / 1000)
+    DB_POOL_TIMEOUTS.labels(alias).inc(stats.get("requests_errors", 0))
+    DB_POOL_CONNECTS.labels(alias).inc(stats.get("connections_num", 0))
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+            REQUESTS_IN_PROGRESS.dec()
+        self._finish(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+            REQUESTS_IN_PROGRESS.dec()
+        self._finish(request, response, stats)
+        return response
+
+    def _start(self):
+        REQUESTS_IN_PROGRESS.inc()
+        stats = RequestStats()
+        return stats, _request_stats.set(stats)
+
+    def _finish(self, request, response, stats):
+        # view_name, не путь: число меток не растёт вместе с числом постов
+        match = getattr(request, "resolver_match", None)
+        route = match.view_name if match else "<unresolved>"
+        method = request.method
+        REQUESTS.labels(route, method, response.status_code).inc()
+        REQUEST_DURATION.labels(route, method).observe(time.perf_counter() - stats.started)
+        REQUEST_DB_QUERIES.labels(route, method).observe(stats.db_queries)
+        REQUEST_DB_DURATION.labels(route, method).observe(stats.db_time)
+        WORKER_REQUESTS.inc()
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
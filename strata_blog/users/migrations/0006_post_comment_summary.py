@@ -0,0 +1,46 @@
+# Generated by Django 5.0.8 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+UPDATE users_post p SET
+    comment_count = s.comment_count,
+    last_comment_at = s.created_at,
+    last_comment_author = s.author_name
+FROM (
+    SELECT DISTINCT ON (post_id)
+        post_id,
+        COUNT(*) OVER (PARTITION BY post_id) AS comment_count,
+        created_at,
+        author_name
+    FROM users_comment
+    ORDER BY post_id, created_at DESC, id DESC
+) s
+WHERE s.post_id = p.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_comment_author',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.8 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_post_comment_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='users_comme_post_id_8d06ea_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.8 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_slowquery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        # COPY and raw INSERTs (bulk_import, seed) leave the column out
+        migrations.RunSQL(
+            "ALTER TABLE users_post ALTER COLUMN image_variants SET DEFAULT '{}'::jsonb",
+            "ALTER TABLE users_post ALTER COLUMN image_variants DROP DEFAULT",
+        ),
+    ]
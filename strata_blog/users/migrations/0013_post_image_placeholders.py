@@ -0,0 +1,28 @@
+# Generated by Django 5.0.8 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_blurhash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_color',
+            field=models.CharField(blank=True, default='', editable=False, max_length=7),
+        ),
+        # COPY and raw INSERTs (bulk_import, seed) leave the columns out
+        migrations.RunSQL(
+            "ALTER TABLE users_post ALTER COLUMN image_blurhash SET DEFAULT '', ALTER COLUMN image_color SET DEFAULT ''",
+            "ALTER TABLE users_post ALTER COLUMN image_blurhash DROP DEFAULT, ALTER COLUMN image_color DROP DEFAULT",
+        ),
+    ]
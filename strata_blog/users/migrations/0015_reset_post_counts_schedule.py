@@ -0,0 +1,33 @@
+# Generated by Django 5.0.8 on 2026-10-18 18:05
+
+from django.db import migrations
+
+TASK_NAME = 'Reset post counts'
+
+
+def schedule_reset(apps, schema_editor):
+    """Recompute the cached post counters every 15 minutes (see counting)."""
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    interval, _created = IntervalSchedule.objects.get_or_create(every=15, period='minutes')
+    PeriodicTask.objects.update_or_create(
+        name=TASK_NAME,
+        defaults={'task': 'strata_blog.users.tasks.reset_post_counts', 'interval': interval},
+    )
+
+
+def unschedule_reset(apps, schema_editor):
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTask.objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_comment_buffer_id'),
+        ('django_celery_beat', '0018_improve_crontab_helptext'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_reset, unschedule_reset),
+    ]
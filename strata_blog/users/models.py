@@ -2,14 +2,34 @@
 from typing import ClassVar
 
 from django.contrib.auth.models import AbstractUser
-from django.db.models import CharField, EmailField, Model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import OpClass
+from django.contrib.postgres.search import SearchVector
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import MinLengthValidator
+from django.db import models
+from django.db.models import Case
+from django.db.models import CharField
+from django.db.models import Count
+from django.db.models import EmailField
+from django.db.models import F
+from django.db.models import Model
+from django.db.models import OuterRef
+from django.db.models import Q
+from django.db.models import Subquery
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Now
+from django.db.models.functions import Upper
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
-from django.core.validators import MinLengthValidator
 
+from . import counting
+from . import images
+from . import response_cache
 from .managers import UserManager
 
-from django.db import models
 
 class User(AbstractUser):
     """
@@ -30,6 +50,12 @@ class User(AbstractUser):
 
     objects: ClassVar[UserManager] = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Autocomplete and admin icontains search on UPPER(name)
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='users_user_name_upper_trgm'),
+        ]
+
     def get_absolute_url(self) -> str:
         """Get URL for user's detail view.
 
@@ -42,36 +68,182 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+# Text search configuration of Post.search_vector; queries must use the same one
+SEARCH_CONFIG = 'english'
+
+
 class Post(Model):
     title = models.CharField(max_length=200, validators=[MinLengthValidator(10)])
     short_description = models.TextField()
     content = models.TextField()
     image_path = models.ImageField(upload_to='blog/%Y/%m/%d/', null=True, blank=True)
+    # Resized WebP/JPEG copies of image_path, {format: {width: name}}; see images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Shown until the image loads: BlurHash string and dominant color (#rrggbb)
+    image_blurhash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    image_color = models.CharField(max_length=7, blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Denormalized comment summary, kept current by Comment.save/delete and
+    # PostViewSet.add_comment so that listings never aggregate users_comment
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_comment_author = models.CharField(max_length=100, blank=True, default='', editable=False)
+    # Bumped by every change to the post or its comments; feeds ETag/Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Stored by Postgres itself, so raw-SQL inserts and updates keep it current too
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('short_description', weight='B', config=SEARCH_CONFIG)
+            + SearchVector('content', weight='C', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         indexes = [
             models.Index(fields=['title']),
             models.Index(fields=['created_at']),
             models.Index(fields=['author']),
+            # Keyset pagination: (sort column, id) for each allowed sort_by
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['title', 'id']),
+            models.Index(fields=['author', 'created_at', 'id']),
+            # MAX(updated_at) validators for the list endpoints
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['author', 'updated_at']),
+            GinIndex(fields=['search_vector']),
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='users_post_title_upper_trgm'),
         ]
 
     def __str__(self):
         return f"Post by {self.author} on {self.title[:30]}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Чтобы save() видел, что картинку заменили
+        if 'image_path' in instance.__dict__:
+            instance._loaded_image_path = instance.__dict__['image_path']
+        return instance
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        if not is_new:
+            self.version += 1
+        image_changed = bool(self.image_path) and (
+            is_new or self.image_path.name != getattr(self, '_loaded_image_path', self.image_path.name)
+        )
+        if image_changed:
+            self.image_variants = {}
+            self.image_blurhash = self.image_color = ''
+        super().save(*args, **kwargs)
+        if image_changed:
+            self._loaded_image_path = self.image_path.name
+            if images.is_stored(self.image_path.name):
+                images.schedule_variants(self.pk)
+        if is_new:
+            counting.post_created(self.author_id)
+            response_cache.post_created(self.author_id)
+        else:
+            response_cache.post_updated(self.pk, self.author_id, reorders=True)
+
+    def delete(self, *args, **kwargs):
+        post_id = self.pk
+        result = super().delete(*args, **kwargs)
+        counting.post_deleted(self.author_id)
+        response_cache.post_deleted(post_id, self.author_id)
+        return result
+
+    @classmethod
+    def refresh_comment_summary(cls, post_ids):
+        """Recompute the denormalized comment columns from users_comment."""
+        comments = Comment.objects.filter(post=OuterRef('pk'))
+        latest = comments.order_by('-created_at', '-id')
+        cls.objects.filter(pk__in=post_ids).update(
+            comment_count=Coalesce(
+                Subquery(comments.order_by().values('post').annotate(n=Count('id')).values('n')),
+                0,
+            ),
+            last_comment_at=Subquery(latest.values('created_at')[:1]),
+            last_comment_author=Coalesce(Subquery(latest.values('author_name')[:1]), Value('')),
+            updated_at=Now(),
+        )
+
 class Comment(Model):
     post = models.ForeignKey(Post, related_name='comments', on_delete=models.CASCADE)
     author_name = models.CharField(max_length=100)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Id записи в потоке comment_buffer: повторная выгрузка не создаёт дубликат.
+    # NULL, а не '', у всех комментариев, записанных напрямую
+    buffer_id = models.CharField(max_length=32, null=True, blank=True, unique=True, editable=False)  # noqa: DJ001
 
     class Meta:
         indexes = [
             models.Index(fields=['post']),
             models.Index(fields=['author_name']),
             models.Index(fields=['created_at']),
+            # Keyset pagination of a post's comments
+            models.Index(fields=['post', 'created_at', 'id']),
+            GinIndex(OpClass(Upper('author_name'), name='gin_trgm_ops'), name='users_comme_author_upper_trgm'),
         ]
 
     def __str__(self):
         return f"Comment by {self.author_name}"
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        response_cache.comments_changed(self.post_id)
+        if not is_new:
+            Post.refresh_comment_summary([self.post_id])
+            return
+
+        newer = Q(last_comment_at__isnull=True) | Q(last_comment_at__lte=self.created_at)
+        Post.objects.filter(pk=self.post_id).update(
+            comment_count=F('comment_count') + 1,
+            last_comment_at=Case(When(newer, then=Value(self.created_at)), default=F('last_comment_at')),
+            last_comment_author=Case(When(newer, then=Value(self.author_name)), default=F('last_comment_author')),
+            updated_at=Now(),
+        )
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Post.refresh_comment_summary([self.post_id])
+        response_cache.comments_changed(self.post_id)
+        return result
+
+
+class SlowQuery(Model):
+    """One normalized SQL statement that ran slower than ``SLOW_QUERY_THRESHOLD_MS``."""
+
+    fingerprint = models.CharField(max_length=32, unique=True)
+    sql = models.TextField()
+    params_shape = models.CharField(max_length=255, blank=True)
+    calls = models.PositiveIntegerField(default=1)
+    total_ms = models.FloatField()
+    max_ms = models.FloatField()
+    last_ms = models.FloatField()
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    # Latest sampled EXPLAIN (FORMAT JSON); ANALYZE only for read-only statements
+    plan = models.JSONField(null=True, blank=True)
+    plan_analyzed = models.BooleanField(default=False)
+    plan_captured_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-last_seen']
+        indexes = [
+            models.Index(fields=['last_seen']),
+        ]
+
+    def __str__(self):
+        return self.sql[:80]
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls
@@ -0,0 +1,92 @@
+"""
+Image placeholders shown while a post image loads: a BlurHash
+(https://blurha.sh) string, decoded to a blurred preview in the browser by
+``static/js/project.js``, and the dominant color as ``#rrggbb``.
+
+Both come from a ``SAMPLE_SIZE`` downsample of the image, so the work is a
+few numpy operations on at most 32x32 pixels. They are computed next to the
+resized variants by ``images.generate_variants``.
+"""
+
+import numpy as np
+from PIL import Image
+
+SAMPLE_SIZE = 32
+X_COMPONENTS = 4
+Y_COMPONENTS = 3
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def compute(image):
+    """Return ``(blurhash, dominant_color)`` for a Pillow image."""
+    sample = image.copy()
+    sample.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX)
+    if "A" in sample.getbands():
+        # Прозрачное - на белом, как в JPEG-копиях (images._flatten), а не чёрным
+        sample = sample.convert("RGBA")
+        sample = Image.alpha_composite(Image.new("RGBA", sample.size, (255, 255, 255, 255)), sample)
+    sample = sample.convert("RGB")
+    pixels = np.asarray(sample, dtype=np.float64)
+    return blurhash(pixels), dominant_color(pixels)
+
+
+def blurhash(pixels, x_components=X_COMPONENTS, y_components=Y_COMPONENTS):
+    """Encode an ``(height, width, 3)`` array of 0-255 sRGB values."""
+    height, width, _ = pixels.shape
+    linear = _srgb_to_linear(pixels)
+
+    # Все коэффициенты DCT сразу: cos по строкам и столбцам, затем einsum
+    cos_y = np.cos(np.pi * np.outer(np.arange(y_components), np.arange(height)) / height)
+    cos_x = np.cos(np.pi * np.outer(np.arange(x_components), np.arange(width)) / width)
+    factors = np.einsum("jy,ix,yxc->jic", cos_y, cos_x, linear) / (width * height)
+    factors[1:] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(np.clip(np.floor(np.abs(ac).max() * 166 - 0.5), 0, 82))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+
+    r, g, b = _linear_to_srgb(dc)
+    result += _encode83((int(r) << 16) + (int(g) << 8) + int(b), 4)
+
+    quantised = np.clip(np.floor(_sign_pow(ac / max_value, 0.5) * 9 + 9.5), 0, 18).astype(int)
+    for qr, qg, qb in quantised:
+        result += _encode83(qr * 19 * 19 + qg * 19 + qb, 2)
+    return result
+
+
+def dominant_color(pixels):
+    """Mean color of the most populated bin of a 16x16x16 color histogram."""
+    flat = pixels.reshape(-1, 3)
+    bins = flat.astype(np.int64) >> 4
+    keys = (bins[:, 0] << 8) | (bins[:, 1] << 4) | bins[:, 2]
+    mode = np.bincount(keys).argmax()
+    r, g, b = np.round(flat[keys == mode].mean(axis=0)).astype(int)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _srgb_to_linear(values):
+    values = values / 255
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(values):
+    values = np.clip(values, 0, 1)
+    srgb = np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1 / 2.4) - 0.055)
+    return np.floor(srgb * 255 + 0.5).astype(int)
+
+
+def _sign_pow(values, exponent):
+    return np.sign(values) * np.abs(values) ** exponent
+
+
+def _encode83(value, length):
+    return "".join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
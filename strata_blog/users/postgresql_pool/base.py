@@ -0,0 +1,98 @@
+"""
+PostgreSQL backend whose connections come from a ``psycopg_pool`` pool.
+
+Django 5.0 opens one connection per thread and keeps it for ``CONN_MAX_AGE``;
+under the uvicorn workers every request runs in a thread of its own, so
+connections are either reopened on every request or pile up with the
+threads. Here each process keeps one pool per alias, sized by
+``OPTIONS["pool"]`` (``min_size``, ``max_size``, ``timeout`` for a checkout,
+``max_idle``, ...), and ``connection.close()`` - at the end of every request,
+with ``CONN_MAX_AGE = 0`` - returns the connection to it instead of closing
+it. A process never holds more than ``max_size`` connections per alias.
+
+The settings mirror ``OPTIONS["pool"]`` of Django 5.1's own backend, so
+upgrading means switching ``ENGINE`` back. Connections are ordinary psycopg
+connections with client-side binding: the raw SQL of ``services`` runs
+unchanged. Pool stats are exported by ``metrics.record_pool``.
+"""
+
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import NO_DB_ALIAS
+from django.db.backends.postgresql.base import (
+    DatabaseWrapper as PostgreSQLDatabaseWrapper,
+)
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.utils.asyncio import async_unsafe
+from psycopg_pool import ConnectionPool
+
+from strata_blog.users import metrics
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+    @property
+    def pool(self):
+        options = self.settings_dict["OPTIONS"].get("pool")
+        # _nodb_cursor (создание тестовой базы и т. п.) подключается к базе postgres
+        if self.alias == NO_DB_ALIAS or not options:
+            return None
+        pool = _pools.get(self.alias)
+        if pool is None:
+            if self.settings_dict["CONN_MAX_AGE"] != 0:
+                msg = "Pooled connections are returned after every request: set CONN_MAX_AGE to 0."
+                raise ImproperlyConfigured(msg)
+            with _pools_lock:
+                pool = _pools.get(self.alias)
+                if pool is None:
+                    pool = _pools[self.alias] = ConnectionPool(
+                        kwargs=self.get_connection_params(),
+                        check=ConnectionPool.check_connection if self.settings_dict["CONN_HEALTH_CHECKS"] else None,
+                        name=self.alias,
+                        open=False,
+                        **({} if options is True else options),
+                    )
+        return pool
+
+    def close_pool(self):
+        pool = _pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close()
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pool", None)
+        return params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        # Открывается при первом подключении, а не при импорте настроек
+        pool.open()
+        try:
+            connection = pool.getconn()
+        finally:
+            metrics.record_pool(self.alias, pool)
+        # Как в DatabaseWrapper.get_new_connection
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        if isolation_level is None:
+            self.isolation_level = IsolationLevel.READ_COMMITTED
+        else:
+            self.isolation_level = IsolationLevel(isolation_level)
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if self.connection is None or pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+        # Соединение уже может быть выдано другому потоку
+        self.connection = None
+        return None
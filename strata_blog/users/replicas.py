@@ -0,0 +1,197 @@
+"""
+Read replicas (``DATABASE_REPLICAS``, alias -> weight).
+
+``ReplicaMiddleware`` lets the reads of a safe (GET/HEAD/OPTIONS) request go to
+a replica; everything else - writes, unsafe requests, Celery tasks, management
+commands - stays on ``default``. The replica is picked once per request, at
+random by weight among the healthy ones, so one page never mixes two replicas.
+ORM reads get it through ``ReplicaRouter``, raw SQL through ``read_connection``.
+
+A replica is healthy unless connecting to it failed in the last
+``DATABASE_REPLICA_RETRY`` seconds or it replays more than
+``DATABASE_REPLICA_MAX_LAG`` seconds behind the primary; both are checked at
+most every ``DATABASE_REPLICA_CHECK_INTERVAL`` seconds per process, on a
+connection of its own (not from the pool) that gives up after
+``DATABASE_REPLICA_CHECK_TIMEOUT`` seconds, so an unreachable replica delays
+a request by that much at most.
+
+Read-your-writes: after a successful unsafe request the client gets a cookie that keeps
+its reads on ``default`` for ``DATABASE_REPLICA_STICKY_SECONDS``, longer than
+the lag a healthy replica may have. The async views read through
+``aread_alias``.
+"""
+
+import contextvars
+import logging
+import random
+import time
+
+import psycopg
+from asgiref.sync import iscoroutinefunction
+from asgiref.sync import markcoroutinefunction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+
+logger = logging.getLogger("strata_blog.replicas")
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+STICKY_COOKIE = "db_primary"
+
+# Отставание реплики в секундах; NULL, если это не реплика
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+class _Reads:
+    """Reads of one request that may use a replica; ``alias`` once picked."""
+
+    alias = None
+
+
+_reads = contextvars.ContextVar("replica_reads", default=None)
+
+# alias -> time.monotonic() until which the replica is skipped / not rechecked
+_down_until = {}
+_checked_until = {}
+
+
+def read_alias():
+    """Database alias for the current read: a replica or ``default``."""
+    reads = _reads.get()
+    if reads is None:
+        return DEFAULT_DB_ALIAS
+    if reads.alias is None:
+        reads.alias = _pick()
+    return reads.alias
+
+
+async def aread_alias():
+    """``read_alias`` for ``async_db``: the health checks block, so they run in a thread."""
+    reads = _reads.get()
+    if reads is None:
+        return DEFAULT_DB_ALIAS
+    if reads.alias is None:
+        reads.alias = await sync_to_async(_pick, thread_sensitive=False)()
+    return reads.alias
+
+
+def read_connection():
+    """The connection raw SQL reads should use: ``read_connection().cursor()``."""
+    return connections[read_alias()]
+
+
+def staleness_ns():
+    """How far behind the primary the current request's reads may be."""
+    if _reads.get() is None:
+        return 0
+    return int(settings.DATABASE_REPLICA_MAX_LAG * 1_000_000_000)
+
+
+def _pick():
+    now = time.monotonic()
+    healthy = {
+        alias: weight for alias, weight in settings.DATABASE_REPLICAS.items()
+        if weight > 0 and _healthy(alias, now)
+    }
+    if not healthy:
+        return DEFAULT_DB_ALIAS
+    return random.choices(list(healthy), weights=list(healthy.values()))[0]  # noqa: S311
+
+
+def _healthy(alias, now):
+    if _down_until.get(alias, 0) > now:
+        return False
+    if _checked_until.get(alias, 0) > now:
+        return True
+    _checked_until[alias] = now + settings.DATABASE_REPLICA_CHECK_INTERVAL
+    try:
+        lag = _lag(alias)
+    except psycopg.Error:
+        logger.warning("Replica %s is unavailable", alias, exc_info=True)
+        _down_until[alias] = now + settings.DATABASE_REPLICA_RETRY
+        return False
+    if lag is not None and lag > settings.DATABASE_REPLICA_MAX_LAG:
+        logger.warning("Replica %s is %.1f s behind", alias, lag)
+        _down_until[alias] = now + settings.DATABASE_REPLICA_CHECK_INTERVAL
+        return False
+    return True
+
+
+def _lag(alias):
+    # Не из пула: его timeout (секунды ожидания) держал бы запрос при недоступной реплике
+    timeout = settings.DATABASE_REPLICA_CHECK_TIMEOUT
+    params = connections[alias].get_connection_params()
+    params["connect_timeout"] = timeout
+    params["options"] = f"{params.get('options', '')} -c statement_timeout={timeout * 1000}".strip()
+    with psycopg.connect(**params) as connection:
+        return connection.execute(LAG_QUERY).fetchone()[0]
+
+
+def replica_reads_allowed(request):
+    return request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _reads.set(_Reads() if replica_reads_allowed(request) else None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _reads.reset(token)
+        return self._stick(request, response)
+
+    async def __acall__(self, request):
+        token = _reads.set(_Reads() if replica_reads_allowed(request) else None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _reads.reset(token)
+        return self._stick(request, response)
+
+    def _stick(self, request, response):
+        # Неудавшийся запрос ничего не записал: реплики ему не мешают
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
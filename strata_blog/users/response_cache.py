@@ -0,0 +1,152 @@
+"""
+Tag-invalidated response cache for the posts API.
+
+Every cached entry records the version of each tag it depends on (``list``,
+``post:<id>``, ``author:<id>`` for an author's posts, ``profile:<id>`` for the
+author's name and email in a post detail). Invalidating a tag replaces its version with
+the current time in nanoseconds, so entries built from the old state stop
+matching on the next read and nothing else is touched. An entry is not stored
+at all if one of its tags was invalidated after the view started building it.
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import metrics
+from . import replicas
+
+LIST_TAG = "list"
+
+ENTRY_PREFIX = "posts:response"
+TAG_PREFIX = "posts:tag"
+
+
+def post_tag(post_id):
+    return f"post:{post_id}"
+
+
+def author_tag(author_id):
+    return f"author:{author_id}"
+
+
+def profile_tag(author_id):
+    return f"profile:{author_id}"
+
+
+def get_cache():
+    return caches[settings.POSTS_RESPONSE_CACHE]
+
+
+def make_key(name, params):
+    """``params`` is the already normalized query, so equal requests share a key."""
+    digest = hashlib.md5(  # noqa: S324
+        json.dumps(params, sort_keys=True, default=str).encode(),
+    ).hexdigest()
+    return f"{ENTRY_PREFIX}:{name}:{digest}"
+
+
+def begin():
+    """Mark the start of a cache miss; pass the result to ``set``."""
+    # Данные с реплики могут быть старше начала запроса на её допустимое отставание
+    return time.time_ns() - replicas.staleness_ns()
+
+
+@metrics.measure("cache")
+def tag_versions(tags, default):
+    cache = get_cache()
+    keys = {f"{TAG_PREFIX}:{tag}": tag for tag in tags}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    for key, tag in keys.items():
+        if tag not in versions:
+            # Unknown (or evicted) tags start at ``default``, never at a version
+            # an older entry could have been stored with
+            cache.add(key, default, timeout=None)
+            versions[tag] = cache.get(key, default)
+    return versions
+
+
+@metrics.measure("cache")
+def get(key):
+    if not settings.POSTS_RESPONSE_CACHE_ENABLED:
+        return None
+    entry = get_cache().get(key)
+    if entry is None or tag_versions(entry["tags"], time.time_ns()) != entry["tags"]:
+        metrics.cache_lookup("response", hit=False)
+        return None
+    metrics.cache_lookup("response", hit=True)
+    return entry["data"]
+
+
+@metrics.measure("cache")
+def set(key, data, tags, started):  # noqa: A001
+    if not settings.POSTS_RESPONSE_CACHE_ENABLED:
+        return
+    versions = tag_versions(tags, started)
+    if any(version > started for version in versions.values()):
+        # Invalidated while the response was being built: it may be stale
+        return
+    get_cache().set(
+        key,
+        {"tags": versions, "data": data},
+        timeout=settings.POSTS_RESPONSE_CACHE_TIMEOUT,
+    )
+
+
+def invalidate(*tags):
+    """Drop every entry tagged with any of ``tags``, now and again on commit."""
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def invalidate_committed(*tags):
+    """``invalidate`` for changes committed outside Django's connection (see ``async_services``)."""
+    _bump(tags)
+
+
+def post_tags(posts):
+    tags = {post_tag(post["id"]) for post in posts}
+    tags |= {author_tag(post["author"]["id"]) for post in posts}
+    return tags
+
+
+def post_created(author_id):
+    invalidate(LIST_TAG, author_tag(author_id))
+
+
+def post_updated(post_id, author_id, *, reorders=False):
+    if reorders:
+        invalidate(post_tag(post_id), LIST_TAG, author_tag(author_id))
+    else:
+        invalidate(post_tag(post_id))
+
+
+def post_deleted(post_id, author_id):
+    invalidate(post_tag(post_id), LIST_TAG, author_tag(author_id))
+
+
+def author_changed(author_id):
+    # LIST_TAG тоже: по нему строятся валидаторы общего списка (conditional)
+    invalidate(LIST_TAG, author_tag(author_id), profile_tag(author_id))
+
+
+def author_deleted(author_id):
+    # Посты автора удалены каскадом
+    invalidate(LIST_TAG, author_tag(author_id), profile_tag(author_id))
+
+
+def comments_changed(post_id):
+    invalidate(post_tag(post_id))
+
+
+@metrics.measure("cache")
+def _bump(tags):
+    version = time.time_ns()
+    get_cache().set_many(
+        {f"{TAG_PREFIX}:{tag}": version for tag in tags},
+        timeout=None,
+    )
@@ -0,0 +1,80 @@
+"""
+Opt-in per-request latency breakdown (``SERVER_TIMING = True``).
+
+Adds a ``Server-Timing`` header that browser devtools show next to each
+request and logs the same numbers as one JSON line per request on the
+``strata_blog.access`` logger:
+
+* ``db`` - SQL time and statement count, from ``metrics.record_query``;
+* ``cache`` - response cache and post counter lookups;
+* ``render`` - template rendering of the HTML pages;
+* ``serialize`` - JSON rendering of API responses;
+* ``total`` - the whole request, as seen by ``MetricsMiddleware``.
+
+Must come after ``metrics.MetricsMiddleware``, which collects the numbers.
+"""
+
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+access_logger = logging.getLogger("strata_blog.access")
+
+CATEGORIES = ("cache", "render", "serialize")
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._annotate(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self._annotate(request, response)
+        return response
+
+    def _annotate(self, request, response):
+        stats = metrics.current_stats()
+        if stats is None:
+            return
+        total = time.perf_counter() - stats.started
+        durations = {name: stats.durations[name] for name in CATEGORIES if name in stats.durations}
+
+        entries = [f'db;desc="{stats.db_queries} queries";dur={stats.db_time * 1000:.1f}']
+        entries += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        response["Server-Timing"] = ", ".join(entries)
+
+        match = getattr(request, "resolver_match", None)
+        user = getattr(request, "user", None)
+        access_logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "route": match.view_name if match else None,
+            "status": response.status_code,
+            "user_id": user.pk if user is not None and user.is_authenticated else None,
+            "db_queries": stats.db_queries,
+            "db_ms": round(stats.db_time * 1000, 1),
+            **{f"{name}_ms": round(seconds * 1000, 1) for name, seconds in durations.items()},
+            "total_ms": round(total * 1000, 1),
+        }))
@@ -0,0 +1,543 @@
+"""
+In-process post queries shared by the DRF ``PostViewSet`` and the HTML views.
+
+The HTML pages used to fetch ``/api/posts/`` over an HTTP loopback; they now
+call these functions directly, so a page render runs a single query path
+(usually a cache hit) and no extra request.
+"""
+
+import json
+
+from django.conf import settings
+from django.db import connection
+
+from . import counting
+from . import images
+from . import live_comments
+from . import replicas
+from . import response_cache
+from .api.pagination import CommentCursor
+from .api.pagination import CommentPagination
+from .api.pagination import InvalidCursorError
+from .api.pagination import PostCursor
+from .api.pagination import PostPagination
+from .api.pagination import SearchCursor
+from .models import SEARCH_CONFIG
+
+
+class InvalidQueryError(ValueError):
+    pass
+
+
+# Сводка по комментариям хранится в самом посте (см. Comment.save),
+# поэтому список читается из users_post без JOIN и GROUP BY по комментариям
+POST_LIST_COLUMNS = """
+    p.id,
+    p.title,
+    p.short_description,
+    p.created_at,
+    u.id as author_id,
+    u.name, u.email,
+    p.image_path,
+    p.last_comment_at as last_comment_date,
+    p.last_comment_author,
+    p.comment_count,
+    p.image_variants,
+    p.image_blurhash,
+    p.image_color
+"""
+
+POST_LIST_QUERY = f"""
+SELECT {POST_LIST_COLUMNS}
+FROM users_post p
+JOIN users_user u ON p.author_id = u.id
+"""
+
+POST_UPDATE_FIELDS = ['title', 'short_description', 'content', 'image_path']
+
+
+def post_list_item(row):
+    return {
+        'id': row[0],
+        'title': row[1],
+        'short_description': row[2],
+        'created_at': row[3],
+        'author': {
+            'id': row[4],
+            'name': row[5],
+            'email': row[6],
+        },
+        'image_path': row[7],
+        'last_comment_date': row[8],
+        'last_comment_author': row[9],
+        'comment_count': row[10],
+        'image_variants': _json(row[11]),
+        'image_blurhash': row[12],
+        'image_color': row[13],
+    }
+
+
+def _json(value):
+    # Django loads jsonb from raw cursors as text
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def default_count_mode(author_id=None):
+    if author_id:
+        return settings.POSTS_AUTHOR_COUNT_MODE
+    return settings.POSTS_COUNT_MODE
+
+
+def list_params(params, count_mode=None):
+    """
+    Normalize list query parameters (``page``/``page_size``/``sort_by``/
+    ``author_id`` and ``cursor``/``count``), so equal requests share a cache key.
+    """
+    try:
+        page_size = int(params.get('page_size') or PostPagination.page_size)
+        author_id = int(params['author_id']) if params.get('author_id') else None
+    except ValueError as e:
+        raise InvalidQueryError('Invalid page_size or author_id.') from e
+    page_size = max(1, min(page_size, PostPagination.max_page_size))
+
+    sort_by = params.get('sort_by', 'created_at')
+    if sort_by not in PostCursor.sort_fields:
+        sort_by = 'created_at'
+
+    normalized = {
+        'page_size': page_size,
+        'sort_by': sort_by,
+        'author_id': author_id,
+    }
+    if 'cursor' in params:
+        normalized['cursor'] = params['cursor']
+        return normalized
+
+    try:
+        normalized['page'] = max(1, int(params.get('page') or 1))
+    except ValueError as e:
+        raise InvalidQueryError('Invalid page.') from e
+    count = params.get('count') or count_mode or default_count_mode(author_id)
+    if count not in counting.COUNT_MODES:
+        raise InvalidQueryError('Invalid count mode.')
+    normalized['count'] = count
+    return normalized
+
+
+def list_posts(params, count_mode=None):
+    """Return a page of posts: page mode, or keyset mode when ``cursor`` is given."""
+    query = list_params(params, count_mode)
+    # Ответы кэшируются и сбрасываются по тегам при изменении постов и комментариев
+    cache_key = response_cache.make_key('list', query)
+    data = response_cache.get(cache_key)
+    if data is not None:
+        return data
+
+    started = response_cache.begin()
+    if 'cursor' in query:
+        data = _list_by_cursor(query)
+    else:
+        data = _list_by_page(query)
+
+    response_cache.set(cache_key, data, list_tags(query, data), started)
+    return data
+
+
+def list_tags(query, data):
+    tags = response_cache.post_tags(data['posts'])
+    author_id = query['author_id']
+    tags.add(response_cache.author_tag(author_id) if author_id else response_cache.LIST_TAG)
+    return tags
+
+
+def _list_by_page(query):
+    # Общее количество постов для пагинации, без COUNT(*) на каждый запрос
+    total_count, count_type = counting.post_count(query['count'], query['author_id'])
+
+    sql, params = page_sql(query)
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        results = cursor.fetchall()
+    return page_data(query, results, total_count, count_type)
+
+
+def page_sql(query):
+    page_size = query['page_size']
+    author_id = query['author_id']
+
+    # Определите смещение для SQL-запроса
+    offset = (query['page'] - 1) * page_size
+
+    # Основной SQL-запрос с пагинацией
+    sql = POST_LIST_QUERY
+    params = []
+    if author_id:
+        sql += " WHERE p.author_id = %s"
+        params.append(author_id)
+    sql += f" ORDER BY p.{query['sort_by']} DESC"
+    # Лишняя строка показывает, есть ли следующая страница, когда количество не считается
+    sql += " LIMIT %s OFFSET %s;"
+    return sql, [*params, page_size + 1, offset]
+
+
+def page_data(query, results, total_count, count_type):
+    page_size = query['page_size']
+    total_pages = None
+    if total_count is not None:
+        total_pages = (total_count // page_size) + (1 if total_count % page_size > 0 else 0)
+
+    return {
+        'total_count': total_count,
+        'count_type': count_type,
+        'page_size': page_size,
+        'current_page': query['page'],
+        'total_pages': total_pages,
+        'has_next': len(results) > page_size,
+        'posts': [post_list_item(row) for row in results[:page_size]],
+    }
+
+
+def _list_by_cursor(query):
+    """
+    Keyset variant of the list: an empty cursor returns the first page and each
+    page carries ``next_cursor`` for the following one, so deep pages cost the
+    same as the first.
+    """
+    sql, params = cursor_sql(query)
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        results = cursor.fetchall()
+    return cursor_data(query, results)
+
+
+def cursor_sql(query):
+    page_size = query['page_size']
+    sort_by = query['sort_by']
+    author_id = query['author_id']
+
+    try:
+        after = PostCursor.decode(query['cursor'], sort_by) if query['cursor'] else None
+    except InvalidCursorError as e:
+        raise InvalidQueryError(str(e)) from e
+
+    conditions = []
+    params = []
+    if author_id:
+        conditions.append("p.author_id = %s")
+        params.append(author_id)
+    if after is not None:
+        conditions.append(f"(p.{sort_by}, p.id) < (%s, %s)")
+        params.extend([after.value, after.pk])
+
+    sql = POST_LIST_QUERY
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY p.{sort_by} DESC, p.id DESC"
+    sql += " LIMIT %s;"
+    # Одна лишняя строка показывает, есть ли следующая страница
+    return sql, [*params, page_size + 1]
+
+
+def cursor_data(query, results):
+    page_size = query['page_size']
+    sort_by = query['sort_by']
+    has_next = len(results) > page_size
+    posts = [post_list_item(row) for row in results[:page_size]]
+
+    next_cursor = None
+    if has_next:
+        last = posts[-1]
+        sort_value = last['author']['id'] if sort_by == 'author_id' else last[sort_by]
+        next_cursor = PostCursor(sort_by, sort_value, last['id']).encode()
+
+    return {
+        'page_size': page_size,
+        'sort_by': sort_by,
+        'next_cursor': next_cursor,
+        'posts': posts,
+    }
+
+
+def search_posts(params):
+    """
+    Full-text search over title, short description and content, ranked by
+    ``ts_rank_cd`` on the stored ``search_vector`` and paginated by ``cursor``.
+    """
+    text = (params.get('q') or '').strip()
+    if not text:
+        raise InvalidQueryError('Search query is required.')
+    try:
+        page_size = int(params.get('page_size') or PostPagination.page_size)
+    except ValueError as e:
+        raise InvalidQueryError('Invalid page_size.') from e
+    page_size = max(1, min(page_size, PostPagination.max_page_size))
+    try:
+        after = SearchCursor.decode(params['cursor'], 'rank') if params.get('cursor') else None
+    except InvalidCursorError as e:
+        raise InvalidQueryError(str(e)) from e
+
+    # GIN-индекс по search_vector отбирает совпадения, ранжируются только они
+    query = f"""
+    SELECT {POST_LIST_COLUMNS},
+        ts_rank_cd(p.search_vector, q.query) as rank
+    FROM users_post p
+    JOIN users_user u ON p.author_id = u.id
+    CROSS JOIN websearch_to_tsquery(%s::regconfig, %s) q(query)
+    WHERE p.search_vector @@ q.query
+    """
+    sql_params = [SEARCH_CONFIG, text]
+    if after is not None:
+        query += " AND (ts_rank_cd(p.search_vector, q.query), p.id) < (%s, %s)"
+        sql_params.extend([after.value, after.pk])
+    query += " ORDER BY rank DESC, p.id DESC LIMIT %s;"
+
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(query, [*sql_params, page_size + 1])
+        results = cursor.fetchall()
+
+    posts = []
+    for row in results[:page_size]:
+        post = post_list_item(row)
+        post['rank'] = row[14]
+        posts.append(post)
+
+    next_cursor = None
+    if len(results) > page_size:
+        last = posts[-1]
+        next_cursor = SearchCursor('rank', last['rank'], last['id']).encode()
+
+    return {
+        'q': text,
+        'page_size': page_size,
+        'next_cursor': next_cursor,
+        'posts': posts,
+    }
+
+
+# Пост читается один раз, без JOIN с комментариями
+POST_DETAIL_QUERY = """
+SELECT
+    p.id,
+    p.title,
+    p.content,
+    u.id as author_id,
+    u.name, u.email,
+    p.image_path,
+    p.comment_count,
+    p.image_variants,
+    p.image_blurhash,
+    p.image_color
+FROM users_post p
+JOIN users_user u ON p.author_id = u.id
+WHERE p.id = %s;
+"""
+
+
+def get_post(pk):
+    """
+    Return the post with the first page of its comments, or ``None`` if it does
+    not exist. Later pages come from ``list_comments`` with ``comments_next_cursor``.
+    """
+    cache_key = post_cache_key(pk)
+    data = response_cache.get(cache_key)
+    if data is not None:
+        return data
+    started = response_cache.begin()
+
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(POST_DETAIL_QUERY, [pk])
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    comments, next_cursor = _comment_page(row[0], None, CommentPagination.page_size)
+    post_data = post_detail(row, comments, next_cursor)
+    response_cache.set(cache_key, post_data, post_tags(post_data), started)
+    return post_data
+
+
+def post_cache_key(pk):
+    return response_cache.make_key('retrieve', {'pk': str(pk)})
+
+
+def post_detail(row, comments, next_cursor):
+    return {
+        'id': row[0],
+        'title': row[1],
+        'content': row[2],
+        'author': {
+            'id': row[3],
+            'name': row[4],
+            'email': row[5],
+        },
+        'image_path': row[6],
+        'comment_count': row[7],
+        'image_variants': _json(row[8]),
+        'image_blurhash': row[9],
+        'image_color': row[10],
+        'comments': comments,
+        'comments_next_cursor': next_cursor,
+    }
+
+
+def post_tags(post_data):
+    # Не тег автора: его новые и изменённые посты эту страницу не меняют, а имя и email - меняют
+    return {response_cache.post_tag(post_data['id']), response_cache.profile_tag(post_data['author']['id'])}
+
+
+def list_comments(post_id, params):
+    """
+    Return one page of a post's comments, newest first, or ``None`` if the post
+    does not exist. ``cursor`` is the ``next_cursor`` of the previous page.
+    """
+    try:
+        post_id = int(post_id)
+        page_size = int(params.get('page_size') or CommentPagination.page_size)
+    except ValueError as e:
+        raise InvalidQueryError('Invalid post id or page_size.') from e
+    page_size = max(1, min(page_size, CommentPagination.max_page_size))
+    try:
+        after = CommentCursor.decode(params['cursor'], 'created_at') if params.get('cursor') else None
+    except InvalidCursorError as e:
+        raise InvalidQueryError(str(e)) from e
+
+    cache_key = response_cache.make_key(
+        'comments',
+        {'post_id': post_id, 'cursor': params.get('cursor') or None, 'page_size': page_size},
+    )
+    data = response_cache.get(cache_key)
+    if data is not None:
+        return data
+    started = response_cache.begin()
+
+    comments, next_cursor = _comment_page(post_id, after, page_size)
+    if not comments and not post_exists(post_id):
+        return None
+
+    data = {
+        'page_size': page_size,
+        'next_cursor': next_cursor,
+        'comments': comments,
+    }
+    response_cache.set(cache_key, data, {response_cache.post_tag(post_id)}, started)
+    return data
+
+
+def _comment_page(post_id, after, page_size):
+    sql, params = comment_page_sql(post_id, after, page_size)
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        results = cursor.fetchall()
+    return comment_page(results, page_size)
+
+
+def comment_page_sql(post_id, after, page_size):
+    # Использует индекс (post_id, created_at, id)
+    query = """
+    SELECT c.id, c.author_name, c.content, c.created_at
+    FROM users_comment c
+    WHERE c.post_id = %s
+    """
+    params = [post_id]
+    if after is not None:
+        query += " AND (c.created_at, c.id) < (%s, %s)"
+        params.extend([after.value, after.pk])
+    query += " ORDER BY c.created_at DESC, c.id DESC LIMIT %s;"
+    return query, [*params, page_size + 1]
+
+
+def comment_page(results, page_size):
+    """Return ``(comments, next_cursor)`` from up to ``page_size + 1`` rows."""
+    comments = [
+        {
+            'id': row[0],
+            'author_name': row[1],
+            'content': row[2],
+            'created_at': row[3],
+        } for row in results[:page_size]
+    ]
+    next_cursor = None
+    if len(results) > page_size:
+        last = comments[-1]
+        next_cursor = CommentCursor('created_at', last['created_at'], last['id']).encode()
+    return comments, next_cursor
+
+
+POST_EXISTS_QUERY = "SELECT 1 FROM users_post WHERE id = %s"
+
+
+def post_exists(post_id):
+    with replicas.read_connection().cursor() as cursor:
+        cursor.execute(POST_EXISTS_QUERY, [post_id])
+        return cursor.fetchone() is not None
+
+
+def get_post_author_id(pk):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT author_id FROM users_post WHERE id = %s", [pk])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def update_post(pk, author_id, data):
+    """Update the given ``POST_UPDATE_FIELDS``; return ``False`` if there are none."""
+    fields = [field for field in POST_UPDATE_FIELDS if field in data]
+    if not fields:
+        return False
+
+    assignments = [f'{field} = %s' for field in fields]
+    assignments += ['version = version + 1', 'updated_at = NOW()']
+    params = [data[field] for field in fields]
+    if 'image_path' in fields:
+        # Варианты и заглушки прежней картинки сбрасываются; SET видит старое значение image_path
+        for column, empty in (('image_variants', "'{}'::jsonb"), ('image_blurhash', "''"), ('image_color', "''")):
+            assignments.append(f"{column} = CASE WHEN image_path IS DISTINCT FROM %s THEN {empty} ELSE {column} END")
+            params.append(data['image_path'])
+    query = f"UPDATE users_post SET {', '.join(assignments)} WHERE id = %s RETURNING image_blurhash = ''"
+    with connection.cursor() as cursor:
+        cursor.execute(query, [*params, pk])
+        row = cursor.fetchone()
+    if 'image_path' in fields and row and row[0] and images.is_stored(data['image_path']):
+        images.schedule_variants(pk)
+    # Смена заголовка меняет порядок в списках, отсортированных по title
+    response_cache.post_updated(pk, author_id, reorders='title' in fields)
+    return True
+
+
+def delete_post(pk, author_id):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM users_post WHERE id = %s", [pk])
+    counting.post_deleted(author_id)
+    response_cache.post_deleted(pk, author_id)
+
+
+ADD_COMMENT_QUERY = """
+WITH new_comment AS (
+    INSERT INTO users_comment (post_id, author_name, content, created_at)
+    VALUES (%s, %s, %s, NOW())
+    RETURNING id, post_id, author_name, content, created_at
+)
+UPDATE users_post p SET
+    comment_count = p.comment_count + 1,
+    last_comment_at = GREATEST(p.last_comment_at, nc.created_at),
+    last_comment_author = CASE
+        WHEN p.last_comment_at IS NULL OR p.last_comment_at <= nc.created_at
+        THEN nc.author_name
+        ELSE p.last_comment_author
+    END,
+    updated_at = NOW()
+FROM new_comment nc
+WHERE p.id = nc.post_id
+RETURNING nc.id, nc.author_name, nc.content, nc.created_at, p.comment_count
+"""
+
+
+def add_comment(post_id, author_name, content):
+    """Insert a comment and update the post's comment summary in one statement."""
+    with connection.cursor() as cursor:
+        cursor.execute(ADD_COMMENT_QUERY, [post_id, author_name, content])
+        row = cursor.fetchone()
+    response_cache.comments_changed(post_id)
+    if row is not None:
+        live_comments.publish(post_id, row)
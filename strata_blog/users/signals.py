@@ -0,0 +1,41 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from . import counting
+from . import metrics
+from . import response_cache
+from . import slow_queries
+from .models import User
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    for wrapper in (metrics.record_query, slow_queries.record):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+@receiver(pre_delete, sender=User)
+def forget_author_posts(sender, instance, **kwargs):
+    # Посты удаляются каскадом, без Post.delete
+    counting.author_deleted(instance.pk)
+
+
+# Поля пользователя, которые попадают в ответы о постах
+AUTHOR_FIELDS = {"name", "email"}
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Вход обновляет только last_login
+    if created or (update_fields is not None and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    response_cache.author_changed(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def author_deleted(sender, instance, **kwargs):
+    response_cache.author_deleted(instance.pk)
@@ -0,0 +1,172 @@
+"""
+Slow-query recorder.
+
+``record`` is installed on every database connection next to
+``metrics.record_query`` (see ``signals.py``). A statement slower than
+``SLOW_QUERY_THRESHOLD_MS`` is normalized (literals and placeholders become
+``?``), logged on ``strata_blog.slow_queries`` and aggregated by fingerprint
+into ``SlowQuery``, which keeps at most ``SLOW_QUERY_STORE_SIZE`` statements
+(browse and export them in the admin). A ``SLOW_QUERY_EXPLAIN_SAMPLE_RATE``
+share of slow statements is explained right away with the same parameters:
+``EXPLAIN (ANALYZE, BUFFERS)`` for reads, a plain ``EXPLAIN`` for anything
+that would change data if run again. Statements run on a replica are
+explained there but stored on the primary.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import DatabaseError
+from django.db import connections
+from django.db import transaction
+
+logger = logging.getLogger("strata_blog.slow_queries")
+
+# Share of new records after which the store is trimmed to SLOW_QUERY_STORE_SIZE
+PRUNE_PROBABILITY = 0.01
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_SIDE_EFFECTS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|nextval|setval)\b", re.IGNORECASE)
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+UPSERT_SQL = """
+INSERT INTO users_slowquery AS s (
+    fingerprint, sql, params_shape, calls, total_ms, max_ms, last_ms,
+    first_seen, last_seen, plan, plan_analyzed, plan_captured_at
+)
+VALUES (%s, %s, %s, 1, %s, %s, %s, NOW(), NOW(), %s::jsonb, %s, CASE WHEN %s THEN NOW() END)
+ON CONFLICT (fingerprint) DO UPDATE SET
+    params_shape = EXCLUDED.params_shape,
+    calls = s.calls + 1,
+    total_ms = s.total_ms + EXCLUDED.total_ms,
+    max_ms = GREATEST(s.max_ms, EXCLUDED.max_ms),
+    last_ms = EXCLUDED.last_ms,
+    last_seen = EXCLUDED.last_seen,
+    plan = COALESCE(EXCLUDED.plan, s.plan),
+    plan_analyzed = CASE WHEN EXCLUDED.plan IS NULL THEN s.plan_analyzed ELSE EXCLUDED.plan_analyzed END,
+    plan_captured_at = COALESCE(EXCLUDED.plan_captured_at, s.plan_captured_at);
+"""
+
+PRUNE_SQL = """
+DELETE FROM users_slowquery
+WHERE last_seen < (
+    SELECT last_seen FROM users_slowquery ORDER BY last_seen DESC OFFSET %s LIMIT 1
+);
+"""
+
+# Запросы самого регистратора (EXPLAIN, запись в хранилище) не записываются
+_recording = contextvars.ContextVar("slow_query_recording", default=False)
+
+
+def normalize(sql):
+    sql = _STRING.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()  # noqa: S324
+
+
+def params_shape(params, many=False):
+    """Types of the parameters, e.g. ``int, str, list[3]``; never their values."""
+    if many:
+        params = list(params or [])
+        return f"{params_shape(params[0]) if params else ''} x{len(params)}"
+    if params is None:
+        return ""
+    if isinstance(params, dict):
+        return ", ".join(f"{key}: {_type_name(value)}" for key, value in params.items())[:255]
+    return ", ".join(_type_name(value) for value in params)[:255]
+
+
+def _type_name(value):
+    if isinstance(value, list | tuple):
+        return f"list[{len(value)}]"
+    return type(value).__name__
+
+
+def record(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` callback."""
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold or _recording.get():
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms >= threshold:
+        record_slow(context["connection"], sql, params, many, duration_ms)
+    return result
+
+
+def record_slow(connection, sql, params, many, duration_ms):
+    """Log and store a statement that took ``duration_ms`` on ``connection``."""
+    normalized = normalize(sql)
+    shape = params_shape(params, many)
+    logger.warning(
+        "Slow query (%.1f ms): %s",
+        duration_ms,
+        normalized,
+        extra={"duration_ms": duration_ms, "params_shape": shape},
+    )
+
+    token = _recording.set(True)
+    try:
+        plan, analyzed = None, False
+        sample_rate = settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+        if not many and _EXPLAINABLE.match(sql) and random.random() < sample_rate:  # noqa: S311
+            plan, analyzed = _explain(connection, sql, params)
+    finally:
+        _recording.reset(token)
+
+    values = [
+        fingerprint(normalized), normalized, shape, duration_ms, duration_ms, duration_ms,
+        json.dumps(plan) if plan is not None else None, analyzed, plan is not None,
+    ]
+
+    def store():
+        token = _recording.set(True)
+        try:
+            # Реплика доступна только для чтения: хранилище всегда на primary
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute(UPSERT_SQL, values)
+                if random.random() < PRUNE_PROBABILITY:  # noqa: S311
+                    cursor.execute(PRUNE_SQL, [settings.SLOW_QUERY_STORE_SIZE])
+        except DatabaseError:
+            logger.exception("Could not store a slow query")
+        finally:
+            _recording.reset(token)
+
+    # Пишется после коммита, вне транзакции запроса (при её откате запись теряется)
+    transaction.on_commit(store, using=DEFAULT_DB_ALIAS)
+
+
+def _explain(connection, sql, params):
+    analyze = bool(_READ_ONLY.match(sql)) and not _SIDE_EFFECTS.search(sql)
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    try:
+        # A failing EXPLAIN must not abort the caller's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN ({options}) {sql}", params)
+            plan = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.exception("Could not explain a slow query")
+        return None, False
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan, analyze
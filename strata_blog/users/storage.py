@@ -0,0 +1,145 @@
+"""
+Content-addressed media storage (``MEDIA_CONTENT_ADDRESSED = True``).
+
+``ContentAddressedStorage`` wraps another storage backend (GCS in
+production, the filesystem locally) and names every file by the SHA-256 of
+its content, hashed while the upload is streamed: ``cas/ab/cd/abcd....jpg``.
+The ``upload_to`` directory and the original file name are dropped, only the
+extension is kept. A blob that is already stored is not written again, so the
+same image uploaded twice takes space once (two concurrent uploads of it
+still leave one complete file), and since a name always means the same bytes
+the files can be cached as immutable: production sets ``Cache-Control`` on
+the GCS objects, ``serve`` does it for local media.
+
+Blobs may be shared between posts, so ``delete`` leaves them in place.
+"""
+
+import contextlib
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.core.files.storage import storages
+from django.utils.deconstruct import deconstructible
+from django.views import static
+
+PREFIX = "cas"
+CHUNK_SIZE = 64 * 1024
+
+
+@deconstructible(path="strata_blog.users.storage.ContentAddressedStorage")
+class ContentAddressedStorage(Storage):
+    def __init__(self, storage=None):
+        # Same format as an entry of STORAGES
+        self.storage = storages.create_storage(
+            storage or {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        )
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save
+        return name
+
+    def _save(self, name, content):
+        digest, spool = _hash(content)
+        _, extension = os.path.splitext(name)
+        name = f"{PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}"
+        try:
+            if self.storage.exists(name):
+                return name
+            self._write(name, content if spool is None else spool)
+            return name
+        finally:
+            if spool is not None:
+                spool.close()
+
+    def _write(self, name, content):
+        # Две загрузки одного содержимого могут прийти сюда одновременно
+        try:
+            path = self.storage.path(name)
+        except NotImplementedError:
+            # Облачные хранилища публикуют объект целиком; если имя уже занято
+            # и хранилище выбрало другое, лишняя копия не нужна
+            saved = self.storage.save(name, content)
+            if saved != name:
+                self.storage.delete(saved)
+            return
+        _write_atomic(path, content, getattr(self.storage, "file_permissions_mode", None))
+
+    def delete(self, name):
+        pass
+
+    def _open(self, name, mode="rb"):
+        return self.storage.open(name, mode)
+
+    def exists(self, name):
+        return self.storage.exists(name)
+
+    def url(self, name):
+        return self.storage.url(name)
+
+    def size(self, name):
+        return self.storage.size(name)
+
+    def path(self, name):
+        return self.storage.path(name)
+
+    def listdir(self, path):
+        return self.storage.listdir(path)
+
+    def get_modified_time(self, name):
+        return self.storage.get_modified_time(name)
+
+
+def _write_atomic(path, content, permissions_mode):
+    """
+    Write to a temporary file next to ``path`` and rename it into place, so a
+    reader never sees a partial blob. A concurrent writer of the same name
+    wrote the same bytes: whichever rename comes last wins harmlessly.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in content.chunks(CHUNK_SIZE):
+                f.write(chunk)
+        # mkstemp создаёт файл с правами 0600
+        os.chmod(temp_path, permissions_mode if permissions_mode is not None else 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_path)
+        raise
+
+
+def _hash(content):
+    """
+    Return the SHA-256 of ``content``. Seekable uploads are hashed in place and
+    rewound; anything else is also spooled to a file, returned second.
+    """
+    digest = hashlib.sha256()
+    seekable = getattr(content, "seekable", None)
+    if seekable is not None and seekable():
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest(), None
+
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)  # noqa: SIM115
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return digest.hexdigest(), File(spool)
+
+
+def serve(request, path, document_root=None, show_indexes=False):
+    """``django.views.static.serve`` marking content-addressed files as immutable."""
+    response = static.serve(request, path, document_root, show_indexes)
+    if path.startswith(f"{PREFIX}/"):
+        response["Cache-Control"] = settings.MEDIA_CACHE_CONTROL
+    return response
+
@@ -1,5 +1,11 @@
 from celery import shared_task
+from django.db import DatabaseError
+from PIL import UnidentifiedImageError
+from redis import RedisError
 
+from . import comment_buffer
+from . import counting
+from . import images
 from .models import User
 
 
@@ -7,3 +13,31 @@ from .models import User
 def get_users_count():
     """A pointless Celery task to demonstrate usage."""
     return User.objects.count()
+
+
+@shared_task()
+def reset_post_counts():
+    """Rebuild the cached post counters, e.g. after cascading user deletes."""
+    return counting.reset_counts()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def generate_image_variants(self, post_id):
+    """Write the resized WebP/JPEG copies of a post image."""
+    try:
+        return images.generate_variants(post_id)
+    except (images.ImageTooLargeError, UnidentifiedImageError):
+        # Повтор не поможет: оригинал остаётся единственной версией
+        return None
+    except OSError as exc:
+        raise self.retry(exc=exc) from exc
+
+
+@shared_task(bind=True, max_retries=None, default_retry_delay=5)
+def flush_comment_buffer(self):
+    """Insert the comments buffered by ``comment_buffer``."""
+    try:
+        return comment_buffer.flush()
+    except (DatabaseError, RedisError) as exc:
+        # Записи остаются в потоке до успешной выгрузки
+        raise self.retry(exc=exc) from exc
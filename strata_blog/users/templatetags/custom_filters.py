@@ -1,11 +1,25 @@
+import os
+
 from django import template
 from django.conf import settings
-import os
 
 register = template.Library()
 
 @register.filter
 def media_url_or_full(url):
+    if not url:
+        return ''
     if url.startswith('http'):
         return url
     return os.path.join(settings.MEDIA_URL, url)
+
+@register.filter
+def media_srcset(variants, fmt):
+    """``srcset`` for the ``fmt`` variants of ``Post.image_variants``; '' until they exist."""
+    if not variants:
+        return ''
+    widths = variants.get(fmt) or {}
+    return ', '.join(
+        f'{media_url_or_full(name)} {width}w'
+        for width, name in sorted(widths.items(), key=lambda item: int(item[0]))
+    )
@@ -2,9 +2,12 @@ from collections.abc import Sequence
 from typing import Any
 
 from factory import Faker
+from factory import SubFactory
 from factory import post_generation
 from factory.django import DjangoModelFactory
 
+from strata_blog.users.models import Comment
+from strata_blog.users.models import Post
 from strata_blog.users.models import User
 
 
@@ -38,3 +41,22 @@ class UserFactory(DjangoModelFactory):
     class Meta:
         model = User
         django_get_or_create = ["email"]
+
+
+class PostFactory(DjangoModelFactory):
+    title = Faker("sentence", nb_words=6)
+    short_description = Faker("text", max_nb_chars=100)
+    content = Faker("text")
+    author = SubFactory(UserFactory)
+
+    class Meta:
+        model = Post
+
+
+class CommentFactory(DjangoModelFactory):
+    post = SubFactory(PostFactory)
+    author_name = Faker("name")
+    content = Faker("text", max_nb_chars=200)
+
+    class Meta:
+        model = Comment
@@ -0,0 +1,147 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from strata_blog.users import async_db
+from strata_blog.users.api import async_views
+from strata_blog.users.models import Post
+from strata_blog.users.models import SlowQuery
+from strata_blog.users.tests.factories import CommentFactory
+from strata_blog.users.tests.factories import PostFactory
+
+# async_db has its own connections: the data must be committed to be seen
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture(autouse=True)
+def _no_response_cache(settings):
+    settings.POSTS_RESPONSE_CACHE_ENABLED = False
+
+
+def call(view, request, **kwargs):
+    async def run():
+        try:
+            return await view(request, **kwargs)
+        finally:
+            # Every async_to_sync call runs in a new event loop
+            await async_db.close_pool()
+
+    request.auser = _anonymous
+    return async_to_sync(run)()
+
+
+async def _anonymous():
+    return AnonymousUser()
+
+
+def test_list_matches_viewset(client):
+    PostFactory.create_batch(3)
+    url = reverse("api:posts-list")
+
+    expected = client.get(url, {"page_size": 2})
+    response = call(async_views.post_list, AsyncRequestFactory().get(url, {"page_size": 2}))
+
+    assert response.status_code == HTTPStatus.OK
+    assert json.loads(response.content) == expected.json()
+    assert response["ETag"] == expected["ETag"]
+
+
+def test_list_cursor_mode_and_errors(client):
+    PostFactory.create_batch(3)
+    url = reverse("api:posts-list")
+
+    expected = client.get(url, {"cursor": "", "page_size": 2}).json()
+    response = call(async_views.post_list, AsyncRequestFactory().get(url, {"cursor": "", "page_size": 2}))
+    assert json.loads(response.content) == expected
+
+    response = call(async_views.post_list, AsyncRequestFactory().get(url, {"page": "x"}))
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_retrieve_matches_viewset(client):
+    post = PostFactory()
+    CommentFactory.create_batch(2, post=post)
+    url = reverse("api:posts-detail", kwargs={"pk": post.pk})
+
+    expected = client.get(url)
+    response = call(async_views.post_detail, AsyncRequestFactory().get(url), pk=str(post.pk))
+
+    assert json.loads(response.content) == expected.json()
+    assert response["ETag"] == expected["ETag"]
+
+    request = AsyncRequestFactory().get(url, headers={"If-None-Match": expected["ETag"]})
+    assert call(async_views.post_detail, request, pk=str(post.pk)).status_code == HTTPStatus.NOT_MODIFIED
+
+    response = call(async_views.post_detail, AsyncRequestFactory().get(url), pk="0")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_add_comment_with_token():
+    post = PostFactory()
+    token = Token.objects.create(user=post.author)
+    url = reverse("api:posts-add-comment", kwargs={"pk": post.pk})
+
+    request = AsyncRequestFactory().post(
+        url,
+        {"author_name": "Reader", "content": "Nice"},
+        content_type="application/json",
+        headers={"Authorization": f"Token {token.key}"},
+    )
+    response = call(async_views.post_add_comment, request, pk=str(post.pk))
+
+    assert response.status_code == HTTPStatus.CREATED
+    post = Post.objects.get(pk=post.pk)
+    assert post.comment_count == 1
+    assert post.last_comment_author == "Reader"
+
+
+def test_add_comment_requires_authentication():
+    post = PostFactory()
+    url = reverse("api:posts-add-comment", kwargs={"pk": post.pk})
+
+    request = AsyncRequestFactory().post(url, {"author_name": "Reader", "content": "Nice"})
+    response = call(async_views.post_add_comment, request, pk=str(post.pk))
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+    request = AsyncRequestFactory().post(url, {"author_name": "Reader"}, headers={"Authorization": "Token nope"})
+    response = call(async_views.post_add_comment, request, pk=str(post.pk))
+    assert json.loads(response.content) == {"detail": "Invalid token."}
+    assert Post.objects.get(pk=post.pk).comment_count == 0
+
+
+def test_add_comment_errors_match_viewset():
+    post = PostFactory()
+    token = Token.objects.create(user=post.author)
+    headers = {"Authorization": f"Token {token.key}"}
+
+    data = {"author_name": "Reader", "content": "Nice\x00"}
+    request = AsyncRequestFactory().post("/", data, content_type="application/json", headers=headers)
+    response = call(async_views.post_add_comment, request, pk=str(post.pk))
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    data = {"author_name": "Reader", "content": "Nice"}
+    request = AsyncRequestFactory().post("/", data, content_type="application/json", headers=headers)
+    response = call(async_views.post_add_comment, request, pk=str(post.pk + 1))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert Post.objects.get(pk=post.pk).comment_count == 0
+
+
+def test_slow_async_queries_are_recorded(settings):
+    settings.SLOW_QUERY_THRESHOLD_MS = 0.000001
+    settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 0
+
+    async def run():
+        try:
+            return await async_db.fetchone("SELECT COUNT(*) FROM users_post WHERE id > %s", [0])
+        finally:
+            await async_db.close_pool()
+
+    async_to_sync(run)()
+
+    assert SlowQuery.objects.filter(sql="SELECT COUNT(*) FROM users_post WHERE id > ?").exists()
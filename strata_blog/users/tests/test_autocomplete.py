@@ -0,0 +1,65 @@
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from strata_blog.users import autocomplete
+from strata_blog.users.tests.factories import PostFactory
+from strata_blog.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _fresh_prefix_index():
+    autocomplete.prefix_index.invalidate()
+    yield
+    autocomplete.prefix_index.invalidate()
+
+
+def test_titles_prefer_prefix_matches():
+    inner = PostFactory(title="A guide to Python packaging")
+    prefix = PostFactory(title="Python tips and tricks")
+
+    results = autocomplete.complete_titles("pyth")
+
+    assert [r["id"] for r in results] == [prefix.id, inner.id]
+
+
+def test_authors():
+    author = UserFactory(name="Grace Hopper")
+    PostFactory(author=author)
+
+    assert autocomplete.complete_authors("hopp") == [{"id": author.id, "value": "Grace Hopper"}]
+
+
+def test_like_wildcards_are_literal():
+    PostFactory(title="Discount of 100% on everything")
+    PostFactory(title="Nothing special in this one")
+
+    assert len(autocomplete.complete_titles("100%")) == 1
+
+
+def test_short_prefix_uses_in_process_index(settings, django_assert_num_queries):
+    settings.AUTOCOMPLETE_PREFIX_MAX_LENGTH = 2
+    post = PostFactory(title="Zebras of the savanna")
+    autocomplete.complete("title", "ze")  # loads the index
+
+    with django_assert_num_queries(0):
+        results = autocomplete.complete("title", "Ze")
+
+    assert results == [{"id": post.id, "value": post.title}]
+
+
+def test_endpoint(client):
+    PostFactory(title="Quantum computing basics")
+
+    response = client.get(reverse("api:posts-autocomplete"), {"q": "quantum", "kind": "title"})
+
+    assert response.status_code == HTTPStatus.OK
+    assert [r["value"] for r in response.data["title"]] == ["Quantum computing basics"]
+
+
+def test_endpoint_rejects_unknown_kind(client):
+    response = client.get(reverse("api:posts-autocomplete"), {"q": "x", "kind": "tag"})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
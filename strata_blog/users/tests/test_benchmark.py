@@ -0,0 +1,48 @@
+import pytest
+from django.test import Client
+
+from strata_blog.users import benchmark
+from strata_blog.users.tests.factories import CommentFactory
+from strata_blog.users.tests.factories import PostFactory
+
+
+def result(p95_ms=10.0, queries=3):
+    return {"p95_ms": p95_ms, "queries": queries}
+
+
+def test_summarize_percentiles():
+    summary = benchmark.summarize([float(ms) for ms in range(1, 101)], [2, 3, 3])
+
+    assert summary["p50_ms"] == 50.0  # noqa: PLR2004
+    assert summary["p99_ms"] == 99.0  # noqa: PLR2004
+    assert summary["max_ms"] == 100.0  # noqa: PLR2004
+    assert summary["queries"] == 3  # noqa: PLR2004
+
+
+def test_compare_flags_slower_and_chattier_results():
+    baseline = {"results": {"small/home": result(), "small/list/title/all/first": result()}}
+    current = {"results": {
+        "small/home": result(p95_ms=11.0),
+        "small/list/title/all/first": result(p95_ms=15.0, queries=4),
+        "small/add_comment": result(),
+    }}
+
+    regressions = benchmark.compare(current, baseline, threshold=0.2)
+
+    assert len(regressions) == 2  # noqa: PLR2004
+    assert all(r.startswith("small/list/title/all/first") for r in regressions)
+
+
+@pytest.mark.django_db
+def test_scenarios_stay_within_query_budgets(client, user):
+    post = PostFactory(author=user)
+    CommentFactory.create_batch(3, post=post)
+    empty = PostFactory(author=user)
+    scenarios = benchmark.build_scenarios(2, user.id, 2, {0: empty.id, 3: post.id}, post.id)
+
+    authenticated = Client()
+    authenticated.force_login(user)
+    for scenario in scenarios:
+        scenario_client = authenticated if scenario.authenticated else client
+        summary = benchmark.measure(scenario_client, scenario, iterations=1, warmup=0, cold=True)
+        assert summary["queries"] <= benchmark.QUERY_BUDGETS[scenario.group], scenario.name
@@ -0,0 +1,87 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from strata_blog.users import bulk_import
+from strata_blog.users.models import Comment
+from strata_blog.users.models import Post
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def ndjson(*records):
+    return [json.dumps(record) for record in records]
+
+
+def run(lines, chunk_size=bulk_import.CHUNK_SIZE):
+    errors = []
+    totals = bulk_import.import_ndjson(lines, lambda line_no, e: errors.append((line_no, e)), chunk_size)
+    return totals, errors
+
+
+def test_posts_and_comments_by_ref(user):
+    lines = ndjson(
+        {"type": "post", "ref": "a", "author_email": user.email, "title": "Imported post title",
+         "short_description": "Short", "content": "Body", "created_at": "2024-01-02T03:04:05Z"},
+        {"type": "comment", "post_ref": "a", "author_name": "Reader", "content": "First"},
+        {"type": "comment", "post_ref": "a", "author_name": "Writer", "content": "Second"},
+    )
+
+    # A chunk size of 1 makes the comments resolve the ref across chunks
+    totals, errors = run(lines, chunk_size=1)
+
+    assert errors == []
+    assert totals == {"posts": 1, "comments": 2, "rejected": 0}
+    post = Post.objects.get(title="Imported post title")
+    assert post.author == user
+    assert post.comment_count == 2
+    assert post.created_at.year == 2024
+
+
+def test_comments_for_existing_posts():
+    post = PostFactory()
+
+    totals, _ = run(ndjson({"type": "comment", "post_id": post.id, "author_name": "Reader", "content": "Hi"}))
+
+    assert totals["comments"] == 1
+    post.refresh_from_db()
+    assert post.comment_count == 1
+    assert post.last_comment_author == "Reader"
+
+
+def test_invalid_lines_are_reported(user):
+    lines = [
+        "not json",
+        *ndjson(
+            {"type": "post", "author_email": "nobody@example.com", "title": "Valid enough title",
+             "short_description": "Short", "content": "Body"},
+            {"type": "post", "author_email": user.email, "title": "Short",
+             "short_description": "Short", "content": "Body"},
+            {"type": "comment", "post_id": 0, "author_name": "Reader", "content": "Hi"},
+            {"type": "comment", "post_ref": "missing", "author_name": "Reader", "content": "Hi"},
+        ),
+    ]
+
+    totals, errors = run(lines)
+
+    assert totals == {"posts": 0, "comments": 0, "rejected": 5}
+    assert [line_no for line_no, _ in sorted(errors)] == [1, 2, 3, 4, 5]
+    assert "title" in dict(errors)[3]
+    assert not Comment.objects.exists()
+
+
+def test_api_import(admin_client, user):
+    body = "\n".join(ndjson(
+        {"type": "post", "author_email": user.email, "title": "Imported over HTTP",
+         "short_description": "Short", "content": "Body"},
+        {"type": "comment", "post_id": 0, "author_name": "Reader", "content": "Hi"},
+    ))
+
+    response = admin_client.post(reverse("api:posts-import"), body, content_type="application/x-ndjson")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["posts"] == 1
+    assert response.json()["errors"][0]["line"] == 2
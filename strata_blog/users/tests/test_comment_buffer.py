@@ -0,0 +1,207 @@
+import time
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from strata_blog.users import comment_buffer
+from strata_blog.users import tasks
+from strata_blog.users.models import Comment
+from strata_blog.users.models import Post
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+class FakeLock:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def acquire(self, blocking):
+        if self.owner.locked:
+            return False
+        self.owner.locked = True
+        return True
+
+    def release(self):
+        self.owner.locked = False
+
+
+class FakeRedis:
+    def __init__(self):
+        self.stream = []
+        self.keys = {}
+        self.locked = False
+        self.sequence = 0
+
+    def xlen(self, stream):
+        return len(self.stream)
+
+    def xadd(self, stream, fields):
+        self.sequence += 1
+        entry_id = f"{time.time_ns() // 1_000_000}-{self.sequence}"
+        self.stream.append((entry_id, {key: str(value) for key, value in fields.items()}))
+        return entry_id
+
+    def register_script(self, script):
+        def append(keys, args):
+            max_length, post_id, author_name, content = args
+            pending = len(self.stream)
+            if pending >= max_length:
+                return None
+            return [self.xadd(keys[0], {"post_id": post_id, "author_name": author_name, "content": content}), pending]
+
+        return append
+
+    def xrange(self, stream, count):
+        return self.stream[:count]
+
+    def xdel(self, stream, *entry_ids):
+        self.stream = [entry for entry in self.stream if entry[0] not in entry_ids]
+
+    def set(self, key, value, nx, ex):
+        if nx and key in self.keys:
+            return False
+        self.keys[key] = value
+        return True
+
+    def delete(self, key):
+        self.keys.pop(key, None)
+
+    def lock(self, key, timeout):
+        return FakeLock(self)
+
+
+@pytest.fixture
+def fake_redis(settings, monkeypatch):
+    settings.COMMENTS_BUFFERED = True
+    client = FakeRedis()
+    monkeypatch.setattr(comment_buffer, "_redis", lambda: client)
+    monkeypatch.setattr(comment_buffer, "_append_script", lambda: client.register_script(comment_buffer.APPEND_SCRIPT))
+    scheduled = []
+    monkeypatch.setattr(tasks.flush_comment_buffer, "delay", lambda: scheduled.append(0))
+    monkeypatch.setattr(tasks.flush_comment_buffer, "apply_async", lambda countdown: scheduled.append(countdown))
+    client.scheduled = scheduled
+    return client
+
+
+def test_flush_inserts_in_order(fake_redis, settings):
+    post = PostFactory()
+    for n in range(3):
+        comment_buffer.buffer_comment(post.pk, f"Author {n}", f"Comment {n}")
+    # Одна отложенная выгрузка на всю пачку
+    assert fake_redis.scheduled == [settings.COMMENT_BUFFER_MAX_LAG]
+
+    assert comment_buffer.flush() == 3  # noqa: PLR2004
+    assert fake_redis.stream == []
+    comments = list(Comment.objects.filter(post=post).order_by("id"))
+    assert [comment.content for comment in comments] == ["Comment 0", "Comment 1", "Comment 2"]
+    post.refresh_from_db()
+    assert post.comment_count == 3  # noqa: PLR2004
+    assert post.last_comment_author == "Author 2"
+
+
+def test_flush_is_bounded(fake_redis, settings):
+    settings.COMMENT_BUFFER_BATCH_SIZE = 2
+    settings.COMMENT_BUFFER_FLUSH_BATCHES = 2
+    post = PostFactory()
+    for n in range(5):
+        comment_buffer.buffer_comment(post.pk, "Author", f"Comment {n}")
+    fake_redis.scheduled.clear()
+
+    assert comment_buffer.flush() == 4  # noqa: PLR2004
+    assert fake_redis.scheduled == [settings.COMMENT_BUFFER_MAX_LAG]
+    assert comment_buffer.flush() == 1
+    assert Comment.objects.filter(post=post).count() == 5  # noqa: PLR2004
+
+
+def test_replayed_entry_is_a_no_op(fake_redis):
+    post = PostFactory()
+    comment_buffer.buffer_comment(post.pk, "Author", "Comment")
+    entries = list(fake_redis.stream)
+    comment_buffer.flush()
+
+    # Выгрузка упала после коммита, но до XDEL
+    fake_redis.stream = entries
+    comment_buffer.flush()
+    assert Comment.objects.filter(post=post).count() == 1
+    assert Post.objects.get(pk=post.pk).comment_count == 1
+
+
+def test_comments_of_deleted_posts_are_dropped(fake_redis):
+    post = PostFactory()
+    comment_buffer.buffer_comment(post.pk, "Author", "Comment")
+    post.delete()
+    assert comment_buffer.flush() == 1
+    assert not Comment.objects.exists()
+
+
+def test_api_accepts_a_buffered_comment(client, fake_redis):
+    post = PostFactory()
+    client.force_login(post.author)
+    url = reverse("api:posts-add-comment", kwargs={"pk": post.pk})
+
+    response = client.post(url, {"author_name": "Author", "content": "Comment"})
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.json()["buffer_id"] == fake_redis.stream[0][0]
+    assert not Comment.objects.exists()
+
+    assert client.post(url, {"author_name": "Author"}).status_code == HTTPStatus.BAD_REQUEST
+    missing = reverse("api:posts-add-comment", kwargs={"pk": post.pk + 1})
+    assert client.post(missing, {"author_name": "Author", "content": "Comment"}).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_api_errors_do_not_depend_on_the_buffer(client, settings):
+    settings.COMMENTS_BUFFERED = False
+    post = PostFactory()
+    client.force_login(post.author)
+    url = reverse("api:posts-add-comment", kwargs={"pk": post.pk})
+
+    long_name = "x" * (comment_buffer.AUTHOR_NAME_MAX_LENGTH + 1)
+    response = client.post(url, {"author_name": long_name, "content": "Comment"})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    missing = reverse("api:posts-add-comment", kwargs={"pk": post.pk + 1})
+    assert client.post(missing, {"author_name": "Author", "content": "Comment"}).status_code == HTTPStatus.NOT_FOUND
+    detail = reverse("blog_detail", kwargs={"pk": post.pk + 1})
+    assert client.post(detail, {"author_name": "Author", "content": "Comment"}).status_code == HTTPStatus.NOT_FOUND
+    assert not Comment.objects.exists()
+
+
+def test_page_shows_the_buffered_notice(client, fake_redis):
+    post = PostFactory()
+    url = reverse("blog_detail", kwargs={"pk": post.pk})
+    # Первый ответ ставит cookie CSRF, от которой зависит ETag
+    client.get(url)
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == HTTPStatus.NOT_MODIFIED
+
+    client.post(url, {"author_name": "Author", "content": "Comment"})
+    # Пост ещё не изменился, но сообщение ждёт показа: не 304
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert b"Your comment will appear in a few seconds." in response.content
+    # Показанное сообщение больше не мешает 304
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_full_buffer_refuses_comments(client, fake_redis, settings):
+    settings.COMMENT_BUFFER_MAX_LENGTH = 1
+    post = PostFactory()
+    client.force_login(post.author)
+    comment_buffer.buffer_comment(post.pk, "Author", "Comment")
+
+    url = reverse("api:posts-add-comment", kwargs={"pk": post.pk})
+    response = client.post(url, {"author_name": "Author", "content": "Comment"})
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response["Retry-After"] == str(settings.COMMENT_BUFFER_MAX_LAG)
+
+    detail = reverse("blog_detail", kwargs={"pk": post.pk})
+    response = client.post(detail, {"author_name": "Author", "content": "Comment"})
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+def test_validate():
+    assert comment_buffer.validate("Author", "Comment") is None
+    assert comment_buffer.validate("", "Comment")
+    assert comment_buffer.validate("x" * (comment_buffer.AUTHOR_NAME_MAX_LENGTH + 1), "Comment")
+    assert comment_buffer.validate("Author", "Com\x00ment")
@@ -0,0 +1,85 @@
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from strata_blog.users.tests.factories import CommentFactory
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize(
+    "url_name",
+    ["api:posts-detail", "blog_detail"],
+)
+def test_detail_not_modified_until_commented(client, url_name):
+    post = PostFactory()
+    url = reverse(url_name, kwargs={"pk": post.pk})
+
+    response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    etag = response["ETag"]
+    assert response.has_header("Last-Modified")
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    CommentFactory(post=post)
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert response["ETag"] != etag
+
+
+@pytest.mark.parametrize("url_name", ["api:posts-detail", "api:posts-list"])
+def test_author_rename_changes_validators(client, url_name):
+    post = PostFactory()
+    url = reverse(url_name, kwargs={"pk": post.pk} if url_name == "api:posts-detail" else None)
+    etag = client.get(url)["ETag"]
+
+    post.author.name = "Renamed"
+    post.author.save()
+
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize("url_name", ["api:posts-list", "home"])
+def test_list_not_modified_until_post_added(client, url_name):
+    PostFactory()
+    url = reverse(url_name)
+
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == HTTPStatus.NOT_MODIFIED
+
+    PostFactory()
+
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize("url_name", ["api:posts-detail", "api:posts-list"])
+def test_api_etag_depends_on_renderer(client, url_name):
+    post = PostFactory()
+    url = reverse(url_name, kwargs={"pk": post.pk} if url_name == "api:posts-detail" else None)
+
+    response = client.get(url)
+    assert "Accept" in response["Vary"]
+    browsable = client.get(url, HTTP_ACCEPT="text/html")
+    assert browsable["ETag"] != response["ETag"]
+
+    request_html = client.get(url, HTTP_ACCEPT="text/html", HTTP_IF_NONE_MATCH=response["ETag"])
+    assert request_html.status_code == HTTPStatus.OK
+
+
+def test_list_etag_depends_on_query(client):
+    PostFactory()
+    url = reverse("api:posts-list")
+
+    assert client.get(url, {"page": 1})["ETag"] != client.get(url, {"sort_by": "title"})["ETag"]
+
+
+def test_missing_post_has_no_validators(client):
+    response = client.get(reverse("api:posts-detail", kwargs={"pk": 0}))
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert not response.has_header("ETag")
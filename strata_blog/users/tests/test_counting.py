@@ -0,0 +1,77 @@
+import pytest
+from rest_framework.test import APIRequestFactory
+
+from strata_blog.users import counting
+from strata_blog.users.api.views import PostViewSet
+from strata_blog.users.models import Post
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def list_posts(**params):
+    request = APIRequestFactory().get("/api/posts/", params)
+    return PostViewSet.as_view({"get": "list"})(request)
+
+
+def test_exact_count_follows_creates_and_deletes(django_capture_on_commit_callbacks):
+    post = PostFactory()
+    assert counting.exact_count() == 1
+    assert counting.exact_count(post.author_id) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        other = PostFactory(author=post.author)
+    assert counting.exact_count() == 2
+    assert counting.exact_count(post.author_id) == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        other.delete()
+    assert counting.exact_count() == 1
+    assert counting.exact_count(post.author_id) == 1
+
+
+def test_reset_counts():
+    PostFactory.create_batch(3)
+    assert counting.reset_counts() == 3
+
+
+@pytest.mark.parametrize("mode", counting.COUNT_MODES)
+def test_list_reports_count_type(mode):
+    PostFactory.create_batch(2)
+
+    response = list_posts(count=mode)
+
+    assert response.status_code == 200
+    assert response.data["count_type"] == mode
+    if mode == counting.COUNT_NONE:
+        assert response.data["total_count"] is None
+        assert response.data["total_pages"] is None
+    else:
+        assert response.data["total_count"] >= 0
+
+
+def test_list_rejects_unknown_count_mode():
+    response = list_posts(count="bogus")
+    assert response.status_code == 400
+
+
+def test_reset_counts_clears_authors_without_posts():
+    post = PostFactory()
+    assert counting.exact_count(post.author_id) == 1
+
+    # QuerySet.delete() обходит Post.delete
+    Post.objects.filter(pk=post.pk).delete()
+    assert counting.reset_counts() == 0
+    assert counting.exact_count(post.author_id) == 0
+
+
+def test_deleting_an_author_drops_their_posts(django_capture_on_commit_callbacks):
+    post = PostFactory()
+    PostFactory.create_batch(2, author=post.author)
+    PostFactory()
+    assert counting.exact_count() == 4  # noqa: PLR2004
+
+    with django_capture_on_commit_callbacks(execute=True):
+        post.author.delete()
+    assert counting.exact_count() == 1
+    assert counting.exact_count(post.author_id) == 0
@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from strata_blog.users import export
+from strata_blog.users.tests.factories import CommentFactory
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_ndjson_export_spans_batches():
+    posts = PostFactory.create_batch(5)
+
+    lines = "".join(export.iter_export("posts", "ndjson", batch_size=2)).splitlines()
+
+    rows = [json.loads(line) for line in lines]
+    assert [row["id"] for row in rows] == [post.id for post in posts]
+    assert rows[0]["author_email"] == posts[0].author.email
+
+
+def test_csv_export_has_header():
+    comment = CommentFactory()
+
+    content = "".join(export.iter_export("comments", "csv", batch_size=1))
+
+    rows = list(csv.DictReader(io.StringIO(content)))
+    assert len(rows) == 1
+    assert rows[0]["author_name"] == comment.author_name
+    assert int(rows[0]["post_id"]) == comment.post_id
+
+
+def test_export_command(tmp_path):
+    PostFactory.create_batch(3)
+    output = tmp_path / "posts.ndjson"
+
+    call_command("export", "posts", output=str(output), stderr=io.StringIO())
+
+    assert len(output.read_text().splitlines()) == 3
+
+
+def test_api_export_requires_staff(client, user):
+    client.force_login(user)
+
+    response = client.get(reverse("api:posts-export", kwargs={"kind": "posts"}))
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+def test_api_export_streams(admin_client):
+    PostFactory.create_batch(2)
+
+    response = admin_client.get(reverse("api:posts-export", kwargs={"kind": "posts"}), {"fmt": "csv"})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.streaming
+    assert len(b"".join(response.streaming_content).decode().splitlines()) == 3
@@ -0,0 +1,119 @@
+import io
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from strata_blog.users import images
+from strata_blog.users.models import Post
+from strata_blog.users.templatetags.custom_filters import media_srcset
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.IMAGE_VARIANT_WIDTHS = [320, 640, 1280]
+    settings.IMAGE_VARIANT_FORMATS = ["webp", "jpeg"]
+
+
+def upload(width, height, name="blog/photo.jpg"):
+    image = Image.new("RGB", (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", exif=exif)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def test_generate_variants_writes_resized_copies(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks():
+        post = PostFactory(image_path=upload(2000, 1000))
+
+    variants = images.generate_variants(post.pk)
+
+    assert set(variants) == {"webp", "jpeg"}
+    assert set(variants["webp"]) == {"320", "640", "1280"}
+    with default_storage.open(variants["jpeg"]["640"]) as f:
+        image = Image.open(f)
+        assert image.size == (640, 320)
+        assert not image.getexif()
+    with default_storage.open(variants["webp"]["1280"]) as f:
+        assert Image.open(f).format == "WEBP"
+    post.refresh_from_db()
+    assert post.image_variants == variants
+    assert post.image_blurhash
+    assert len(post.image_color) == len("#rrggbb")
+
+
+def test_images_are_never_upscaled(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks():
+        post = PostFactory(image_path=upload(500, 400))
+
+    variants = images.generate_variants(post.pk)
+
+    assert set(variants["jpeg"]) == {"320"}
+
+
+def test_small_images_are_still_reencoded(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks():
+        post = PostFactory(image_path=upload(200, 100))
+
+    variants = images.generate_variants(post.pk)
+
+    assert set(variants["jpeg"]) == {"200"}
+    with default_storage.open(variants["jpeg"]["200"]) as f:
+        assert not Image.open(f).getexif()
+
+
+def test_both_sides_are_bounded(settings, django_capture_on_commit_callbacks):
+    settings.IMAGE_MAX_DIMENSION = 1000
+    with django_capture_on_commit_callbacks():
+        tall = PostFactory(image_path=upload(700, 4000, name="blog/tall.jpg"))
+        wide = PostFactory(image_path=upload(8000, 400, name="blog/wide.jpg"))
+
+    # Ширины в srcset - настоящие
+    assert set(images.generate_variants(tall.pk)["webp"]) == {"175"}
+    variants = images.generate_variants(wide.pk)
+    assert set(variants["webp"]) == {"320", "640"}
+    with default_storage.open(variants["webp"]["640"]) as f:
+        assert Image.open(f).size == (640, 32)
+
+
+def test_external_images_are_skipped():
+    post = PostFactory(image_path="https://example.com/photo.jpg")
+
+    assert images.generate_variants(post.pk) is None
+
+
+def test_new_image_schedules_variants(settings, django_capture_on_commit_callbacks):
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+    with django_capture_on_commit_callbacks(execute=True):
+        post = PostFactory(image_path=upload(800, 600))
+    post.refresh_from_db()
+    assert set(post.image_variants["webp"]) == {"320", "640"}
+
+    post = Post.objects.get(pk=post.pk)
+    with django_capture_on_commit_callbacks() as callbacks:
+        post.title = "Only the title has changed"
+        post.save()
+    assert callbacks == []
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        post.image_path = upload(800, 600, name="blog/other.jpg")
+        post.save()
+    assert len(callbacks) == 1
+    assert post.image_variants == {}
+    assert post.image_blurhash == ""
+
+
+def test_media_srcset(settings):
+    settings.MEDIA_URL = "/media/"
+    variants = {"webp": {"640": "variants/a-640w.webp", "320": "variants/a-320w.webp"}}
+
+    assert media_srcset(variants, "webp") == "/media/variants/a-320w.webp 320w, /media/variants/a-640w.webp 640w"
+    assert media_srcset(variants, "jpeg") == ""
+    assert media_srcset({}, "webp") == ""
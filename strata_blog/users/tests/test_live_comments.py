@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from config.websocket import websocket_application
+from strata_blog.users import live_comments
+from strata_blog.users import services
+from strata_blog.users.tests.factories import PostFactory
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+
+class FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+class FakeAsyncRedis:
+    def pubsub(self, ignore_subscribe_messages):
+        return FakePubSub()
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.django_db
+def test_add_comment_publishes_after_commit(settings, monkeypatch, django_capture_on_commit_callbacks):
+    settings.LIVE_COMMENTS_REDIS_URL = "redis://redis:6379/0"
+    fake = FakeRedis()
+    monkeypatch.setattr(live_comments, "_redis", lambda: fake)
+    post = PostFactory()
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        services.add_comment(post.pk, "Reader", "Nice")
+    assert fake.published == []
+
+    for callback in callbacks:
+        callback()
+    [(channel, message)] = fake.published
+    assert channel == f"comments:post:{post.pk}"
+    assert message["type"] == "comment"
+    assert message["post_id"] == post.pk
+    assert message["comment_count"] == 1
+    assert message["comment"]["author_name"] == "Reader"
+    assert message["comment"]["content"] == "Nice"
+
+
+@pytest.mark.django_db
+def test_add_comment_without_redis(monkeypatch, django_capture_on_commit_callbacks):
+    monkeypatch.setattr(live_comments, "_redis", pytest.fail)
+    post = PostFactory()
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        services.add_comment(post.pk, "Reader", "Nice")
+    assert callbacks == []
+
+
+def test_websocket_subscription_receives_comments(monkeypatch):
+    async def run():
+        hub = live_comments.Hub(FakeAsyncRedis())
+        monkeypatch.setattr(live_comments, "get_hub", lambda: hub)
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        app = asyncio.create_task(websocket_application({"type": "websocket"}, inbox.get, outbox.put))
+
+        async def exchange(event):
+            await inbox.put(event)
+            return await asyncio.wait_for(outbox.get(), 1)
+
+        def text(data):
+            return {"type": "websocket.receive", "text": json.dumps(data)}
+
+        assert await exchange({"type": "websocket.connect"}) == {"type": "websocket.accept"}
+        assert (await exchange({"type": "websocket.receive", "text": "ping"}))["text"] == "pong!"
+        reply = await exchange(text({"action": "subscribe", "post_id": 1}))
+        assert json.loads(reply["text"]) == {"type": "subscribed", "post_id": 1}
+        assert hub.pubsub.channels == {"comments:post:1"}
+        reply = await exchange(text({"action": "subscribe", "post_id": "1"}))
+        assert json.loads(reply["text"])["type"] == "error"
+
+        hub.pubsub.messages.put_nowait({"type": "message", "channel": b"comments:post:2", "data": b"other"})
+        hub.pubsub.messages.put_nowait({"type": "message", "channel": b"comments:post:1", "data": b"delta"})
+        assert (await asyncio.wait_for(outbox.get(), 1))["text"] == "delta"
+
+        await inbox.put({"type": "websocket.disconnect"})
+        await asyncio.wait_for(app, 1)
+        assert hub.subscribers == {}
+        assert hub.pubsub.channels == set()
+
+    async_to_sync(run)()
+
+
+def test_lagging_subscriber_is_disconnected(settings):
+    settings.LIVE_COMMENTS_MAX_PENDING = 1
+
+    async def run():
+        subscriber = live_comments.Subscriber()
+        subscriber.deliver("first")
+        subscriber.deliver("second")
+        sent = []
+
+        async def send(event):
+            sent.append(event)
+
+        await asyncio.wait_for(subscriber.write(send), 1)
+        return sent
+
+    assert async_to_sync(run)() == [{"type": "websocket.close", "code": 1013}]
@@ -0,0 +1,50 @@
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_request_metrics_per_route(client):
+    PostFactory()
+    labels = {"route": "api:posts-list", "method": "GET"}
+    requests_before = sample("http_requests_total", status="200", **labels)
+    queries_before = sample("http_request_db_queries_sum", **labels)
+
+    client.get(reverse("api:posts-list"))
+
+    assert sample("http_requests_total", status="200", **labels) == requests_before + 1
+    assert sample("http_request_db_queries_sum", **labels) > queries_before
+
+
+def test_response_cache_hits_are_counted(client):
+    PostFactory()
+    hits_before = sample("cache_lookups_total", cache="response", result="hit")
+
+    client.get(reverse("api:posts-list"))
+    client.get(reverse("api:posts-list"))
+
+    assert sample("cache_lookups_total", cache="response", result="hit") == hits_before + 1
+
+
+def test_metrics_endpoint(client):
+    response = client.get(reverse("metrics"))
+
+    assert response.status_code == HTTPStatus.OK
+    assert b"http_request_duration_seconds" in response.content
+
+
+def test_metrics_token(client, settings):
+    settings.METRICS_TOKEN = "secret"  # noqa: S105
+
+    assert client.get(reverse("metrics")).status_code == HTTPStatus.FORBIDDEN
+    response = client.get(reverse("metrics"), headers={"Authorization": "Bearer secret"})
+    assert response.status_code == HTTPStatus.OK
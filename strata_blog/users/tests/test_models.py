@@ -1,5 +1,42 @@
+import pytest
+
+from strata_blog.users.models import Post
 from strata_blog.users.models import User
+from strata_blog.users.tests.factories import CommentFactory
+from strata_blog.users.tests.factories import PostFactory
 
 
 def test_user_get_absolute_url(user: User):
     assert user.get_absolute_url() == f"/users/{user.pk}/"
+
+
+@pytest.mark.django_db()
+class TestPostCommentSummary:
+    def test_new_comment_updates_summary(self):
+        post = PostFactory()
+        comment = CommentFactory(post=post)
+
+        post.refresh_from_db()
+        assert post.comment_count == 1
+        assert post.last_comment_at == comment.created_at
+        assert post.last_comment_author == comment.author_name
+
+    def test_delete_recomputes_summary(self):
+        post = PostFactory()
+        first = CommentFactory(post=post)
+        CommentFactory(post=post).delete()
+
+        post.refresh_from_db()
+        assert post.comment_count == 1
+        assert post.last_comment_at == first.created_at
+        assert post.last_comment_author == first.author_name
+
+    def test_refresh_without_comments(self):
+        post = PostFactory(comment_count=5, last_comment_author="Ghost")
+
+        Post.refresh_comment_summary([post.pk])
+
+        post.refresh_from_db()
+        assert post.comment_count == 0
+        assert post.last_comment_at is None
+        assert post.last_comment_author == ""
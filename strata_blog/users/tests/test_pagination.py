@@ -0,0 +1,109 @@
+from datetime import UTC
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from rest_framework.test import APIRequestFactory
+
+from strata_blog.users.api.pagination import CommentPagination
+from strata_blog.users.api.pagination import InvalidCursorError
+from strata_blog.users.api.pagination import PostCursor
+from strata_blog.users.api.views import PostViewSet
+from strata_blog.users.tests.factories import CommentFactory
+from strata_blog.users.tests.factories import PostFactory
+
+
+class TestPostCursor:
+    def test_round_trip(self):
+        created_at = datetime(2024, 8, 12, 16, 28, tzinfo=UTC)
+        cursor = PostCursor("created_at", created_at, 42).encode()
+
+        decoded = PostCursor.decode(cursor, "created_at")
+
+        assert decoded.value == created_at
+        assert decoded.pk == 42
+
+    def test_sort_mismatch(self):
+        cursor = PostCursor("title", "Some title", 1).encode()
+
+        with pytest.raises(InvalidCursorError):
+            PostCursor.decode(cursor, "created_at")
+
+    def test_garbage(self):
+        with pytest.raises(InvalidCursorError):
+            PostCursor.decode("not-a-cursor", "created_at")
+
+
+@pytest.mark.django_db()
+class TestPostListByCursor:
+    def list(self, **params):
+        request = APIRequestFactory().get("/api/posts/", params)
+        return PostViewSet.as_view({"get": "list"})(request)
+
+    @pytest.mark.parametrize("sort_by", ["created_at", "title"])
+    def test_walks_every_post_once(self, sort_by):
+        posts = PostFactory.create_batch(5)
+
+        seen = []
+        response = self.list(cursor="", page_size=2, sort_by=sort_by)
+        while True:
+            assert response.status_code == 200
+            seen += [post["id"] for post in response.data["posts"]]
+            if response.data["next_cursor"] is None:
+                break
+            response = self.list(
+                cursor=response.data["next_cursor"],
+                page_size=2,
+                sort_by=sort_by,
+            )
+
+        assert sorted(seen) == sorted(post.id for post in posts)
+        assert len(seen) == len(set(seen))
+
+    def test_invalid_cursor(self):
+        response = self.list(cursor="garbage")
+        assert response.status_code == 400
+
+    def test_page_mode_unchanged(self):
+        PostFactory.create_batch(3)
+        response = self.list(page=1, page_size=2)
+        assert response.data["total_count"] == 3
+        assert response.data["total_pages"] == 2
+
+
+@pytest.mark.django_db()
+class TestPostComments:
+    def comments(self, pk, **params):
+        request = APIRequestFactory().get(f"/api/posts/{pk}/comments/", params)
+        return PostViewSet.as_view({"get": "comments"})(request, pk=pk)
+
+    def test_retrieve_returns_first_page(self):
+        post = PostFactory()
+        CommentFactory.create_batch(3, post=post)
+        request = APIRequestFactory().get(f"/api/posts/{post.pk}/")
+
+        with patch.object(CommentPagination, "page_size", 2):
+            response = PostViewSet.as_view({"get": "retrieve"})(request, pk=post.pk)
+
+        assert response.data["comment_count"] == 3
+        assert len(response.data["comments"]) == 2
+        assert response.data["comments_next_cursor"] is not None
+
+    def test_walks_every_comment_once(self):
+        post = PostFactory()
+        comments = CommentFactory.create_batch(5, post=post)
+        CommentFactory()  # another post
+
+        seen = []
+        response = self.comments(post.pk, page_size=2)
+        while True:
+            assert response.status_code == 200
+            seen += [comment["id"] for comment in response.data["comments"]]
+            if response.data["next_cursor"] is None:
+                break
+            response = self.comments(post.pk, page_size=2, cursor=response.data["next_cursor"])
+
+        assert seen == [c.id for c in sorted(comments, key=lambda c: (c.created_at, c.id), reverse=True)]
+
+    def test_unknown_post(self):
+        assert self.comments(0).status_code == 404
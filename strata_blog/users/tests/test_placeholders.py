@@ -0,0 +1,36 @@
+import numpy as np
+from PIL import Image
+
+from strata_blog.users import placeholders
+
+
+def test_blurhash_of_a_gradient():
+    pixels = np.tile(np.linspace(0, 255, 32)[None, :, None], (24, 1, 3))
+
+    assert placeholders.blurhash(pixels) == "L$HoI600xuWBofWBj[fQfQfQfQfQ"
+
+
+def test_dominant_color_is_the_largest_area():
+    pixels = np.zeros((8, 8, 3))
+    pixels[:, :6] = [10, 120, 200]
+    pixels[:, 6:] = [250, 250, 250]
+
+    assert placeholders.dominant_color(pixels) == "#0a78c8"
+
+
+def test_compute_downsamples_large_images():
+    image = Image.new("RGB", (4000, 3000), (200, 30, 30))
+
+    blurhash, color = placeholders.compute(image)
+
+    assert len(blurhash) == 4 + 2 * placeholders.X_COMPONENTS * placeholders.Y_COMPONENTS
+    assert color == "#c81e1e"
+
+
+def test_transparency_is_composited_on_white():
+    image = Image.new("RGBA", (40, 40), (0, 0, 0, 0))
+    image.paste((200, 30, 30, 255), (0, 0, 10, 40))
+
+    _blurhash, color = placeholders.compute(image)
+
+    assert color == "#ffffff"
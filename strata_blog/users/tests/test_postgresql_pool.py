@@ -0,0 +1,47 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from strata_blog.users.postgresql_pool.base import DatabaseWrapper
+
+pytestmark = pytest.mark.django_db
+
+
+def pooled_wrapper(alias, **settings):
+    settings_dict = {
+        **connection.settings_dict,
+        "CONN_MAX_AGE": 0,
+        "OPTIONS": {**connection.settings_dict["OPTIONS"], "pool": {"min_size": 1, "max_size": 2, "timeout": 5}},
+        **settings,
+    }
+    return DatabaseWrapper(settings_dict, alias=alias)
+
+
+@pytest.fixture
+def pooled():
+    wrapper = pooled_wrapper("pooled")
+    yield wrapper
+    wrapper.close()
+    wrapper.close_pool()
+
+
+def backend_pid(wrapper):
+    with wrapper.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        return cursor.fetchone()[0]
+
+
+def test_closed_connections_go_back_to_the_pool(pooled):
+    pid = backend_pid(pooled)
+    pooled.close()
+    assert pooled.connection is None
+
+    # Тот же серверный процесс: соединение взято из пула, а не открыто заново
+    assert backend_pid(pooled) == pid
+    assert pooled.pool.get_stats()["pool_max"] == 2
+
+
+def test_pool_requires_conn_max_age_zero():
+    wrapper = pooled_wrapper("pooled-persistent", CONN_MAX_AGE=60)
+    with pytest.raises(ImproperlyConfigured):
+        wrapper.ensure_connection()
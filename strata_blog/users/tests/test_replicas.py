@@ -0,0 +1,136 @@
+import time
+
+import psycopg
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from strata_blog.users import autocomplete
+from strata_blog.users import replicas
+from strata_blog.users import response_cache
+
+
+@pytest.fixture
+def replica(settings, monkeypatch):
+    settings.DATABASE_REPLICAS = {"replica1": 1}
+    monkeypatch.setattr(replicas, "_healthy", lambda alias, now: True)
+    return "replica1"
+
+
+def call(request):
+    seen = {}
+
+    def view(request):
+        seen["alias"] = replicas.read_alias()
+        seen["staleness"] = replicas.staleness_ns()
+        return HttpResponse()
+
+    response = replicas.ReplicaMiddleware(view)(request)
+    return seen, response
+
+
+def test_safe_requests_read_from_a_replica(replica):
+    seen, response = call(RequestFactory().get("/"))
+    assert seen["alias"] == replica
+    assert seen["staleness"] > 0
+    assert replicas.STICKY_COOKIE not in response.cookies
+    # Вне запроса - только primary
+    assert replicas.read_alias() == "default"
+
+
+def test_writes_stick_to_the_primary(replica, settings):
+    seen, response = call(RequestFactory().post("/"))
+    assert seen["alias"] == "default"
+    cookie = response.cookies[replicas.STICKY_COOKIE]
+    assert cookie["max-age"] == settings.DATABASE_REPLICA_STICKY_SECONDS
+
+    request = RequestFactory().get("/")
+    request.COOKIES[replicas.STICKY_COOKIE] = "1"
+    seen, _response = call(request)
+    assert seen["alias"] == "default"
+    assert seen["staleness"] == 0
+
+
+def test_failed_writes_do_not_stick(replica):
+    response = replicas.ReplicaMiddleware(lambda request: HttpResponse(status=400))(RequestFactory().post("/"))
+    assert replicas.STICKY_COOKIE not in response.cookies
+
+
+@pytest.mark.django_db
+def test_autocomplete_reads_from_the_replica(replica, monkeypatch):
+    used = []
+
+    def read_connection():
+        used.append(replicas.read_alias())
+        # В тестах реплики нет: читаем из той же базы
+        return connections["default"]
+
+    monkeypatch.setattr(replicas, "read_connection", read_connection)
+
+    def view(request):
+        autocomplete.complete_titles("post")
+        return HttpResponse()
+
+    replicas.ReplicaMiddleware(view)(RequestFactory().get("/"))
+    assert used == [replica]
+
+
+def test_async_reads_use_the_replica(replica):
+    seen = {}
+
+    async def view(request):
+        seen["alias"] = await replicas.aread_alias()
+        return HttpResponse()
+
+    async_to_sync(replicas.ReplicaMiddleware(view))(RequestFactory().get("/"))
+    assert seen["alias"] == replica
+
+
+def test_pick_skips_unhealthy_and_unweighted(settings, monkeypatch):
+    settings.DATABASE_REPLICAS = {"replica1": 0, "replica2": 3, "replica3": 1}
+    monkeypatch.setattr(replicas, "_healthy", lambda alias, now: alias != "replica3")
+    assert {replicas._pick() for _ in range(20)} == {"replica2"}  # noqa: SLF001
+
+    monkeypatch.setattr(replicas, "_healthy", lambda alias, now: False)
+    assert replicas._pick() == "default"  # noqa: SLF001
+
+
+@pytest.mark.django_db
+def test_health_check_is_cached(monkeypatch):
+    monkeypatch.setattr(replicas, "_checked_until", {})
+    now = time.monotonic()
+    # Не реплика: отставание NULL, считается здоровой
+    assert replicas._healthy("default", now)  # noqa: SLF001
+    assert replicas._checked_until["default"] > now  # noqa: SLF001
+
+
+def test_unreachable_replica_is_skipped(settings, monkeypatch):
+    monkeypatch.setattr(replicas, "_down_until", {})
+    monkeypatch.setattr(replicas, "_checked_until", {})
+
+    def unreachable(alias):
+        msg = "connection timeout expired"
+        raise psycopg.OperationalError(msg)
+
+    monkeypatch.setattr(replicas, "_lag", unreachable)
+    now = time.monotonic()
+    assert not replicas._healthy("replica1", now)  # noqa: SLF001
+    assert replicas._down_until["replica1"] == now + settings.DATABASE_REPLICA_RETRY  # noqa: SLF001
+
+
+def test_cache_fill_from_a_replica_allows_for_lag(replica):
+    def view(request):
+        return HttpResponse(str(response_cache.begin()))
+
+    before = time.time_ns()
+    response = replicas.ReplicaMiddleware(view)(RequestFactory().get("/"))
+    assert int(response.content) < before
+
+
+def test_router():
+    router = replicas.ReplicaRouter()
+    assert router.db_for_write(None) == "default"
+    assert router.allow_migrate("default", "users")
+    assert not router.allow_migrate("replica1", "users")
@@ -0,0 +1,94 @@
+import pytest
+from rest_framework.test import APIRequestFactory
+
+from strata_blog.users import response_cache
+from strata_blog.users.api.views import PostViewSet
+from strata_blog.users.tests.factories import CommentFactory
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def list_posts(**params):
+    request = APIRequestFactory().get("/api/posts/", params)
+    return PostViewSet.as_view({"get": "list"})(request)
+
+
+def retrieve_post(pk):
+    request = APIRequestFactory().get(f"/api/posts/{pk}/")
+    return PostViewSet.as_view({"get": "retrieve"})(request, pk=pk)
+
+
+def test_list_served_from_cache(django_assert_num_queries):
+    PostFactory.create_batch(2)
+    first = list_posts(page=1)
+
+    with django_assert_num_queries(0):
+        second = list_posts(page="1", page_size="10")
+
+    assert second.data == first.data
+
+
+def test_new_post_invalidates_list():
+    PostFactory()
+    assert list_posts().data["total_count"] == 1
+
+    PostFactory()
+
+    assert len(list_posts().data["posts"]) == 2  # noqa: PLR2004
+
+
+def test_comment_invalidates_only_its_post(django_assert_num_queries):
+    post, other = PostFactory.create_batch(2)
+    retrieve_post(post.pk)
+    retrieve_post(other.pk)
+
+    CommentFactory(post=post)
+
+    with django_assert_num_queries(0):
+        retrieve_post(other.pk)
+    assert len(retrieve_post(post.pk).data["comments"]) == 1
+
+
+def test_authors_other_posts_keep_detail_cached(django_assert_num_queries):
+    post = PostFactory()
+    retrieve_post(post.pk)
+
+    other = PostFactory(author=post.author)
+    other.title = "Changed"
+    other.save()
+    other.delete()
+
+    with django_assert_num_queries(0):
+        retrieve_post(post.pk)
+
+
+def test_author_rename_invalidates_list_and_detail():
+    post = PostFactory()
+    list_posts()
+    retrieve_post(post.pk)
+
+    post.author.name = "Renamed"
+    post.author.save()
+
+    assert list_posts().data["posts"][0]["author"]["name"] == "Renamed"
+    assert retrieve_post(post.pk).data["author"]["name"] == "Renamed"
+
+
+def test_login_keeps_author_entries(django_assert_num_queries):
+    post = PostFactory()
+    retrieve_post(post.pk)
+
+    post.author.save(update_fields=["last_login"])
+
+    with django_assert_num_queries(0):
+        retrieve_post(post.pk)
+
+
+def test_entry_not_stored_when_invalidated_while_building():
+    started = response_cache.begin()
+    response_cache.invalidate(response_cache.post_tag(1))
+
+    response_cache.set("key", {"id": 1}, {response_cache.post_tag(1)}, started)
+
+    assert response_cache.get("key") is None
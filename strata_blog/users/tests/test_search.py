@@ -0,0 +1,52 @@
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from strata_blog.users import services
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_title_match_ranks_above_content_match():
+    in_content = PostFactory(title="Unrelated post title", content="All about lighthouses.")
+    in_title = PostFactory(title="Lighthouses of the north", content="Nothing to see.")
+    PostFactory(title="Something else entirely", content="No match here.")
+
+    results = services.search_posts({"q": "lighthouse"})
+
+    assert [post["id"] for post in results["posts"]] == [in_title.id, in_content.id]
+
+
+def test_raw_update_refreshes_search_vector():
+    post = PostFactory(title="Before the update")
+
+    services.update_post(post.pk, post.author_id, {"title": "Submarines everywhere"})
+
+    assert [p["id"] for p in services.search_posts({"q": "submarine"})["posts"]] == [post.id]
+
+
+def test_cursor_pages_through_results():
+    posts = PostFactory.create_batch(3, content="Kayaking trip report.")
+
+    first = services.search_posts({"q": "kayaking", "page_size": 2})
+    second = services.search_posts({"q": "kayaking", "page_size": 2, "cursor": first["next_cursor"]})
+
+    seen = [post["id"] for post in first["posts"] + second["posts"]]
+    assert sorted(seen) == sorted(post.id for post in posts)
+    assert second["next_cursor"] is None
+
+
+def test_api_requires_query(client):
+    response = client.get(reverse("api:posts-search"))
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_search_page(client):
+    PostFactory(title="Gardening for beginners")
+
+    response = client.get(reverse("search"), {"q": "gardening"})
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.context["results"]["posts"]) == 1
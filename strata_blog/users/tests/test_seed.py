@@ -0,0 +1,29 @@
+import io
+import random
+
+import pytest
+from django.core.management import call_command
+
+from strata_blog.users.management.commands.seed import _power_law_split
+from strata_blog.users.models import Comment
+from strata_blog.users.models import Post
+from strata_blog.users.models import User
+
+
+def test_power_law_split_is_skewed_and_exact():
+    counts = _power_law_split(10000, 100, 1.1, random.Random(0))
+
+    assert sum(counts) == 10000
+    assert max(counts) > 10 * sorted(counts)[50]
+
+
+@pytest.mark.django_db
+def test_seed_is_deterministic_in_shape():
+    call_command("seed", users=3, posts=10, comments=40, workers=1, stdout=io.StringIO())
+
+    assert User.objects.count() == 3
+    assert Post.objects.count() == 10
+    assert Comment.objects.count() == 40
+    assert sum(Post.objects.values_list("comment_count", flat=True)) == 40
+    # One shared password hash
+    assert User.objects.values("password").distinct().count() == 1
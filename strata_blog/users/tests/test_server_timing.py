@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from django.urls import reverse
+
+from strata_blog.users.tests.factories import PostFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _server_timing(settings):
+    settings.SERVER_TIMING = True
+
+
+def metric_names(response):
+    return [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+
+
+def test_api_breakdown(client):
+    PostFactory()
+
+    response = client.get(reverse("api:posts-list"))
+
+    assert metric_names(response) == ["db", "cache", "serialize", "total"]
+
+
+def test_html_breakdown(client):
+    PostFactory()
+
+    response = client.get(reverse("home"))
+
+    assert "render" in metric_names(response)
+
+
+def test_access_log(client, caplog):
+    with caplog.at_level("INFO", logger="strata_blog.access"):
+        client.get(reverse("api:posts-list"))
+
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry["route"] == "api:posts-list"
+    assert entry["status"] == 200  # noqa: PLR2004
+    assert entry["db_queries"] >= 1
+
+
+def test_disabled_by_default(client, settings):
+    settings.SERVER_TIMING = False
+
+    assert "Server-Timing" not in client.get(reverse("api:posts-list"))
@@ -0,0 +1,67 @@
+import pytest
+from django.db import connection
+
+from strata_blog.users import slow_queries
+from strata_blog.users.models import SlowQuery
+
+
+def test_normalize_replaces_literals():
+    sql = "SELECT * FROM users_post  WHERE id IN (1, 2, 3) AND title = 'it''s' AND author_id = %s"
+
+    assert slow_queries.normalize(sql) == (
+        "SELECT * FROM users_post WHERE id IN (...) AND title = ? AND author_id = ?"
+    )
+
+
+def test_params_shape_hides_values():
+    assert slow_queries.params_shape([1, "secret", [1, 2]]) == "int, str, list[2]"
+    assert slow_queries.params_shape([[1], [2]], many=True) == "int x2"
+
+
+@pytest.mark.django_db
+def test_slow_queries_are_stored_with_plan(settings, django_capture_on_commit_callbacks):
+    settings.SLOW_QUERY_THRESHOLD_MS = 0.000001
+    settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 1
+
+    with django_capture_on_commit_callbacks(execute=True), connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM users_post WHERE id > %s", [0])
+        cursor.execute("SELECT COUNT(*) FROM users_post WHERE id > %s", [10])
+
+    query = SlowQuery.objects.get(sql="SELECT COUNT(*) FROM users_post WHERE id > ?")
+    assert query.calls == 2  # noqa: PLR2004
+    assert query.params_shape == "int"
+    assert query.plan_analyzed
+    assert query.plan[0]["Plan"]
+
+
+@pytest.mark.django_db
+def test_writes_are_not_analyzed(settings, django_capture_on_commit_callbacks):
+    settings.SLOW_QUERY_THRESHOLD_MS = 0.000001
+    settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 1
+
+    with django_capture_on_commit_callbacks(execute=True), connection.cursor() as cursor:
+        cursor.execute("UPDATE users_post SET version = version WHERE id = %s", [0])
+
+    query = SlowQuery.objects.get(sql__startswith="UPDATE users_post")
+    assert query.plan is not None
+    assert not query.plan_analyzed
+
+
+class ReadOnlyConnection:
+    alias = "replica1"
+
+    def cursor(self):
+        msg = "cannot execute INSERT in a read-only transaction"
+        raise AssertionError(msg)
+
+
+@pytest.mark.django_db
+def test_replica_queries_are_stored_on_the_primary(settings, django_capture_on_commit_callbacks):
+    settings.SLOW_QUERY_THRESHOLD_MS = 0.000001
+    settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 0
+    sql = "SELECT id FROM users_post WHERE author_id = %s"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        slow_queries.record(lambda *args: None, sql, [1], False, {"connection": ReadOnlyConnection()})  # noqa: FBT003
+
+    assert SlowQuery.objects.get(sql="SELECT id FROM users_post WHERE author_id = ?").calls == 1
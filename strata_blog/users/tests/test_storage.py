@@ -0,0 +1,80 @@
+import io
+import os
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.base import File
+from django.test import RequestFactory
+
+from strata_blog.users.storage import ContentAddressedStorage
+from strata_blog.users.storage import serve
+
+
+@pytest.fixture()
+def storage(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return ContentAddressedStorage()
+
+
+def test_files_are_named_by_content(storage):
+    name = storage.save("blog/2026/10/18/photo.JPG", ContentFile(b"image bytes"))
+
+    assert name == "cas/de/70/de7030234493a8bea844dbe1d8676e68a2c1a4b014c721f0425a22b6df66faec.jpg"
+    with storage.open(name) as f:
+        assert f.read() == b"image bytes"
+
+
+def test_duplicates_are_stored_once(storage, tmp_path):
+    first = storage.save("blog/a.png", ContentFile(b"same"))
+    second = storage.save("blog/b.png", ContentFile(b"same"))
+    other = storage.save("blog/c.png", ContentFile(b"different"))
+
+    assert first == second
+    assert other != first
+    stored = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert len(stored) == 2  # noqa: PLR2004
+
+
+def test_concurrent_duplicate_upload(storage, tmp_path, monkeypatch):
+    first = storage.save("blog/a.png", ContentFile(b"same"))
+    # Вторая загрузка проверила exists() до того, как первая записала файл
+    monkeypatch.setattr(storage.storage, "exists", lambda name: False)
+
+    assert storage.save("blog/b.png", ContentFile(b"same")) == first
+    stored = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert len(stored) == 1
+    with storage.open(first) as f:
+        assert f.read() == b"same"
+
+
+def test_unseekable_uploads_are_spooled(storage):
+    class Stream(io.RawIOBase):
+        def __init__(self):
+            self.data = io.BytesIO(b"streamed")
+
+        def readinto(self, buffer):
+            return self.data.readinto(buffer)
+
+        def readable(self):
+            return True
+
+    name = storage.save("blog/s.jpg", File(Stream(), name="s.jpg"))
+
+    assert name == storage.save("blog/t.jpg", ContentFile(b"streamed"))
+
+
+def test_delete_keeps_shared_blobs(storage):
+    name = storage.save("blog/a.png", ContentFile(b"shared"))
+
+    storage.delete(name)
+
+    assert storage.exists(name)
+
+
+def test_serve_marks_blobs_immutable(settings, storage, tmp_path):
+    name = storage.save("blog/a.png", ContentFile(b"png"))
+    request = RequestFactory().get(f"/media/{name}")
+
+    response = serve(request, name, document_root=str(tmp_path))
+
+    assert response["Cache-Control"] == settings.MEDIA_CACHE_CONTROL
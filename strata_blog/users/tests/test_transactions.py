@@ -0,0 +1,59 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import DatabaseError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from strata_blog.users.models import Post
+from strata_blog.users.tests.factories import PostFactory
+from strata_blog.users.transactions import safe_requests
+
+# Транзакции запроса видны только вне транзакции теста
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def in_transaction(request):
+    return HttpResponse(str(connection.in_atomic_block))
+
+
+def test_views_are_excluded_from_atomic_requests():
+    assert safe_requests(in_transaction)._non_atomic_requests == {"default"}  # noqa: SLF001
+
+
+@pytest.mark.parametrize(
+    ("mode", "expected"),
+    [("atomic", b"True"), ("read_only", b"True"), ("autocommit", b"False")],
+)
+def test_safe_methods_follow_the_setting(settings, mode, expected):
+    settings.SAFE_REQUESTS_TRANSACTION = mode
+    view = safe_requests(in_transaction)
+
+    assert view(RequestFactory().get("/")).content == expected
+    # Изменяющие запросы остаются атомарными
+    assert view(RequestFactory().post("/")).content == b"True"
+
+
+def test_read_only_transaction_rejects_writes(settings):
+    settings.SAFE_REQUESTS_TRANSACTION = "read_only"
+    post = PostFactory()
+
+    def write(request):
+        Post.objects.filter(pk=post.pk).update(title="Changed")
+        return HttpResponse()
+
+    with pytest.raises(DatabaseError):
+        safe_requests(write)(RequestFactory().get("/"))
+    assert Post.objects.get(pk=post.pk).title == post.title
+
+
+@pytest.mark.parametrize("mode", ["read_only", "autocommit"])
+def test_pages_render_in_every_mode(client, settings, mode):
+    settings.SAFE_REQUESTS_TRANSACTION = mode
+    post = PostFactory()
+
+    assert client.get(reverse("home")).status_code == HTTPStatus.OK
+    assert client.get(reverse("blog_detail", kwargs={"pk": post.pk})).status_code == HTTPStatus.OK
+    assert client.get(reverse("api:posts-list")).status_code == HTTPStatus.OK
@@ -14,6 +14,8 @@ from django.utils.translation import gettext_lazy as _
 
 from strata_blog.users.forms import UserAdminChangeForm
 from strata_blog.users.models import User
+from strata_blog.users.tests.factories import CommentFactory
+from strata_blog.users.tests.factories import PostFactory
 from strata_blog.users.tests.factories import UserFactory
 from strata_blog.users.views import UserRedirectView
 from strata_blog.users.views import UserUpdateView
@@ -99,3 +101,56 @@ class TestUserDetailView:
         assert isinstance(response, HttpResponseRedirect)
         assert response.status_code == HTTPStatus.FOUND
         assert response.url == f"{login_url}?next=/fake-url/"
+
+
+class TestHomePageView:
+    def test_lists_posts_in_process(self, client):
+        posts = PostFactory.create_batch(2)
+
+        response = client.get(reverse("home"), {"page_size": 1})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.context["total_count"] == len(posts)
+        assert response.context["total_pages"] == len(posts)
+        assert len(response.context["posts"]) == 1
+
+    def test_pagination_without_count(self, client, settings):
+        settings.POSTS_COUNT_MODE = "none"
+        PostFactory.create_batch(2)
+
+        response = client.get(reverse("home"), {"page_size": 1})
+
+        assert response.context["total_pages"] is None
+        assert response.context["has_next"]
+        assert b"of None" not in response.content
+        assert b"page=None" not in response.content
+        assert not client.get(reverse("home"), {"page_size": 1, "page": 2}).context["has_next"]
+
+    def test_invalid_params_fall_back_to_first_page(self, client):
+        PostFactory()
+
+        response = client.get(reverse("home"), {"page": "nope"})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.context["current_page"] == 1
+
+
+class TestBlogDetailView:
+    def test_get(self, client):
+        comment = CommentFactory()
+
+        response = client.get(reverse("blog_detail", kwargs={"pk": comment.post_id}))
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.context["post"]["comments"][0]["id"] == comment.id
+
+    def test_post_comment(self, client):
+        post = PostFactory()
+        url = reverse("blog_detail", kwargs={"pk": post.pk})
+
+        response = client.post(url, {"author_name": "Reader", "content": "Nice post"})
+
+        assert response.status_code == HTTPStatus.FOUND
+        post.refresh_from_db()
+        assert post.comment_count == 1
+        assert post.last_comment_author == "Reader"
@@ -0,0 +1,53 @@
+"""
+Per-method request transactions for the read-heavy views.
+
+``ATOMIC_REQUESTS`` wraps every request in a transaction, so a GET holds its
+connection from the first query until the response is rendered and pays a
+``BEGIN``/``COMMIT`` round trip for reads that need neither. Views wrapped
+in ``safe_requests`` opt out of it and apply ``SAFE_REQUESTS_TRANSACTION`` to
+GET/HEAD/OPTIONS instead:
+
+* ``atomic`` - one transaction, as with ``ATOMIC_REQUESTS``;
+* ``read_only`` - one ``READ ONLY`` transaction: a snapshot-consistent page,
+  and a safe request that tries to write fails instead of writing;
+* ``autocommit`` - no transaction: every statement commits on its own and
+  nothing stays open on the connection between statements.
+
+Other methods keep the ``ATOMIC_REQUESTS`` behaviour.
+"""
+
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.db import transaction
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+SAFE_ATOMIC = "atomic"
+SAFE_READ_ONLY = "read_only"
+SAFE_AUTOCOMMIT = "autocommit"
+SAFE_MODES = (SAFE_ATOMIC, SAFE_READ_ONLY, SAFE_AUTOCOMMIT)
+
+
+def safe_requests(view):
+    """Decorate a view function (``View.as_view()``) as described above."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not connections[DEFAULT_DB_ALIAS].settings_dict["ATOMIC_REQUESTS"]:
+            return view(request, *args, **kwargs)
+        mode = settings.SAFE_REQUESTS_TRANSACTION if request.method in SAFE_METHODS else SAFE_ATOMIC
+        if mode == SAFE_AUTOCOMMIT:
+            return view(request, *args, **kwargs)
+        connection = connections[DEFAULT_DB_ALIAS]
+        # Внутри чужой транзакции (тесты) SET TRANSACTION уже не первый оператор
+        outermost = not connection.in_atomic_block
+        with transaction.atomic():
+            if mode == SAFE_READ_ONLY and outermost:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION READ ONLY")
+            return view(request, *args, **kwargs)
+
+    return transaction.non_atomic_requests(wrapper)
@@ -1,19 +1,29 @@
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db.models import QuerySet
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.shortcuts import redirect
+from django.shortcuts import render
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
+from django.views import View
+from django.views.decorators.http import condition
 from django.views.generic import DetailView
 from django.views.generic import RedirectView
 from django.views.generic import UpdateView
 
 from strata_blog.users.models import User
 
-from django.shortcuts import render, redirect, get_object_or_404
-from django.views import View
-from .forms import PostForm, CommentForm
-
-import requests
+from . import comment_buffer
+from . import conditional
+from . import live_comments
+from . import metrics
+from . import services
+from .forms import CommentForm
+from .forms import PostForm
 
 
 class UserDetailView(LoginRequiredMixin, DetailView):
@@ -51,61 +61,102 @@ class UserRedirectView(LoginRequiredMixin, RedirectView):
 
 user_redirect_view = UserRedirectView.as_view()
 
+HOME_PAGE_PARAMS = ('page', 'page_size', 'sort_by', 'author_id')
+
+
+home_page_etag, home_page_last_modified = conditional.personalized(
+    conditional.post_list_etag, conditional.post_list_last_modified,
+)
+blog_detail_etag, blog_detail_last_modified = conditional.personalized(
+    conditional.post_etag, conditional.post_last_modified,
+)
+
+
 class HomePageView(View):
+    @method_decorator(condition(etag_func=home_page_etag, last_modified_func=home_page_last_modified))
     def get(self, request):
-        # Получение номера страницы и размера страницы из параметров запроса
-        page_number = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 10))
-        sort_by = request.GET.get('sort_by', 'created_at')
-        author_id = request.GET.get('author_id')
-
-        # Запрос к API с параметрами пагинации
-        response = requests.get(f'http://localhost:8000/api/posts/?page={page_number}&page_size={page_size}')
-
-        if response.status_code == 200:
-            posts_data = response.json()
-            posts = posts_data.get('posts', [])  # Извлекаем список постов
-            current_page = posts_data.get('current_page', 1) # Текущая страница
-            total_count = posts_data.get('total_count', 0)  # Общее количество постов
-            total_pages = posts_data.get('total_pages', 1)  # Общее количество страниц
-        else:
-            posts = []
-            current_page = 1
-            total_count = 0
-            total_pages = 1
-
-        return render(request, 'pages/home.html', {
-            'posts': posts,
-            'current_page': current_page,
-            'total_count': total_count,
-            'total_pages': total_pages,
-            'page_size': page_size,
-        })
+        # Посты берутся напрямую из сервиса, без HTTP-запроса к собственному API
+        params = {key: request.GET[key] for key in HOME_PAGE_PARAMS if key in request.GET}
+        try:
+            posts_data = services.list_posts(params)
+        except services.InvalidQueryError:
+            posts_data = services.list_posts({})
+
+        with metrics.measure('render'):
+            return render(request, 'pages/home.html', {
+                'posts': posts_data['posts'],
+                'current_page': posts_data['current_page'],
+                'total_count': posts_data['total_count'],
+                'total_pages': posts_data['total_pages'],
+                'has_next': posts_data['has_next'],
+                'page_size': posts_data['page_size'],
+            })
 
 class BlogDetailView(View):
+    @method_decorator(condition(etag_func=blog_detail_etag, last_modified_func=blog_detail_last_modified))
     def get(self, request, pk):
-        # Получение данных о посте из API
-
         comment_form = CommentForm()
-        response = requests.get(f'http://localhost:8000/api/posts/{pk}/')
-
-        if response.status_code == 200:
-            post = response.json()
-
-        else:
-            post = None  # Или можно обработать ошибку по-другому
+        post = services.get_post(pk)
 
-        return render(request, 'pages/blog_detail.html', {'post': post, 'comment_form': comment_form})
+        with metrics.measure('render'):
+            return render(request, 'pages/blog_detail.html', {
+                'post': post,
+                'comment_form': comment_form,
+                'live_comments': live_comments.enabled(),
+            })
 
     def post(self, request, pk):
+        # С буфером и без: несуществующий пост - 404, а не ошибка БД
+        if not services.post_exists(pk):
+            raise Http404
         comment_form = CommentForm(request.POST)
+        if comment_form.is_valid() and comment_buffer.enabled():
+            return self.buffer_comment(request, pk, comment_form)
         if comment_form.is_valid():
-            # Сохранение комментария с указанием поста
-            comment = comment_form.save(commit=False)
-            comment.post_id = pk  # Указываем пост, к которому относится комментарий
-            comment.save()
+            # Тот же путь записи, что и у API add_comment
+            services.add_comment(
+                pk,
+                comment_form.cleaned_data['author_name'],
+                comment_form.cleaned_data['content'],
+            )
             return redirect('blog_detail', pk=pk)  # Перенаправление на страницу поста
-        return render(request, 'pages/blog_detail.html', {'comment_form': comment_form})
+        return render(request, 'pages/blog_detail.html', {
+            'post': services.get_post(pk),
+            'comment_form': comment_form,
+            'live_comments': live_comments.enabled(),
+        })
+
+    def buffer_comment(self, request, pk, comment_form):
+        try:
+            comment_buffer.buffer_comment(
+                pk,
+                comment_form.cleaned_data['author_name'],
+                comment_form.cleaned_data['content'],
+            )
+        except comment_buffer.BufferFullError:
+            comment_form.add_error(None, _("Too many comments are waiting to be saved, please try again in a moment."))
+            return render(
+                request,
+                'pages/blog_detail.html',
+                {'post': services.get_post(pk), 'comment_form': comment_form, 'live_comments': live_comments.enabled()},
+                status=503,
+            )
+        messages.info(request, _("Your comment will appear in a few seconds."))
+        return redirect('blog_detail', pk=pk)
+
+
+class SearchView(View):
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        results = None
+        if query:
+            try:
+                results = services.search_posts(request.GET)
+            except services.InvalidQueryError:
+                results = services.search_posts({'q': query})
+
+        with metrics.measure('render'):
+            return render(request, 'pages/search.html', {'query': query, 'results': results})
 
 
 class CreatePostView(View):